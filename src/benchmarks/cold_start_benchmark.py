@@ -0,0 +1,164 @@
+"""
+Measures the bot's cold start against a seeded local redis, without connecting to discord.
+
+The redis given by REDIS_HOST / REDIS_PORT is seeded with async races, polls, live race
+journals and twitch ids, then every startup load path is run and timed with the startup
+profiler, which is reset for each run. It uses database 15 by default, which is FLUSHED before and after each run.
+
+Run from the src directory:
+    python -m benchmarks.cold_start_benchmark [--races 40] [--entries 100] [--polls 50] [--live 5] [--runs 3]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from startup_profiler import profiler
+
+with profiler.phase("imports"):
+    from cogs.races.async_races import AsyncRaces
+    from cogs.races.race_journal import RaceJournal
+    from cogs.races.races import Races, registry
+    from storage import redis_client, serialization
+    from storage.write_behind import WriteBehindQueue
+    from thread_members import ThreadMemberAdder
+    from voting.polls import Polls
+    from voting.stv_election import StvElection
+
+
+class FakeMessage:
+    def __init__(self, id):
+        self.id = id
+
+
+class FakeGuild:
+    def get_thread(self, id):
+        return None
+
+
+class FakeChannel:
+    def __init__(self, id):
+        self.id = id
+        self.guild = FakeGuild()
+
+    def get_thread(self, id):
+        return FakeChannel(id)
+
+    def get_partial_message(self, id):
+        return FakeMessage(id)
+
+
+class FakeBot:
+    """
+    Just enough of commands.Bot for the load paths, everything resolves from "cache"
+    """
+
+    def get_channel(self, id):
+        return FakeChannel(id)
+
+    def get_user(self, id):
+        return None
+
+
+async def seed(redis_db, args):
+    await redis_db.flushdb()
+    for race_id in range(1, args.races + 1):
+        meta = {"race_channel_id": 1, "race_id": race_id, "race_thread_id": race_id,
+                "spoiler_thread_id": race_id + 100000, "name": f"race {race_id}",
+                "owner_id": 2, "flags": "https://finalfantasyrandomizer.com/?f=abc",
+                "start_time": None, "end_time": None, "race_role": None,
+                "seed": "seed", "is_started": True, "is_finished": False,
+                "announcement_message_id": 3, "leaderboard_message_id": 4,
+                "spoiler_leaderboard_message_ids": [5], "leaderboard": [], "is_coop": False}
+        await redis_db.hset("races", race_id, serialization.dump_async_race(meta))
+        entries = {str(i): serialization.dump_leaderboard_entry({
+            "runner_id": 1000 + i, "runner_name": f"runner {i}",
+            "runner_time": f"01:{i // 60 % 60:02d}:{i % 60:02d}",
+            "vod": f"https://www.twitch.tv/videos/{i}", "is_forfeit": False,
+            "is_spectator": False, "teammate_id": None, "teammate_name": None,
+            "teammate_vod": None}) for i in range(args.entries)}
+        if entries:
+            await redis_db.hset(f"races:{race_id}:entries", mapping=entries)
+
+    for poll_id in range(args.polls):
+        election = StvElection(f"election {poll_id}", str(poll_id), 3)
+        for i in range(10):
+            election.options[str(i)] = {"id": str(i), "mention": f"<@{i}>",
+                                        "display_name": f"candidate {i}",
+                                        "index": i}
+        election.start_poll()
+        for voter in range(args.entries):
+            election.submit_vote(str(voter), f"voter {voter}",
+                                 [f"{rank + 1},,{(voter + rank) % 10}" for rank in range(3)])
+        await redis_db.hset("voting", str(poll_id), serialization.dump_poll(election))
+
+    journal = RaceJournal(redis_db)
+    for race_id in range(1, args.live + 1):
+        state = {"race": {"id": race_id, "name": f"live {race_id}", "flags": None,
+                          "runners": {}, "started": False, "channel_id": race_id,
+                          "owner": 1, "readycount": 0, "message_id": 6,
+                          "restream": None, "lockable": False, "islocked": False},
+                 "aliases": {}, "teams": {}}
+        await journal.snapshot(race_id, state)
+        for runner_id in range(10):
+            await journal.append(race_id, {"event": "join", "runner_id": runner_id,
+                                           "name": f"runner {runner_id}",
+                                           "members": [[f"runner {runner_id}", runner_id]]})
+
+    await redis_db.hset("twitchids", mapping={str(i): f"twitch{i}" for i in range(500)})
+
+
+async def cold_start(pool):
+    bot = FakeBot()
+    races_db = redis_client.create_client(pool)
+    persistence = WriteBehindQueue(redis_client.create_client(pool))
+    registry.clear()
+
+    with profiler.phase("cog construction"):
+        races = Races(bot, races_db)
+        async_races = AsyncRaces(bot, races_db, persistence, ThreadMemberAdder(races_db))
+        polls = Polls(bot, redis_client.create_client(pool), persistence)
+    with profiler.phase("races cog_load"):
+        await races.cog_load()
+    with profiler.phase("polls cog_load"):
+        await polls.cog_load()
+    with profiler.phase("rehydrate async races"):
+        await async_races._load_data(bot)
+    with profiler.phase("restore live races"):
+        await races.load_live_races()
+    await persistence.close()
+    return len(async_races.active_races), len(polls.polls), len(registry)
+
+
+async def main(args):
+    pool = redis_client.create_pool(db=args.db)
+    redis_db = redis_client.create_client(pool)
+    totals = []
+    # only the first import is timed, the modules are cached for the runs
+    print(profiler.report())
+    try:
+        await seed(redis_db, args)
+        for run in range(args.runs):
+            # the cogs time their redis loads on the global profiler, so each run starts it afresh
+            profiler.reset()
+            start = time.perf_counter()
+            loaded = await cold_start(pool)
+            totals.append(time.perf_counter() - start)
+            print(f"run {run + 1}: loaded {loaded[0]} async races, {loaded[1]} polls, {loaded[2]} live races")
+            print(profiler.report())
+    finally:
+        await redis_db.flushdb()
+        await redis_client.close_pool(pool)
+
+    print(f"median cold start: {statistics.median(totals) * 1000:.1f}ms over {args.runs} runs")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--races", type=int, default=40)
+    parser.add_argument("--entries", type=int, default=100)
+    parser.add_argument("--polls", type=int, default=50)
+    parser.add_argument("--live", type=int, default=5)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--db", type=int, default=15)
+    asyncio.run(main(parser.parse_args()))
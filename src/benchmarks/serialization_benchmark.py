@@ -0,0 +1,85 @@
+"""
+Compares the size and encode/decode time of the storage format against pickle.
+
+Run from the src directory:
+    python -m benchmarks.serialization_benchmark [entries]
+"""
+import pickle
+import sys
+import timeit
+from datetime import datetime
+
+from cogs.races.async_race import AsyncLeaderboardEntry
+from storage import serialization
+from voting.stv_election import StvElection
+
+REPEAT = 200
+
+
+def make_race(entries):
+    leaderboard = [{"runner_id": 100000000000000000 + i,
+                    "runner_name": "runner number " + str(i),
+                    "runner_time": f"{1 + i // 3600:02d}:{(i // 60) % 60:02d}:{i % 60:02d}",
+                    "vod": "https://www.twitch.tv/videos/" + str(2000000000 + i),
+                    "is_forfeit": i % 10 == 0,
+                    "is_spectator": False,
+                    "teammate_id": None,
+                    "teammate_name": None,
+                    "teammate_vod": None} for i in range(entries)]
+    return {"race_channel_id": 1, "race_id": 2, "race_thread_id": 2,
+            "spoiler_thread_id": 3, "name": "benchmark race", "owner_id": 4,
+            "flags": "https://finalfantasyrandomizer.com/?f=abc",
+            "start_time": datetime(2026, 7, 15, 10, 30), "end_time": None,
+            "race_role": None, "seed": "seed", "is_started": True,
+            "is_finished": False, "announcement_message_id": 5,
+            "leaderboard_message_id": 6, "spoiler_leaderboard_message_ids": [7],
+            "leaderboard": leaderboard, "is_coop": False}
+
+
+def make_election(voters):
+    election = StvElection("benchmark election", "1", 3)
+    for i in range(10):
+        x = str(i)
+        election.options[x] = {"id": x, "mention": "<@" + x + ">",
+                               "display_name": "candidate " + x,
+                               "index": len(election.options)}
+    election.start_poll()
+    for i in range(voters):
+        election.submit_vote(str(i), "voter " + str(i),
+                             [f"{rank + 1},,{(i + rank) % 10}" for rank in range(3)])
+    return election
+
+
+def report(name, pickle_obj, dump, load, obj):
+    pickled = pickle.dumps(pickle_obj, protocol=pickle.HIGHEST_PROTOCOL)
+    encoded = dump(obj)
+    rows = [
+        ("pickle", len(pickled),
+         timeit.timeit(lambda: pickle.dumps(pickle_obj, protocol=pickle.HIGHEST_PROTOCOL), number=REPEAT),
+         timeit.timeit(lambda: pickle.loads(pickled), number=REPEAT)),
+        (f"v{serialization.FORMAT_VERSION}", len(encoded),
+         timeit.timeit(lambda: dump(obj), number=REPEAT),
+         timeit.timeit(lambda: load(encoded), number=REPEAT)),
+    ]
+    print(name)
+    print(f"  {'format':<8}{'bytes':>10}{'encode us':>12}{'decode us':>12}")
+    for fmt, size, encode, decode in rows:
+        print(f"  {fmt:<8}{size:>10}{encode / REPEAT * 1e6:>12.1f}{decode / REPEAT * 1e6:>12.1f}")
+
+
+def main():
+    entries = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+
+    race = make_race(entries)
+    legacy_race = dict(race)
+    legacy_race["leaderboard"] = [AsyncLeaderboardEntry.from_dict(e) for e in race["leaderboard"]]
+    report(f"async race, {entries} entries", legacy_race,
+           serialization.dump_async_race, serialization.load_async_race, race)
+
+    election = make_election(entries)
+    report(f"election, {entries} ballots", election,
+           serialization.dump_poll, serialization.load_poll, election)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Measures the end-to-end latency of an async race submission against stub discord objects
+whose calls each take a simulated round trip.
+
+"sequential" replays the calls the way submissions used to make them (each awaited in turn),
+"concurrent" is AsyncRace.submit as it is now. Both are run with and without the edit
+coalescer.
+
+Run from the src directory:
+    python -m benchmarks.submit_latency_benchmark [--rtt-ms 80] [--submissions 20]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from types import SimpleNamespace
+
+from cogs.races.async_race import AsyncLeaderboardEntry, AsyncRace, parse_time
+from edit_coalescer import EditCoalescer
+
+
+class FakeMessage:
+    def __init__(self, thread, id):
+        self.thread = thread
+        self.id = id
+
+    async def edit(self, content):
+        await asyncio.sleep(self.thread.rtt)
+
+    async def pin(self):
+        await asyncio.sleep(self.thread.rtt)
+
+    async def delete(self):
+        await asyncio.sleep(self.thread.rtt)
+
+
+class FakeThread:
+    def __init__(self, id, rtt):
+        self.id = id
+        self.rtt = rtt
+        self.next_message_id = id * 1000
+
+    def get_partial_message(self, id):
+        return FakeMessage(self, id)
+
+    async def send(self, content):
+        await asyncio.sleep(self.rtt)
+        self.next_message_id += 1
+        return FakeMessage(self, self.next_message_id)
+
+    async def add_user(self, user):
+        await asyncio.sleep(self.rtt)
+
+
+def make_race(rtt, editor):
+    owner = SimpleNamespace(id=1, display_name="owner", mention="<@1>")
+    race = AsyncRace(SimpleNamespace(id=2), "benchmark", owner, "flags")
+    race.editor = editor
+    race.race_thread = FakeThread(3, rtt)
+    race.spoiler_thread = FakeThread(4, rtt)
+    race.leaderboard_message_id = 5
+    race.spoiler_leaderboard_message_ids = [6]
+    race.is_started = True
+    return race
+
+
+def runner(i):
+    return SimpleNamespace(id=100 + i, display_name=f"runner {i}", mention=f"<@{100 + i}>")
+
+
+async def sequential_submit(race, runner, runner_time, vod):
+    """
+    The submission path as it was, every discord call awaited one after the other
+    """
+    entry = AsyncLeaderboardEntry(runner, parse_time(runner_time), vod)
+    race.leaderboard.append(entry)
+    await race.spoiler_thread.add_user(runner)
+    await race.spoiler_thread.send(f"GG {runner.mention} on your time of {entry.runner_time}!")
+    await race._update_spoiler_leaderboard()
+    await race._edit_message(race.leaderboard_message, f"Number of participants: {len(race.leaderboard)}")
+
+
+async def concurrent_submit(race, runner, runner_time, vod):
+    await race.submit(runner, runner_time, vod, False)
+
+
+async def measure(submit, rtt, submissions, coalesce):
+    editor = EditCoalescer() if coalesce else None
+    race = make_race(rtt, editor)
+    latencies = []
+    for i in range(submissions):
+        start = time.perf_counter()
+        await submit(race, runner(i), f"1:{i % 60:02d}:00", f"https://www.twitch.tv/videos/{i}")
+        latencies.append(time.perf_counter() - start)
+    if editor is not None:
+        await editor.flush()
+    return latencies
+
+
+async def main(args):
+    rtt = args.rtt_ms / 1000
+    print(f"simulated round trip {args.rtt_ms}ms, {args.submissions} submissions each")
+    for coalesce in (False, True):
+        for name, submit in (("sequential", sequential_submit), ("concurrent", concurrent_submit)):
+            latencies = await measure(submit, rtt, args.submissions, coalesce)
+            label = f"{name}{' + coalesced edits' if coalesce else ''}"
+            print(f"  {label:<32} median {statistics.median(latencies) * 1000:6.0f}ms"
+                  f"  max {max(latencies) * 1000:6.0f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rtt-ms", type=int, default=80)
+    parser.add_argument("--submissions", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
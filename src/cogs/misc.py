@@ -5,8 +5,9 @@ from discord.ext import commands
 import constants
 
 class MiscCommandCog(commands.Cog):
-    def __init__(self, bot):
+    def __init__(self, bot, persistence=None):
         self.bot = bot
+        self.persistence = persistence
 
 
     @commands.command()
@@ -26,6 +27,24 @@ class MiscCommandCog(commands.Cog):
             await self.bot.tree.sync()
             await ctx.author.send("Synced commands globally")
 
+    @commands.command()
+    async def dbstats(self, ctx):
+        if (ctx.author.id != constants.poor_soul_id):
+            await ctx.author.send("You don't have permission to use this command.")
+            return
+
+        if self.persistence is None:
+            await ctx.author.send("Write-behind persistence is not enabled")
+            return
+        metrics = self.persistence.metrics()
+        async_races = self.bot.get_cog("AsyncRaces")
+        if async_races is not None:
+            metrics.update(async_races.editor.metrics())
+        races = self.bot.get_cog("Races")
+        if races is not None:
+            metrics.update(races.metrics())
+        await ctx.author.send("\n".join(f"{k}: {v}" for k, v in metrics.items()))
+
     @commands.command()
     async def roll(self, ctx, dice):
         match = re.match(r"((\d{1,3})?d\d{1,9})", dice)
@@ -0,0 +1,135 @@
+from bisect import bisect_left, bisect_right
+
+from cogs.races import async_stats
+
+
+class AsyncLeaderboard:
+    """
+    Leaderboard of an async race, kept sorted as entries are submitted.
+
+    Entries are kept in submission order (which is how they are stored in redis), with
+    finishers additionally kept sorted by time so placement and bin lookups are a bisect
+    instead of a sort of the whole board on every submission. Spectators are not on the
+    leaderboard, AsyncRace keeps them separately.
+    """
+
+    def __init__(self, entries=(), binning=async_stats.DEFAULT_STRATEGY):
+        self.binning = binning
+        self.entries = []
+        self.finishers = []
+        self.forfeits = []
+        # finish times in seconds, parallel to finishers
+        self._times = []
+        # entry of every runner and teammate on the board, by user id
+        self.participants = dict()
+        self._bin_starts = None
+        for entry in entries:
+            self.append(entry)
+
+    def append(self, entry):
+        self.entries.append(entry)
+        self.participants[entry.runner_id] = entry
+        if entry.teammate_id is not None:
+            self.participants[entry.teammate_id] = entry
+
+        if entry.is_forfeit:
+            self.forfeits.append(entry)
+            return
+        seconds = entry.seconds
+        # bisect_right keeps tied times in submission order
+        position = bisect_right(self._times, seconds)
+        self._times.insert(position, seconds)
+        self.finishers.insert(position, entry)
+        self._bin_starts = None
+
+    def entry_for(self, user_id):
+        """
+        The entry the user submitted, either as the runner or as a teammate, or None
+        """
+        return self.participants.get(user_id)
+
+    def placement(self, seconds):
+        """
+        The place a finish time of `seconds` would have on the current leaderboard
+        """
+        return bisect_left(self._times, seconds) + 1
+
+    def bin_number(self, position):
+        """
+        The bin (starting at 1) of the finisher at the 0 based position
+        """
+        return bisect_right(self.bin_starts(), position)
+
+    def bin_starts(self):
+        """
+        Positions of the first finisher of each bin, using the leaderboard's binning strategy
+        """
+        if self._bin_starts is None:
+            self._bin_starts = async_stats.STRATEGIES[self.binning](self._times)
+        return self._bin_starts
+
+    def set_binning(self, binning):
+        if binning not in async_stats.STRATEGIES:
+            raise ValueError(f"unknown binning strategy {binning}")
+        self.binning = binning
+        self._bin_starts = None
+
+    def stats(self, binning=None):
+        """
+        Statistics over the finish times, see async_stats.compute_stats
+        """
+        return async_stats.compute_stats(self._times, binning or self.binning)
+
+    def render(self, show_bins=True):
+        """
+        The leaderboard as posted in discord
+        """
+        return "".join(self.render_lines(show_bins))
+
+    def render_lines(self, show_bins=True):
+        """
+        The lines of render(), for splitting the leaderboard across messages
+        """
+        lines = []
+        if not self.finishers:
+            lines.append("No finishers!\n")
+        elif show_bins:
+            for i, entry in enumerate(self.finishers):
+                lines.append(f"{i + 1}. {entry.display} (Bin {self.bin_number(i)})\n")
+        else:
+            for i, entry in enumerate(self.finishers):
+                lines.append(f"{i + 1}. {entry.display}\n")
+
+        if self.forfeits:
+            lines.append("\nForfeits:\n")
+            for i, entry in enumerate(self.forfeits):
+                lines.append(f"{i + 1}. {entry.display}\n")
+        return lines
+
+    def render_csv(self, is_coop=False):
+        """
+        The leaderboard as comma separated rows, without the header
+        """
+        lines = []
+        for i, entry in enumerate(self.finishers):
+            if is_coop and entry.teammate_name is not None:
+                lines.append(f"{entry.runner_name},{entry.teammate_name},{entry.runner_time},{entry.vod or ''},{entry.teammate_vod or ''},{self.bin_number(i)}\n")
+            else:
+                lines.append(f"{entry.runner_name},{entry.runner_time},{entry.vod or ''},{self.bin_number(i)}\n")
+        for entry in self.forfeits:
+            lines.append(f"{entry.runner_name},DNF,,\n")
+        return "".join(lines)
+
+    def __contains__(self, item):
+        if isinstance(item, int):
+            return item in self.participants
+        return item in self.entries
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, index):
+        return self.entries[index]
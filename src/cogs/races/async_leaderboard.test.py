@@ -0,0 +1,88 @@
+import random
+import unittest
+
+from cogs.races.async_leaderboard import AsyncLeaderboard
+from cogs.races.async_race import AsyncLeaderboardEntry
+
+
+def entry(runner_id, seconds, is_forfeit=False, is_spectator=False, teammate_id=None):
+    return AsyncLeaderboardEntry.from_dict({
+        "runner_id": runner_id,
+        "runner_name": "runner " + str(runner_id),
+        "runner_time": f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}",
+        "vod": None,
+        "is_forfeit": is_forfeit,
+        "is_spectator": is_spectator,
+        "teammate_id": teammate_id,
+        "teammate_name": None if teammate_id is None else "teammate " + str(teammate_id),
+        "teammate_vod": None})
+
+
+def reference_bins(times):
+    """
+    The bins as they were computed before the leaderboard was kept sorted
+    """
+    bins = []
+    bin_end_time = -1
+    bin_number = 1
+    for seconds in sorted(times):
+        if bin_end_time == -1:
+            bin_end_time = seconds + 60
+        elif seconds > bin_end_time and bin_number < 6:
+            bin_number += 1
+            bin_end_time = seconds + (60 * (2 ** (bin_number - 1)))
+        bins.append(bin_number)
+    return bins
+
+
+class TestAsyncLeaderboard(unittest.TestCase):
+    def test_finishers_stay_sorted(self):
+        leaderboard = AsyncLeaderboard()
+        for runner_id, seconds in enumerate([3700, 3600, 3650, 3600]):
+            leaderboard.append(entry(runner_id, seconds))
+        self.assertEqual([e.runner_id for e in leaderboard.finishers], [1, 3, 2, 0])
+        # submission order is kept for storage
+        self.assertEqual([e.runner_id for e in leaderboard], [0, 1, 2, 3])
+
+    def test_bins_match_reference(self):
+        rng = random.Random(7)
+        for _ in range(50):
+            times = [rng.randint(3000, 9000) for _ in range(rng.randint(1, 300))]
+            leaderboard = AsyncLeaderboard(entry(i, t) for i, t in enumerate(times))
+            bins = [leaderboard.bin_number(i) for i in range(len(times))]
+            self.assertEqual(bins, reference_bins(times))
+
+    def test_placement(self):
+        leaderboard = AsyncLeaderboard(entry(i, t) for i, t in enumerate([100, 200, 300]))
+        self.assertEqual(leaderboard.placement(50), 1)
+        self.assertEqual(leaderboard.placement(200), 2)
+        self.assertEqual(leaderboard.placement(400), 4)
+
+    def test_forfeits_and_teammates(self):
+        leaderboard = AsyncLeaderboard([entry(1, 0, is_forfeit=True),
+                                        entry(3, 3600, teammate_id=4)])
+        self.assertEqual(len(leaderboard), 2)
+        self.assertEqual(leaderboard.forfeits[0].runner_id, 1)
+        self.assertEqual([e.runner_id for e in leaderboard.finishers], [3])
+        self.assertIn(1, leaderboard)
+        self.assertIn(4, leaderboard)
+        self.assertNotIn(5, leaderboard)
+        self.assertIs(leaderboard.entry_for(4), leaderboard.entry_for(3))
+        self.assertIsNone(leaderboard.entry_for(5))
+
+    def test_render(self):
+        leaderboard = AsyncLeaderboard([entry(1, 3700), entry(2, 0, is_forfeit=True), entry(3, 3600)])
+        self.assertEqual(leaderboard.render(),
+                         "1. runner 3 - 1:00:00 (Bin 1)\n"
+                         "2. runner 1 - 1:01:40 (Bin 2)\n"
+                         "\nForfeits:\n"
+                         "1. runner 2 - Forfeit\n")
+        self.assertEqual(leaderboard.render_csv(),
+                         "runner 3,01:00:00,,1\n"
+                         "runner 1,01:01:40,,2\n"
+                         "runner 2,DNF,,\n")
+        self.assertEqual(AsyncLeaderboard().render(), "No finishers!\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,4 @@
-from datetime import datetime, timedelta
+import asyncio
 import io
 import logging
 import re
@@ -7,6 +7,9 @@ import discord
 from discord.utils import get
 from discord.ext.commands import CommandError
 from cogs.races.races_common import flagseedgen
+from cogs.races import async_stats
+from cogs.races.async_leaderboard import AsyncLeaderboard
+from cogs.races.pagination import changed_pages, paginate
 
 
 class AsyncRace:
@@ -24,12 +27,20 @@ class AsyncRace:
         race_role = None,
         is_coop = False,
     ):
+        self.bot = None
+        # EditCoalescer for leaderboard edits, when None messages are edited immediately
+        self.editor = None
         self.race_channel = race_channel
         self.race_id = None
-        self.race_thread = None
-        self.spoiler_thread = None
+        # threads, messages and the owner are kept as ids and only resolved to
+        # discord objects (from the cache, or as partial messages) when first used
+        self.race_thread_id = None
+        self.spoiler_thread_id = None
+        self._race_thread = None
+        self._spoiler_thread = None
         self.name = name
-        self.owner = owner
+        self.owner_id = owner.id
+        self._owner = owner
         self.flags = flags
         self.start_time = start_time
         self.end_time = end_time
@@ -37,49 +48,72 @@ class AsyncRace:
         self.seed = None
         self.is_started = False
         self.is_finished = False
-        self.announcement_message = None
-        self.leaderboard_message = None
-        self.spoiler_leaderboard_message = None
-        self.leaderboard = []
+        self.announcement_message_id = None
+        self.leaderboard_message_id = None
+        # the spoiler leaderboard spans as many messages as it needs, one id per page
+        self.spoiler_leaderboard_message_ids = []
+        # content of each page as last posted, so only changed pages get edited
+        self._spoiler_pages = []
+        # held while the spoiler leaderboard is rendered and its messages edited, so concurrent
+        # submissions don't both post the same new page
+        self._spoiler_lock = asyncio.Lock()
+        self._partial_messages = dict()
+        self.leaderboard = AsyncLeaderboard()
+        # ids of the users spectating, they have access to the spoiler thread but aren't on the leaderboard
+        self.spectators = set()
         self.is_coop = is_coop
 
 
     @classmethod
     async def from_dict(cls, data, bot):
         """
-        Creates an AsyncRace object from the dictionary representation in redis
+        Creates an AsyncRace object from the dictionary representation in redis.
+        Only the channel is looked up here (from the cache when possible), everything
+        else is resolved lazily.
         """
-        channel = await bot.fetch_channel(data["race_channel_id"])
-        owner = await bot.fetch_user(data["owner_id"])
+        channel = bot.get_channel(data["race_channel_id"])
+        if channel is None:
+            channel = await bot.fetch_channel(data["race_channel_id"])
         race = cls(
-            channel, data["name"], owner, data["flags"],
+            channel, data["name"], discord.Object(id=data["owner_id"]), data["flags"],
             data["start_time"], data["end_time"], data["race_role"], data.get("is_coop", False)
         )
+        race.bot = bot
+        race._owner = None
 
         # set the rest of the fields
         race.race_id = data["race_id"]
-        race.race_thread = channel.get_thread(data["race_thread_id"])
-        race.spoiler_thread = channel.get_thread(data["spoiler_thread_id"])
+        race.race_thread_id = data["race_thread_id"]
+        race.spoiler_thread_id = data["spoiler_thread_id"]
         race.seed = data["seed"]
         race.is_started = data["is_started"]
         race.is_finished = data["is_finished"]
-        race.announcement_message = await race.race_thread.fetch_message(data["announcement_message_id"])
-        if data["leaderboard_message_id"] is not None:
-            race.leaderboard_message = await race.race_thread.fetch_message(data["leaderboard_message_id"])
-        if data.get("spoiler_leaderboard_message_id") is not None:
-            race.spoiler_leaderboard_message = await race.spoiler_thread.fetch_message(data["spoiler_leaderboard_message_id"])
-        race.leaderboard = data["leaderboard"]
+        race.announcement_message_id = data["announcement_message_id"]
+        race.leaderboard_message_id = data["leaderboard_message_id"]
+        race.spoiler_leaderboard_message_ids = data.get("spoiler_leaderboard_message_ids")
+        if race.spoiler_leaderboard_message_ids is None:
+            # stored before the spoiler leaderboard was paginated
+            message_id = data.get("spoiler_leaderboard_message_id")
+            race.spoiler_leaderboard_message_ids = [message_id] if message_id is not None else []
+        race.spectators = set(data.get("spectators", []))
+        # spectators used to be stored as leaderboard entries
+        race.leaderboard = AsyncLeaderboard(binning=data.get("binning", async_stats.DEFAULT_STRATEGY))
+        for entry_data in data["leaderboard"]:
+            if entry_data["is_spectator"]:
+                race.spectators.add(entry_data["runner_id"])
+            else:
+                race.leaderboard.append(AsyncLeaderboardEntry.from_dict(entry_data))
         return race
 
 
-    def to_dict(self): 
+    def to_dict(self, include_leaderboard=True): 
         return {
             "race_channel_id": self.race_channel.id,
             "race_id": self.race_id,
-            "race_thread_id": self.race_thread.id,
-            "spoiler_thread_id": self.spoiler_thread.id,
+            "race_thread_id": self.race_thread_id,
+            "spoiler_thread_id": self.spoiler_thread_id,
             "name": self.name,
-            "owner_id": self.owner.id,
+            "owner_id": self.owner_id,
             "flags": self.flags,
             "start_time": self.start_time,
             "end_time": self.end_time,
@@ -87,17 +121,104 @@ class AsyncRace:
             "seed": self.seed,
             "is_started": self.is_started,
             "is_finished": self.is_finished,
-            "announcement_message_id": self.announcement_message.id,
-            "leaderboard_message_id": self.leaderboard_message.id if self.leaderboard_message else None,
-            "spoiler_leaderboard_message_id": self.spoiler_leaderboard_message.id if self.spoiler_leaderboard_message else None,
-            "leaderboard": self.leaderboard,
+            "announcement_message_id": self.announcement_message_id,
+            "leaderboard_message_id": self.leaderboard_message_id,
+            "spoiler_leaderboard_message_ids": self.spoiler_leaderboard_message_ids,
+            "leaderboard": [entry.to_dict() for entry in self.leaderboard] if include_leaderboard else [],
+            "spectators": sorted(self.spectators),
+            "binning": self.leaderboard.binning,
             "is_coop": self.is_coop
         }            
 
-
-    async def init_race(self):
+    @property
+    def owner(self):
+        """
+        The owner as a cached user if available, otherwise a bare discord.Object with only the id.
+        Use fetch_owner when the owner needs to be messaged.
+        """
+        if self._owner is None and self.bot is not None:
+            self._owner = self.bot.get_user(self.owner_id)
+        return self._owner if self._owner is not None else discord.Object(id=self.owner_id)
+
+    async def fetch_owner(self):
+        owner = self.owner
+        if isinstance(owner, discord.Object):
+            self._owner = await self.bot.fetch_user(self.owner_id)
+        return self._owner
+
+    @property
+    def race_thread(self):
+        if self._race_thread is None and self.race_thread_id is not None:
+            self._race_thread = self._get_cached_thread(self.race_thread_id)
+        return self._race_thread
+
+    @race_thread.setter
+    def race_thread(self, thread):
+        self._race_thread = thread
+        self.race_thread_id = thread.id if thread is not None else None
+
+    @property
+    def spoiler_thread(self):
+        if self._spoiler_thread is None and self.spoiler_thread_id is not None:
+            self._spoiler_thread = self._get_cached_thread(self.spoiler_thread_id)
+        return self._spoiler_thread
+
+    @spoiler_thread.setter
+    def spoiler_thread(self, thread):
+        self._spoiler_thread = thread
+        self.spoiler_thread_id = thread.id if thread is not None else None
+
+    @property
+    def announcement_message(self):
+        return self._get_partial_message("announcement_message_id", self.race_thread)
+
+    @announcement_message.setter
+    def announcement_message(self, message):
+        self._set_message("announcement_message_id", message)
+
+    @property
+    def leaderboard_message(self):
+        return self._get_partial_message("leaderboard_message_id", self.race_thread)
+
+    @leaderboard_message.setter
+    def leaderboard_message(self, message):
+        self._set_message("leaderboard_message_id", message)
+
+    async def _ensure_threads(self):
+        """
+        Fetches the race and spoiler threads if they weren't in the cache (e.g. archived threads)
         """
-        Initializes (and possibly starts) the async race        
+        if self.race_thread is None and self.race_thread_id is not None:
+            self.race_thread = await self.race_channel.guild.fetch_channel(self.race_thread_id)
+        if self.spoiler_thread is None and self.spoiler_thread_id is not None:
+            self.spoiler_thread = await self.race_channel.guild.fetch_channel(self.spoiler_thread_id)
+
+    def _get_cached_thread(self, thread_id):
+        thread = self.race_channel.get_thread(thread_id)
+        if thread is None:
+            thread = self.race_channel.guild.get_thread(thread_id)
+        return thread
+
+    def _get_partial_message(self, id_attr, thread):
+        message_id = getattr(self, id_attr)
+        if message_id is None or thread is None:
+            return None
+        message = self._partial_messages.get(id_attr)
+        if message is None or message.id != message_id:
+            message = thread.get_partial_message(message_id)
+            self._partial_messages[id_attr] = message
+        return message
+
+    def _set_message(self, id_attr, message):
+        # only the id is kept, the full Message object is dropped
+        setattr(self, id_attr, message.id if message is not None else None)
+        self._partial_messages.pop(id_attr, None)
+
+
+    async def init_race(self, member_adder):
+        """
+        Initializes (and possibly starts) the async race.
+        member_adder is the ThreadMemberAdder used to add the members of the race role.
         """
         if self.is_started or self.is_finished:
             logging.info(
@@ -121,8 +242,8 @@ class AsyncRace:
             roles = self.race_thread.guild.roles
             role = next((r for r in roles if r.name == self.race_role), None)
             if role is not None:
-                for member in role.members:
-                    await self.race_thread.add_user(member)
+                # can be hundreds of members, they are added in the background
+                member_adder.add_members_in_background(self.race_thread, role.members)
 
         self.race_id = self.race_thread.id
                 
@@ -144,7 +265,8 @@ class AsyncRace:
                 "Call to start_race while {%s} was not in ready state", self.name
             )
             raise CommandError
-            
+
+        await self._ensure_threads()
         self.seed = flagseedgen(self.flags)
         race_str = f"**{self.name}**\n\n"
         if self.end_time is not None:
@@ -177,10 +299,7 @@ class AsyncRace:
             "Number of participants: 0"
         )
 
-        self.spoiler_leaderboard_message = await self.spoiler_thread.send(
-            "Current Leaderboard:\nNo finishers yet!"
-        )
-        await self.spoiler_leaderboard_message.pin()
+        await self._update_spoiler_leaderboard("Current Leaderboard:\nNo finishers yet!")
 
         self.is_started = True
 
@@ -195,18 +314,19 @@ class AsyncRace:
             )
             raise CommandError
 
-        finished_racers = [entry for entry in self.leaderboard if not entry.is_forfeit and not entry.is_spectator]
-        finished_racers.sort(key=lambda x: x.time_delta)
-        leaderboard_str = "Final Leaderboard:\n"
-        leaderboard_str = leaderboard_str + self._build_leaderboard_string()
+        await self._ensure_threads()
+        await self._flush_edits()
 
         # post the final leaderboard
-        await self.race_thread.send(leaderboard_str)
+        pages, _ = paginate(self.leaderboard.render_lines(), header="Final Leaderboard:\n")
+        for page in pages:
+            await self.race_thread.send(page)
 
         # send the CSV export to the owner
         leaderboard_csv = self.export_leaderboard()
         file_data = io.BytesIO(leaderboard_csv.encode('utf-8'))
-        await self.owner.send(f"Here is the CSV export of the final leaderboard for {self.name}:", file=discord.File(fp=file_data, filename=f"{self.name}_leaderboard.csv"))
+        owner = await self.fetch_owner()
+        await owner.send(f"Here is the CSV export of the final leaderboard for {self.name}:", file=discord.File(fp=file_data, filename=f"{self.name}_leaderboard.csv"))
 
         self.is_started = False
         self.is_finished = True
@@ -219,6 +339,8 @@ class AsyncRace:
             logging.info("Cannot cancel started races, they must be ended instead")
             return
 
+        await self._ensure_threads()
+        await self._flush_edits()
         await self.spoiler_thread.delete()
         await self.race_thread.send("This race has been cancelled.")
         self.is_finished = True
@@ -232,9 +354,15 @@ class AsyncRace:
         if not self.is_started or self.is_finished:
             await runner.send(f"{self.name} is not open for time submissions")
             return
+        # resolved before the checks below, so nothing yields between the duplicate check
+        # and the entry being added
+        await self._ensure_threads()
         if runner.id in self.leaderboard:
             await runner.send("You have already submitted a time for this race")
             return
+        if teammate is not None and teammate.id in self.leaderboard:
+            await runner.send(f"{teammate.display_name} has already submitted a time for this race")
+            return
         if vod is None and not is_forfeit:
             await runner.send("You must provide a VOD link when submitting a time")
             return
@@ -244,56 +372,119 @@ class AsyncRace:
         if self.is_coop and teammate_vod is None and not is_forfeit:
             await runner.send("You must provide a VOD link for your teammate when submitting a time for a co-op race")
             return
-        
-        try:
-            if not is_forfeit:
-                if runner_time.count(":") == 1:
-                    # allow for MM:SS format
-                    runner_time = "00:" + runner_time
 
-                datetime.strptime(runner_time, "%H:%M:%S")
+        try:
+            seconds = 0 if is_forfeit else parse_time(runner_time)
         except ValueError:
             await runner.send("The time you provided '"
                     + str(runner_time)
                     + "' is not in the format HH:MM:SS")
             return
         
-        entry = AsyncLeaderboardEntry(runner, runner_time, vod, is_forfeit, False, teammate, teammate_vod)
+        entry = AsyncLeaderboardEntry(runner, seconds, vod, is_forfeit, False, teammate, teammate_vod)
         self.leaderboard.append(entry)
+        self.spectators.discard(runner.id)
         
-        # Spoiler thread updates
-        await self.spoiler_thread.add_user(runner)
-        await self.spoiler_thread.add_user(teammate) if teammate is not None else None
-
         if self.is_coop:
-            await self.spoiler_thread.send(f"GG {runner.mention} and {teammate.mention if teammate is not None else ''} on your time of {runner_time}!" if not is_forfeit else f"{runner.mention} and {teammate.mention if teammate is not None else ''} have forfeited. GG")
+            gg_message = f"GG {runner.mention} and {teammate.mention if teammate is not None else ''} on your time of {entry.runner_time}!" if not is_forfeit else f"{runner.mention} and {teammate.mention if teammate is not None else ''} have forfeited. GG"
         else:
-            await self.spoiler_thread.send(f"GG {runner.mention} on your time of {runner_time}!" if not is_forfeit else f"{runner.mention} has forfeited. GG")
-
-        if self.spoiler_leaderboard_message is not None:
-            await self.spoiler_leaderboard_message.edit(
-                content="Current Leaderboard:\n" + self._build_leaderboard_string(show_bins=False)
-            )
-        else:
-            self.spoiler_leaderboard_message = await self.spoiler_thread.send(
-                "Current Leaderboard:\n" + self._build_leaderboard_string(show_bins=False)
-            )
-            await self.spoiler_leaderboard_message.pin()
-
-        # Leaderboard updates
-        await self.leaderboard_message.edit(
-            content=f"Number of participants: {len(self.leaderboard)}"
-        )
+            gg_message = f"GG {runner.mention} on your time of {entry.runner_time}!" if not is_forfeit else f"{runner.mention} has forfeited. GG"
+
+        async def post_to_spoiler_thread():
+            # messages in the spoiler thread are sent in order, the GG message before any new
+            # leaderboard page
+            await self.spoiler_thread.send(gg_message)
+            await self._update_spoiler_leaderboard()
+
+        # the calls below don't depend on each other, so they are made concurrently
+        # instead of paying a round trip each
+        calls = {
+            "adding you to the spoiler thread": self.spoiler_thread.add_user(runner),
+            "posting to the spoiler thread": post_to_spoiler_thread(),
+            "updating the participant count": self._edit_message(
+                self.leaderboard_message, f"Number of participants: {len(self.leaderboard)}"),
+        }
+        if teammate is not None:
+            calls[f"adding {teammate.display_name} to the spoiler thread"] = self.spoiler_thread.add_user(teammate)
+        # every call is waited for even if one fails, the entry is recorded either way
+        results = await asyncio.gather(*calls.values(), return_exceptions=True)
+        failed = []
+        for step, result in zip(calls, results):
+            if isinstance(result, Exception):
+                logging.error("submission to %s by %s: %s failed", self.name, runner.display_name, step,
+                              exc_info=result)
+                failed.append(step)
+        if failed:
+            await runner.send(f"Your submission to {self.name} was recorded, but something went wrong "
+                              f"{' and '.join(failed)}. Please let the race owner know.")
 
     async def spectate(self, user):
         """
         Adds the user to the spoiler thread for this race
         """
-        entry = AsyncLeaderboardEntry(user, "00:00:00", None, False, True)
-        self.leaderboard.append(entry)
+        if user.id in self.spectators:
+            return
+        await self._ensure_threads()
+        self.spectators.add(user.id)
         await self.spoiler_thread.add_user(user)
         await self.spoiler_thread.send(f"{user.mention} is now spectating!")
 
+    async def _update_spoiler_leaderboard(self, content=None):
+        """
+        Brings the spoiler leaderboard messages up to date, editing only the pages that changed
+        and posting new pages when the leaderboard outgrows the existing messages.
+        content replaces the rendered leaderboard, for the placeholder posted at the start.
+        """
+        async with self._spoiler_lock:
+            await self._sync_spoiler_pages(content)
+
+    async def _sync_spoiler_pages(self, content):
+        if content is None:
+            pages, _ = paginate(self.leaderboard.render_lines(show_bins=False), header="Current Leaderboard:\n")
+        else:
+            pages = [content]
+
+        # after a restart the posted content is unknown, so every page is edited once
+        for index in changed_pages(self._spoiler_pages, pages):
+            if index < len(self.spoiler_leaderboard_message_ids):
+                message = self.spoiler_thread.get_partial_message(self.spoiler_leaderboard_message_ids[index])
+                await self._edit_message(message, pages[index])
+            else:
+                message = await self.spoiler_thread.send(pages[index])
+                self.spoiler_leaderboard_message_ids.append(message.id)
+                if self.editor is not None:
+                    self.editor.sent(message.id, pages[index])
+                if index == 0:
+                    await message.pin()
+
+        # the leaderboard packed into fewer pages than before
+        removed = self.spoiler_leaderboard_message_ids[len(pages):]
+        if self.editor is not None:
+            self.editor.forget(removed)
+        for message_id in removed:
+            await self.spoiler_thread.get_partial_message(message_id).delete()
+        del self.spoiler_leaderboard_message_ids[len(pages):]
+        self._spoiler_pages = pages
+
+    async def _edit_message(self, message, content):
+        if self.editor is not None:
+            self.editor.edit(message, content)
+        else:
+            await message.edit(content=content)
+
+    async def _flush_edits(self):
+        """
+        Sends any debounced edits to this race's messages and stops tracking them
+        """
+        if self.editor is None:
+            return
+        message_ids = [self.leaderboard_message_id] + self.spoiler_leaderboard_message_ids
+        await self.editor.flush(message_ids)
+        self.editor.forget(message_ids)
+
+    def is_spectator(self, user_id):
+        return user_id in self.spectators
+
     def is_owner(self, user):
         """
         Returns true if the current user is the owner of this race
@@ -304,111 +495,140 @@ class AsyncRace:
         """
         Returns the leaderboard as a comma separated string
         """
-        leaderboard_str = "Runner,Time,VOD,Bin\n"
-        leaderboard_str = leaderboard_str + self._build_leaderboard_string(comma_separated=True)
-        return leaderboard_str
-
-    def _build_leaderboard_string(self, comma_separated=False, show_bins=True):
-        finished_racers = [entry for entry in self.leaderboard if not entry.is_forfeit and not entry.is_spectator]
-        finished_racers.sort(key=lambda x: x.time_delta)
-        leaderboard_str = ""
-        if len(finished_racers) == 0 and not comma_separated:
-            leaderboard_str = leaderboard_str + "No finishers!\n"
-        else:            
-            bin_end_time = -1
-            bin_number = 1
-            for i, entry in enumerate(finished_racers):
-                # we want to bin the users here as well, based on finish time.
-                if bin_end_time == -1:
-                    # first bin
-                    bin_end_time = entry.time_delta.total_seconds() + 60  # 1 minute bins
-                elif entry.time_delta.total_seconds() > bin_end_time and bin_number < 6:
-                    # runner is in the next bin of six possible bins
-                    bin_number += 1
-                    bin_end_time = entry.time_delta.total_seconds() + (60 * (2 ** (bin_number - 1))) # increase bin size exponentially
-
-                if comma_separated:
-                    if self.is_coop and entry.teammate_name is not None:
-                        leaderboard_str = leaderboard_str + f"{entry.runner_name},{entry.teammate_name},{entry.runner_time},{entry.vod if entry.vod else ''},{entry.teammate_vod if entry.teammate_vod else ''},{bin_number}\n"
-                    else:
-                        leaderboard_str = leaderboard_str + f"{entry.runner_name},{entry.runner_time},{entry.vod if entry.vod else ''},{bin_number}\n"
-                else:
-                    if show_bins:
-                        leaderboard_str = leaderboard_str + f"{i+1}. {str(entry)} (Bin {bin_number})\n"
-                    else:
-                        leaderboard_str = leaderboard_str + f"{i+1}. {str(entry)}\n"                            
-
-        forfeits = [entry for entry in self.leaderboard if entry.is_forfeit and not entry.is_spectator]
-        if len(forfeits) > 0:
-            if not comma_separated:
-                leaderboard_str = leaderboard_str + "\nForfeits:\n"
-            for i, entry in enumerate(forfeits):
-                if comma_separated:
-                    leaderboard_str = leaderboard_str + f"{entry.runner_name},DNF,,\n"
-                else:
-                    leaderboard_str = leaderboard_str + f"{i+1}. {str(entry)}\n"
-
-        return leaderboard_str
-    
+        return "Runner,Time,VOD,Bin\n" + self.leaderboard.render_csv(self.is_coop)
+
     def __eq__(self, other):
         if self.race_id is not None:
             return self.race_id == other.race_id
         return self.name == other.name and self.race_channel == other.race_channel
 
+def parse_time(runner_time: str):
+    """
+    Parses a time in H:MM:SS (or MM:SS) format into seconds, raises ValueError if it isn't one
+    """
+    parts = runner_time.split(":")
+    if len(parts) == 2:
+        # allow for MM:SS format
+        parts.insert(0, "0")
+    if len(parts) != 3 or not all(0 < len(part) <= 2 and part.isdigit() for part in parts):
+        raise ValueError(f"invalid time {runner_time}")
+    hours, minutes, seconds = int(parts[0]), int(parts[1]), int(parts[2])
+    if hours > 23 or minutes > 59 or seconds > 59:
+        raise ValueError(f"invalid time {runner_time}")
+    return hours * 3600 + minutes * 60 + seconds
+
+
 class AsyncLeaderboardEntry:
     """
     Entry in the leaderboard for an async race
     """
+    __slots__ = (
+        "runner_id", "runner_name", "seconds", "vod", "is_forfeit", "is_spectator",
+        "teammate_id", "teammate_name", "teammate_vod", "_display",
+    )
 
-    def __init__(self, runner, runner_time: str, vod: str, is_forfeit=False, is_spectator=False, teammate: discord.Member | None = None, teammate_vod: str | None = None):
+    def __init__(self, runner, seconds: int, vod: str, is_forfeit=False, is_spectator=False, teammate: discord.Member | None = None, teammate_vod: str | None = None):
         """
-        runner_name - name of the submitter to the leaderboard
-        time - runners time in HH:MM:SS format
+        runner - the submitter to the leaderboard
+        seconds - runners time in seconds, see parse_time
         vod - link to the vod for this run
         is_forfeit - True if this entry is a forfeit / DNF, false otherwise
         """
         self.runner_id = runner.id
         self.runner_name = re.sub("[()-]", "", runner.display_name)
-        self.runner_time = runner_time
-        self.time_delta = self._get_time_delta(runner_time)
+        self.seconds = seconds
         self.vod = vod
         self.is_forfeit = is_forfeit
         self.is_spectator = is_spectator
         self.teammate_name = re.sub("[()-]", "", teammate.display_name) if teammate is not None else None
         self.teammate_id = teammate.id if teammate is not None else None
         self.teammate_vod = teammate_vod
+        self._display = None
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Recreates an entry from its stored fields, without needing the discord members
+        """
+        entry = cls.__new__(cls)
+        entry.__setstate__(data)
+        return entry
+
+    def to_dict(self):
+        return {
+            "runner_id": self.runner_id,
+            "runner_name": self.runner_name,
+            "runner_time": self.runner_time,
+            "vod": self.vod,
+            "is_forfeit": self.is_forfeit,
+            "is_spectator": self.is_spectator,
+            "teammate_id": self.teammate_id,
+            "teammate_name": self.teammate_name,
+            "teammate_vod": self.teammate_vod,
+        }
+
+    def __getstate__(self):
+        return self.to_dict()
+
+    def __setstate__(self, state):
+        # also accepts the __dict__ of entries pickled before they had slots
+        self.runner_id = state["runner_id"]
+        self.runner_name = state["runner_name"]
+        self.seconds = parse_time(state["runner_time"])
+        self.vod = state["vod"]
+        self.is_forfeit = state["is_forfeit"]
+        self.is_spectator = state.get("is_spectator", False)
+        self.teammate_name = state.get("teammate_name")
+        self.teammate_id = state.get("teammate_id")
+        self.teammate_vod = state.get("teammate_vod")
+        self._display = None
+
+    @property
+    def runner_time(self):
+        """
+        The time in HH:MM:SS format
+        """
+        return self.format_seconds(self.seconds)
+
+    @staticmethod
+    def format_seconds(seconds):
+        return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+    @property
+    def display(self):
+        """
+        str(self), cached since entries don't change once submitted
+        """
+        if self._display is None:
+            self._display = str(self)
+        return self._display
 
     def __str__(self):
         if self.is_forfeit:
-            if getattr(self, 'teammate_name', None) is not None:
+            if self.teammate_name is not None:
                 return f"{self.runner_name} and {self.teammate_name} - Forfeit"
             return f"{self.runner_name} - Forfeit"
 
-        totsec = self.time_delta.total_seconds()
-        h = int(totsec // 3600)
-        m = int((totsec % 3600) // 60)
-        s = int((totsec % 3600) % 60)
         # convert the time back to hours minutes and seconds for the
         # leaderboard
-        if getattr(self, 'teammate_name', None) is not None:
+        h = self.seconds // 3600
+        m = self.seconds // 60 % 60
+        s = self.seconds % 60
+        if self.teammate_name is not None:
             entry_str = f"{self.runner_name} and {self.teammate_name} - {h}:{m:02d}:{s:02d}"
         else:
             entry_str = f"{self.runner_name} - {h}:{m:02d}:{s:02d}"
         if self.vod:
             entry_str = entry_str + f" - <{self.vod}>"
-        if getattr(self, 'teammate_vod', None) is not None:
+        if self.teammate_vod is not None:
             entry_str = entry_str + f" - <{self.teammate_vod}>"
 
         return entry_str
 
     def __eq__(self, other):
         if (isinstance(other, AsyncLeaderboardEntry)):
-            return (self.runner_id == other.runner_id and getattr(self, 'teammate_id', None) == getattr(other, 'teammate_id', None)) \
-                or (self.runner_id == getattr(other, 'teammate_id', None) and getattr(self, 'teammate_id', None) == other.runner_id)
+            return (self.runner_id == other.runner_id and self.teammate_id == other.teammate_id) \
+                or (self.runner_id == other.teammate_id and self.teammate_id == other.runner_id)
         elif (isinstance(other, int)):
-            return self.runner_id == other or (getattr(self, 'teammate_id', None) is not None and getattr(self, 'teammate_id', None) == other)
+            return self.runner_id == other or (self.teammate_id is not None and self.teammate_id == other)
         return False
-
-    def _get_time_delta(self, runner_time: str):
-        t = datetime.strptime(runner_time, "%H:%M:%S")
-        return timedelta(hours=t.hour, minutes=t.minute, seconds=t.second)
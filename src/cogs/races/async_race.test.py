@@ -0,0 +1,177 @@
+import asyncio
+import pickle
+import unittest
+from datetime import timedelta
+from types import SimpleNamespace
+
+import discord
+
+from cogs.races.async_race import AsyncLeaderboardEntry, AsyncRace, parse_time
+
+
+def entry_data(**fields):
+    data = {"runner_id": 1,
+            "runner_name": "runner",
+            "runner_time": "01:02:03",
+            "vod": "https://twitch.tv/videos/1",
+            "is_forfeit": False,
+            "is_spectator": False,
+            "teammate_id": None,
+            "teammate_name": None,
+            "teammate_vod": None}
+    data.update(fields)
+    return data
+
+
+class TestParseTime(unittest.TestCase):
+    def test_valid(self):
+        self.assertEqual(parse_time("01:02:03"), 3723)
+        self.assertEqual(parse_time("1:2:3"), 3723)
+        self.assertEqual(parse_time("45:10"), 2710)
+        self.assertEqual(parse_time("00:00:00"), 0)
+
+    def test_invalid(self):
+        for runner_time in ["", "1", "1:2:3:4", "24:00:00", "01:60:00", "01:00:60",
+                            "a:00:00", "-1:00:00", "001:00:00", "1::00", " 1:00:00"]:
+            with self.assertRaises(ValueError, msg=runner_time):
+                parse_time(runner_time)
+
+
+class TestAsyncLeaderboardEntry(unittest.TestCase):
+    def test_round_trip(self):
+        data = entry_data(teammate_id=2, teammate_name="teammate", teammate_vod="https://twitch.tv/videos/2")
+        entry = AsyncLeaderboardEntry.from_dict(data)
+        self.assertEqual(entry.seconds, 3723)
+        self.assertEqual(entry.to_dict(), data)
+        self.assertEqual(pickle.loads(pickle.dumps(entry)).to_dict(), data)
+
+    def test_legacy_state(self):
+        # the __dict__ of an entry pickled before entries had slots
+        entry = AsyncLeaderboardEntry.__new__(AsyncLeaderboardEntry)
+        entry.__setstate__({"runner_id": 1, "runner_name": "runner", "runner_time": "01:02:03",
+                            "time_delta": timedelta(seconds=3723), "vod": None,
+                            "is_forfeit": False, "is_spectator": False})
+        self.assertEqual(entry.seconds, 3723)
+        self.assertIsNone(entry.teammate_id)
+        self.assertEqual(str(entry), "runner - 1:02:03")
+
+    def test_display(self):
+        entry = AsyncLeaderboardEntry.from_dict(entry_data())
+        self.assertEqual(entry.display, "runner - 1:02:03 - <https://twitch.tv/videos/1>")
+        forfeit = AsyncLeaderboardEntry.from_dict(entry_data(is_forfeit=True, runner_time="00:00:00"))
+        self.assertEqual(forfeit.display, "runner - Forfeit")
+
+    def test_equality(self):
+        entry = AsyncLeaderboardEntry.from_dict(entry_data(teammate_id=2))
+        self.assertEqual(entry, 1)
+        self.assertEqual(entry, 2)
+        self.assertNotEqual(entry, 3)
+
+
+class FakeMessage:
+    def __init__(self, id):
+        self.id = id
+
+    async def edit(self, content):
+        pass
+
+    async def pin(self):
+        pass
+
+    async def delete(self):
+        pass
+
+
+class FakeThread:
+    def __init__(self, id, fail_add=False):
+        self.id = id
+        self.fail_add = fail_add
+        self.sent = []
+
+    def get_partial_message(self, id):
+        return FakeMessage(id)
+
+    async def send(self, content):
+        await asyncio.sleep(0)
+        self.sent.append(content)
+        return FakeMessage(len(self.sent) + 100)
+
+    async def add_user(self, user):
+        await asyncio.sleep(0)
+        if self.fail_add:
+            raise discord.Forbidden(SimpleNamespace(status=403, reason="Forbidden"), "missing access")
+
+
+class FakeRunner:
+    def __init__(self, id):
+        self.id = id
+        self.display_name = f"runner {id}"
+        self.mention = f"<@{id}>"
+        self.dms = []
+
+    async def send(self, content):
+        self.dms.append(content)
+
+
+class FakeGuild:
+    def __init__(self, threads):
+        self.threads = threads
+
+    def get_thread(self, id):
+        return None
+
+    async def fetch_channel(self, id):
+        await asyncio.sleep(0.01)
+        return self.threads[id]
+
+
+class TestSubmit(unittest.IsolatedAsyncioTestCase):
+    def make_race(self, spoiler_thread, is_coop=False):
+        race_thread = FakeThread(3)
+        channel = SimpleNamespace(id=2, guild=FakeGuild({3: race_thread, 4: spoiler_thread}),
+                                  get_thread=lambda id: None)
+        race = AsyncRace(channel, "test race", SimpleNamespace(id=1, display_name="owner"), "flags",
+                         is_coop=is_coop)
+        # neither thread is cached, so submitting has to fetch them first
+        race.race_thread_id = 3
+        race.spoiler_thread_id = 4
+        race.leaderboard_message_id = 5
+        race.spoiler_leaderboard_message_ids = [6]
+        race.is_started = True
+        return race
+
+    async def test_concurrent_duplicate_submissions(self):
+        race = self.make_race(FakeThread(4))
+        runner = FakeRunner(10)
+        await asyncio.gather(race.submit(runner, "1:00:00", "vod", False),
+                             race.submit(runner, "1:01:00", "vod", False))
+        self.assertEqual(len(race.leaderboard), 1)
+        self.assertEqual(runner.dms, ["You have already submitted a time for this race"])
+
+    async def test_failed_call_is_reported_and_the_others_still_run(self):
+        spoiler_thread = FakeThread(4, fail_add=True)
+        race = self.make_race(spoiler_thread)
+        runner = FakeRunner(10)
+        with self.assertLogs(level="ERROR"):
+            await race.submit(runner, "1:00:00", "vod", False)
+        self.assertIn(10, race.leaderboard)
+        self.assertIn("GG <@10> on your time of 01:00:00!", spoiler_thread.sent)
+        self.assertEqual(len(runner.dms), 1)
+        self.assertIn("adding you to the spoiler thread", runner.dms[0])
+
+    async def test_concurrent_updates_post_a_new_page_once(self):
+        spoiler_thread = FakeThread(4)
+        race = self.make_race(spoiler_thread)
+        await race._ensure_threads()
+        await race._update_spoiler_leaderboard()
+        for runner_id in range(10, 110):
+            race.leaderboard.append(AsyncLeaderboardEntry(FakeRunner(runner_id), 3600 + runner_id, "vod"))
+        # two submissions that both push the leaderboard onto a second page
+        await asyncio.gather(race._update_spoiler_leaderboard(), race._update_spoiler_leaderboard())
+        self.assertEqual(len(race._spoiler_pages), 2)
+        self.assertEqual(spoiler_thread.sent, race._spoiler_pages[1:])
+        self.assertEqual(race.spoiler_leaderboard_message_ids, [6, 101])
+
+
+if __name__ == '__main__':
+    unittest.main()
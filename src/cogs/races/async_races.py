@@ -1,7 +1,7 @@
 import io
 import re
 import logging
-import pickle
+import time
 import traceback
 from datetime import datetime, timedelta
 from typing import List, Optional
@@ -13,8 +13,18 @@ from discord.utils import get
 import pytz
 
 import constants
+from cogs.races import async_stats
 from cogs.races.async_race import AsyncRace
 from cogs.global_checks import is_admin
+from startup_profiler import profiler
+from storage import serialization
+import task_pool
+from edit_coalescer import EditCoalescer
+from scheduler import DeadlineScheduler
+from storage.job_queue import JobQueue
+
+# max number of saved races rehydrated at the same time on startup
+REHYDRATE_CONCURRENCY = 5
 
 async def coop_autocomplete(
     interaction: discord.Interaction, 
@@ -158,9 +168,12 @@ class CreateAsyncModal(ui.Modal):
                 self.coop_mode,
             )
 
-            await race.init_race()
+            race.editor = self.cog.editor
+            await race.init_race(self.cog.member_adder)
             self.cog.active_races[race.race_id] = race
+            self.cog.schedule_race(race)
             self.cog._save_one(race)
+            await self.cog.persistence.flush_now()
 
             await interaction.followup.send(f"✅ Async race '{name}' created successfully!", ephemeral=True)
         except Exception as e:
@@ -172,10 +185,30 @@ class CreateAsyncModal(ui.Modal):
 
 class AsyncRaces(commands.Cog):
 
-    def __init__(self, bot, redis_db):
+    def __init__(self, bot, redis_db, persistence, member_adder):
         self.bot = bot
         self.redis_db = redis_db
+        self.persistence = persistence
+        self.member_adder = member_adder
         self.active_races = dict()
+        # last saved metadata blob and number of saved leaderboard entries per race,
+        # so a save only writes what changed since the previous one
+        self._saved_meta = dict()
+        self._saved_entry_counts = dict()
+        # debounces the leaderboard edits of every race
+        self.editor = EditCoalescer()
+        # starts and ends races at their scheduled times, the scheduler is started once
+        # the races are loaded
+        self.scheduler = DeadlineScheduler()
+        self.jobs = JobQueue(redis_db, persistence, self.scheduler)
+        self.jobs.register("start", self._scheduled_start)
+        self.jobs.register("end", self._scheduled_end)
+        self.jobs.on_failure(self._report_transition_error)
+        self._jobs_loaded = False
+
+    async def cog_unload(self):
+        await self.scheduler.close()
+        await self.editor.flush()
 
     async def load_data(self, bot):
         try:
@@ -186,6 +219,9 @@ class AsyncRaces(commands.Cog):
             await self._send_error(message)
             logging.error("Error loading saved races")
             logging.exception(e)
+        finally:
+            # scheduled starts and ends run once the races they act on are loaded
+            self.scheduler.start()
 
     def is_async_race(self, channel_id):
         return self.active_races.get(channel_id) is not None
@@ -195,6 +231,8 @@ class AsyncRaces(commands.Cog):
 
     def remove_race(self, race):
         del self.active_races[race.race_id]
+        self.jobs.cancel(f"start:{race.race_id}")
+        self.jobs.cancel(f"end:{race.race_id}")
         self._delete_one(race.race_id)
 
     def is_async_race_crew_member(self, user):
@@ -238,6 +276,8 @@ class AsyncRaces(commands.Cog):
         
         await race.start_race()
         self._save_one(race)
+        await self.persistence.flush_now()
+        self.schedule_race(race)
 
 
     @commands.command()
@@ -256,6 +296,7 @@ class AsyncRaces(commands.Cog):
 
         await race.end_race()
         self.remove_race(race)
+        await self.persistence.flush_now()
         await ctx.message.delete()
     
     @commands.command(aliases=["cancel"])
@@ -274,6 +315,7 @@ class AsyncRaces(commands.Cog):
         if not race.is_started and not race.is_finished:
             await race.cancel_race()
             self.remove_race(race)
+            await self.persistence.flush_now()
             return
         
         await ctx.author.send("The ?cancelasync command must be used only in scheduled async races that have not yet started. Use ?endasync instead")
@@ -336,7 +378,9 @@ class AsyncRaces(commands.Cog):
             # if it is not an active race, try and submit it to the leaderboard
             await self.submit_leaderboard(ctx, runnertime)        
         else:
+            start = time.perf_counter()
             await race.submit(ctx.author, runnertime, vod, False, teammate, teammate_vod)
+            logging.info("submission to %s took %.0fms", race.name, (time.perf_counter() - start) * 1000)
             self._save_one(race)
 
         if ctx.interaction:
@@ -783,39 +827,64 @@ class AsyncRaces(commands.Cog):
         await participants.edit(content=new_participants)
 
 
-    async def periodic_race_update(self):
+    def schedule_race(self, race):
         """
-        Meant to be called periodically from the asyncio loop. This
-        function checks to see if there are any pending races that need to be started,
-        or active races that have an end time set.
+        Schedules (or moves) the start or end of the race as jobs. Must be called whenever a race
+        is created, started or its times change; removing a race cancels its jobs.
         """
-        current_time = datetime.now()
-        
-        # check for active races that should end
-        # we have to take a copy because we will mutate active races
-        # as a part of this loop
-        races = list(self.active_races.values())[:]
-        try:
-            for race in races:
-                if (
-                    not race.is_started
-                    and race.start_time is not None
-                    and race.start_time < current_time
-                ):
-                    await race.start_race()
-                    self._save_one(race)
-                if (
-                    race.is_started
-                    and race.end_time is not None
-                    and race.end_time < current_time
-                ):
-                    await race.end_race()
-                    self.remove_race(race)
-        except Exception as e:
-            poor_soul = self.bot.get_user(constants.poor_soul_id)
-            error_msg = "".join(traceback.TracebackException.from_exception(e).format())[:1950]
-            await poor_soul.send("Error in FFRBot!!")
-            await poor_soul.send(error_msg)
+        race_id = race.race_id
+        if not race.is_started and not race.is_finished and race.start_time is not None:
+            self.jobs.schedule(f"start:{race_id}", race.start_time.timestamp())
+        else:
+            self.jobs.cancel(f"start:{race_id}")
+        # the end is only scheduled once the race has started, a race is never ended before it starts
+        if race.is_started and not race.is_finished and race.end_time is not None:
+            self.jobs.schedule(f"end:{race_id}", race.end_time.timestamp())
+        else:
+            self.jobs.cancel(f"end:{race_id}")
+
+    async def _scheduled_start(self, race_id):
+        race = self.get_race(int(race_id))
+        if race is None or race.is_started or race.is_finished:
+            logging.info("skipping scheduled start of race %s, it isn't waiting to start", race_id)
+            return
+        await race.start_race()
+        self._save_one(race)
+        await self.persistence.flush_now()
+        self.schedule_race(race)
+
+    async def _scheduled_end(self, race_id):
+        race = self.get_race(int(race_id))
+        if race is None or not race.is_started or race.is_finished:
+            logging.info("skipping scheduled end of race %s, it isn't running", race_id)
+            return
+        await race.end_race()
+        self.remove_race(race)
+        await self.persistence.flush_now()
+
+    async def _report_transition_error(self, key, e):
+        poor_soul = self.bot.get_user(constants.poor_soul_id)
+        error_msg = "".join(traceback.TracebackException.from_exception(e).format())[:1900]
+        await poor_soul.send(f"Error in FFRBot!! scheduled {key} gave up")
+        await poor_soul.send(error_msg)
+
+    @commands.command()
+    async def upcoming(self, ctx):
+        """
+        Sends the race crew the scheduled async race starts and ends
+        """
+        await ctx.message.delete()
+        if not self.is_async_race_crew_member(ctx.author):
+            await ctx.author.send("Only the race crew can see the scheduled races")
+            return
+
+        lines = []
+        for due, key in self.jobs.upcoming(limit=25):
+            transition, race_id = key.split(":")
+            race = self.get_race(int(race_id))
+            name = race.name if race is not None else race_id
+            lines.append(f"<t:{int(due)}:F> (<t:{int(due)}:R>) - {transition} {name}")
+        await ctx.author.send("\n".join(lines) if lines else "No scheduled async race starts or ends")
 
 
     @commands.Cog.listener()
@@ -862,36 +931,159 @@ class AsyncRaces(commands.Cog):
         await ctx.author.send(f"Here is the CSV export of the current leaderboard for {race.name}:", file=discord.File(fp=file_data, filename=f"{race.name}_leaderboard.csv"))
 
 
+    @commands.command()
+    async def stats(self, ctx, binning: str | None = None):
+        """
+        Sends the owner (or an admin) statistics on the finish times of the race
+        """
+        race = self.get_race(ctx.channel.id)
+
+        await ctx.message.delete()
+
+        if race is None:
+            await ctx.author.send("The ?stats command must be used in an active async race thread")
+            return
+
+        if not race.is_owner(ctx.author) and not is_admin(ctx.author):
+            await ctx.author.send("Only the race owner or admin can see the race stats")
+            return
+
+        binning = binning or race.leaderboard.binning
+        if binning not in async_stats.STRATEGIES:
+            await ctx.author.send(f"Binning must be one of: {', '.join(async_stats.STRATEGIES)}")
+            return
+
+        stats = race.leaderboard.stats(binning)
+        await ctx.author.send(f"Stats for {race.name}:\n" + async_stats.format_stats(stats, binning))
+
+    @commands.command()
+    async def binning(self, ctx, binning: str):
+        """
+        Sets how the race's finishers are binned on the final leaderboard and the CSV export
+        """
+        race = self.get_race(ctx.channel.id)
+
+        await ctx.message.delete()
+
+        if race is None:
+            await ctx.author.send("The ?binning command must be used in an active async race thread")
+            return
+
+        if not race.is_owner(ctx.author) and not is_admin(ctx.author):
+            await ctx.author.send("Only the race owner or admin can change the binning")
+            return
+
+        try:
+            race.leaderboard.set_binning(binning)
+        except ValueError:
+            await ctx.author.send(f"Binning must be one of: {', '.join(async_stats.STRATEGIES)}")
+            return
+        self._save_one(race)
+        await ctx.author.send(f"{race.name} now uses {binning} binning")
+
     async def _load_data(self, bot):
         logging.info("loading saved races")
-        temp = dict(self.redis_db.hgetall('races'))
-        for k, v in temp.items():
-            race_data = pickle.loads(v)
+        if not self._jobs_loaded:
+            # armed before the races are loaded, so races without stored jobs can be told apart.
+            # nothing runs until the scheduler is started below
+            await self.jobs.load()
+            self._jobs_loaded = True
+        with profiler.phase("redis: async races"):
+            temp = dict(await self.redis_db.hgetall('races'))
+        await serialization.migrate_hash(
+            self.redis_db, "races", temp, serialization.load_async_race, serialization.dump_async_race
+        )
+        # on_ready fires again after a reconnect, races already in memory don't need reloading
+        pending = [(k, v) for k, v in temp.items() if int(k) not in self.active_races]
+
+        async def load_one(item):
+            race_data = serialization.load_async_race(item[1])
+            # races saved before entries were stored separately still carry their leaderboard inline
+            inline_entries = race_data["leaderboard"]
+            stored_entries = await self.redis_db.hgetall(self._entries_key(race_data["race_id"]))
+            race_data["leaderboard"] = inline_entries + [
+                serialization.load_leaderboard_entry(blob)
+                for _, blob in sorted(stored_entries.items(), key=lambda kv: int(kv[0]))
+            ]
             logging.debug(race_data)
-            self.active_races[race_data["race_id"]] = await AsyncRace.from_dict(race_data, bot)
-            logging.debug(f"loaded race {self.active_races[race_data['race_id']]}")
+            race = await AsyncRace.from_dict(race_data, bot)
+            race.editor = self.editor
+            if len(inline_entries) == 0 and len(race.leaderboard) == len(stored_entries):
+                self._saved_entry_counts[race.race_id] = len(stored_entries)
+                self._saved_meta[race.race_id] = item[1]
+            else:
+                # split an inline leaderboard out into per entry records, or rewrite the
+                # records without the spectators that used to be stored as entries
+                self._saved_entry_counts[race.race_id] = 0
+                self._save_one(race)
+            self.active_races[race.race_id] = race
+            if not any(f"{kind}:{race.race_id}" in self.scheduler for kind in ("start", "end")):
+                # races saved before their starts and ends were stored as jobs
+                self.schedule_race(race)
+            return race
+
+        # races are rehydrated concurrently (bounded to stay well inside discord's rate limits),
+        # and a race that fails to load doesn't stop the others from loading
+        results = await task_pool.run_bounded(
+            pending, load_one,
+            limit=REHYDRATE_CONCURRENCY,
+            give_up_on=(discord.NotFound, discord.Forbidden, serialization.UnsupportedFormat, ValueError),
+            key=lambda item: item[0].decode("utf-8"),
+        )
+        summary = task_pool.summarize("loaded saved races", results)
+        logging.info(summary)
+        for result in results:
+            logging.debug(str(result))
+        if any(not result.ok for result in results):
+            await self._send_error(summary[:1950])
 
     def _save_one(self, race):
-        logging.info(f"saving race {race.race_id}")
-        race_data = race.to_dict()
-        self.redis_db.hset("races",
-                           race.race_id, pickle.dumps(race_data,
-                                            protocol=pickle.HIGHEST_PROTOCOL))
-        logging.info("saved")
-        self._verify_save(race)
+        """
+        Queues a save of the race. The write-behind queue coalesces repeated saves,
+        and the writer only writes the metadata (if it changed) and any leaderboard
+        entries added since the last save, so a submission costs a single small write.
+        """
+        self.persistence.mark_dirty(f"races:{race.race_id}", lambda pipe: self._write_race(pipe, race))
+
+    def _write_race(self, pipe, race):
+        race_id = race.race_id
+        meta = serialization.dump_async_race(race.to_dict(include_leaderboard=False))
+        entry_count = len(race.leaderboard)
+        saved_count = self._saved_entry_counts.get(race_id, 0)
+        new_entries = {
+            str(index): serialization.dump_leaderboard_entry(entry.to_dict())
+            for index, entry in enumerate(race.leaderboard[saved_count:entry_count], start=saved_count)
+        }
+        meta_changed = self._saved_meta.get(race_id) != meta
+        if meta_changed:
+            pipe.hset("races", race_id, meta)
+        if new_entries:
+            if saved_count == 0:
+                # nothing saved yet, or the records are being rewritten from scratch
+                pipe.delete(self._entries_key(race_id))
+            pipe.hset(self._entries_key(race_id), mapping=new_entries)
+        logging.info(f"saving race {race_id}: metadata {meta_changed}, {len(new_entries)} new entries")
+
+        def commit():
+            self._saved_meta[race_id] = meta
+            self._saved_entry_counts[race_id] = entry_count
+        return commit
 
     def _delete_one(self, id):
         logging.info(f"deleting race {id}")
-        self.redis_db.hdel("races", id)
-        logging.info("deleted")
-
-    def _verify_save(self, race):
-        original = race.to_dict()
-        saved = pickle.loads(self.redis_db.hget("races", race.race_id))
-        logging.debug(f"original: {original}")
-        logging.debug(f"saved: {saved}")
-        logging.debug(saved == original)
-        # throw error here?
+        self.persistence.mark_dirty(f"races:{id}", lambda pipe: self._write_delete(pipe, id))
+
+    def _write_delete(self, pipe, id):
+        pipe.hdel("races", id)
+        pipe.delete(self._entries_key(id))
+
+        def commit():
+            self._saved_meta.pop(id, None)
+            self._saved_entry_counts.pop(id, None)
+        return commit
+
+    def _entries_key(self, race_id):
+        return f"races:{race_id}:entries"
 
     async def _send_error(self, message):
         poor_soul = self.bot.get_user(constants.poor_soul_id)
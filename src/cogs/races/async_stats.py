@@ -0,0 +1,137 @@
+"""
+Statistics and binning over the finish times of an async race.
+
+Every function here takes the finish times in seconds, sorted ascending (as kept by
+AsyncLeaderboard), so percentiles are an index lookup and bins are found with bisect
+and prefix sums instead of passes over the whole leaderboard.
+
+A binning strategy returns the positions of the first finisher of each bin.
+"""
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+
+# finishers are split into at most this many bins
+MAX_BINS = 6
+# width of the first exponential bin, each following bin is twice as wide
+FIRST_BIN_SECONDS = 60
+KMEANS_ITERATIONS = 20
+
+
+def exponential_bins(times, bin_count=MAX_BINS):
+    """
+    A bin starts with the first finisher slower than the end of the previous bin,
+    and each bin is twice as wide as the previous one (1, 2, 4, 8, 16, 32 minutes)
+    """
+    starts = []
+    position = 0
+    width = FIRST_BIN_SECONDS
+    while position < len(times) and len(starts) < bin_count:
+        starts.append(position)
+        position = bisect_right(times, times[position] + width)
+        width *= 2
+    return starts
+
+
+def quantile_bins(times, bin_count=MAX_BINS):
+    """
+    Bins with the same number of finishers each, runners with the same time share a bin
+    """
+    starts = []
+    for i in range(min(bin_count, len(times))):
+        position = bisect_left(times, times[i * len(times) // bin_count])
+        if not starts or position > starts[-1]:
+            starts.append(position)
+    return starts
+
+
+def kmeans_bins(times, bin_count=MAX_BINS):
+    """
+    Groups finishers around bin_count centers (1 dimensional k-means). Clusters are
+    contiguous in sorted order, so each iteration is a bisect per boundary and the
+    cluster means come from prefix sums.
+    """
+    if not times:
+        return []
+    prefix = [0] + list(accumulate(times))
+    # start from the centers of the quantile bins
+    starts = quantile_bins(times, bin_count)
+    for _ in range(KMEANS_ITERATIONS):
+        ends = starts[1:] + [len(times)]
+        centers = [(prefix[end] - prefix[start]) / (end - start) for start, end in zip(starts, ends)]
+        new_starts = [0]
+        for low, high in zip(centers, centers[1:]):
+            position = bisect_right(times, (low + high) / 2)
+            if new_starts[-1] < position < len(times):
+                new_starts.append(position)
+        if new_starts == starts:
+            break
+        starts = new_starts
+    return starts
+
+
+STRATEGIES = {
+    "exponential": exponential_bins,
+    "quantile": quantile_bins,
+    "kmeans": kmeans_bins,
+}
+DEFAULT_STRATEGY = "exponential"
+
+
+def percentile(times, fraction):
+    """
+    The time at fraction (0 to 1) of the way through the finishers, interpolated linearly
+    """
+    if not times:
+        return None
+    rank = fraction * (len(times) - 1)
+    low = int(rank)
+    high = min(low + 1, len(times) - 1)
+    return times[low] + (times[high] - times[low]) * (rank - low)
+
+
+def compute_stats(times, strategy=DEFAULT_STRATEGY):
+    """
+    Summary statistics of the finish times, including the bins of the strategy
+    """
+    if not times:
+        return {"finishers": 0}
+    mean = sum(times) / len(times)
+    winner = times[0]
+    starts = STRATEGIES[strategy](times)
+    ends = starts[1:] + [len(times)]
+    return {
+        "finishers": len(times),
+        "winner": winner,
+        "mean": mean,
+        "median": percentile(times, 0.5),
+        "p25": percentile(times, 0.25),
+        "p75": percentile(times, 0.75),
+        "p90": percentile(times, 0.9),
+        "mean_gap": mean - winner,
+        "median_gap": percentile(times, 0.5) - winner,
+        "bins": [(times[start], times[end - 1], end - start) for start, end in zip(starts, ends)],
+    }
+
+
+def format_time(seconds):
+    seconds = int(round(seconds))
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def format_stats(stats, strategy=DEFAULT_STRATEGY):
+    """
+    The stats as a message
+    """
+    if stats["finishers"] == 0:
+        return "No finishers yet"
+    lines = [
+        f"Finishers: {stats['finishers']}",
+        f"Winner: {format_time(stats['winner'])}",
+        f"Median: {format_time(stats['median'])} (+{format_time(stats['median_gap'])} behind the winner)",
+        f"Mean: {format_time(stats['mean'])} (+{format_time(stats['mean_gap'])} behind the winner)",
+        f"25th / 75th / 90th percentile: {format_time(stats['p25'])} / {format_time(stats['p75'])} / {format_time(stats['p90'])}",
+        f"\nBins ({strategy}):",
+    ]
+    for i, (first, last, count) in enumerate(stats["bins"]):
+        lines.append(f"Bin {i + 1}: {format_time(first)} - {format_time(last)} ({count} finishers)")
+    return "\n".join(lines)
@@ -0,0 +1,61 @@
+import random
+import unittest
+
+from cogs.races import async_stats
+
+
+class TestBinning(unittest.TestCase):
+    def test_exponential(self):
+        times = [3600, 3630, 3700, 3800, 4000]
+        # 1st bin ends at 3660, 2nd at 3700 + 120, 3rd at 4000 + 240
+        self.assertEqual(async_stats.exponential_bins(times), [0, 2, 4])
+
+    def test_quantile(self):
+        times = list(range(3600, 3660))
+        starts = async_stats.quantile_bins(times, 6)
+        self.assertEqual(starts, [0, 10, 20, 30, 40, 50])
+
+    def test_quantile_keeps_ties_together(self):
+        times = [100, 100, 100, 100, 200, 300]
+        self.assertEqual(async_stats.quantile_bins(times, 3), [0, 4])
+
+    def test_kmeans_finds_clusters(self):
+        rng = random.Random(3)
+        times = sorted([rng.randint(3600, 3700) for _ in range(50)]
+                       + [rng.randint(5000, 5100) for _ in range(30)]
+                       + [rng.randint(8000, 8100) for _ in range(20)])
+        self.assertEqual(async_stats.kmeans_bins(times, 3), [0, 50, 80])
+
+    def test_strategies_handle_small_boards(self):
+        for strategy in async_stats.STRATEGIES.values():
+            self.assertEqual(strategy([]), [])
+            self.assertEqual(strategy([3600]), [0])
+            starts = strategy([3600, 3600, 3600])
+            self.assertEqual(starts[0], 0)
+            self.assertEqual(starts, sorted(set(starts)))
+
+
+class TestStats(unittest.TestCase):
+    def test_percentile(self):
+        times = [10, 20, 30, 40]
+        self.assertEqual(async_stats.percentile(times, 0), 10)
+        self.assertEqual(async_stats.percentile(times, 0.5), 25)
+        self.assertEqual(async_stats.percentile(times, 1), 40)
+        self.assertIsNone(async_stats.percentile([], 0.5))
+
+    def test_compute_stats(self):
+        stats = async_stats.compute_stats([3600, 3660, 3720, 7200])
+        self.assertEqual(stats["finishers"], 4)
+        self.assertEqual(stats["winner"], 3600)
+        self.assertEqual(stats["median"], 3690)
+        self.assertEqual(stats["mean_gap"], 945)
+        self.assertEqual(sum(count for _, _, count in stats["bins"]), 4)
+        self.assertIn("Bin 1: 1:00:00", async_stats.format_stats(stats))
+
+    def test_no_finishers(self):
+        stats = async_stats.compute_stats([])
+        self.assertEqual(async_stats.format_stats(stats), "No finishers yet")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import asyncio
+import logging
+import time
+
+from discord.utils import DISCORD_EPOCH
+
+COUNT_FROM = 10
+# seconds between two ticks
+TICK_INTERVAL = 1.0
+# weight of the latest send in the running estimate of how long a send takes
+LATENCY_SMOOTHING = 0.3
+
+
+def snowflake_time_ns(snowflake):
+    """
+    The time (wall clock ns, like race times) discord gave the message or interaction with this id
+    """
+    return ((snowflake >> 22) + DISCORD_EPOCH) * 1_000_000
+
+
+class Countdown:
+    """
+    Counts down from count_from to "go!" in a channel, one message per interval.
+
+    Every tick has a fixed deadline measured from the first one, so a slow send delays only
+    its own tick instead of everything after it. Each send is started early by the running
+    estimate of how long a send takes, so the message lands on its deadline.
+
+    After run(), jitter holds how far off its slot each tick landed (in seconds, negative is
+    early), measured from discord's timestamps of the messages, which is what runners saw.
+    """
+
+    def __init__(self, channel, count_from=COUNT_FROM, interval=TICK_INTERVAL):
+        self.channel = channel
+        self.count_from = count_from
+        self.interval = interval
+        self.latency = 0.0
+        self.jitter = []
+
+    async def run(self):
+        """
+        Sends the countdown, returns the "go!" message
+        """
+        labels = [str(count) for count in range(self.count_from, 0, -1)] + ["go!"]
+        messages = []
+        first_landed = None
+        for tick, label in enumerate(labels):
+            if first_landed is not None:
+                delay = first_landed + tick * self.interval - self.latency - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            sent = time.monotonic()
+            messages.append(await self.channel.send(label))
+            landed = time.monotonic()
+            self._observe(landed - sent)
+            if first_landed is None:
+                first_landed = landed
+
+        first = snowflake_time_ns(messages[0].id)
+        self.jitter = [(snowflake_time_ns(message.id) - first) / 1e9 - tick * self.interval
+                       for tick, message in enumerate(messages)]
+        logging.info("countdown in %s: max jitter %.0fms, mean %.0fms, send latency %.0fms",
+                     self.channel.id, max(map(abs, self.jitter)) * 1000,
+                     sum(map(abs, self.jitter)) / len(self.jitter) * 1000, self.latency * 1000)
+        return messages[-1]
+
+    def _observe(self, latency):
+        if self.latency == 0.0:
+            self.latency = latency
+        else:
+            self.latency += LATENCY_SMOOTHING * (latency - self.latency)
@@ -0,0 +1,65 @@
+import asyncio
+import random
+import time
+import unittest
+
+from discord.utils import DISCORD_EPOCH
+
+from cogs.races.countdown import Countdown, snowflake_time_ns
+
+
+def snowflake_now():
+    return (int(time.time() * 1000) - DISCORD_EPOCH) << 22
+
+
+class FakeMessage:
+    def __init__(self, content):
+        self.content = content
+        self.id = snowflake_now()
+
+
+class FakeChannel:
+    """
+    Messages are stamped halfway through a send that takes latency seconds, give or take spread
+    """
+
+    def __init__(self, latency, spread=0.0):
+        self.id = 1
+        self.latency = latency
+        self.spread = spread
+        self.messages = []
+
+    async def send(self, content):
+        latency = self.latency + random.uniform(-self.spread, self.spread)
+        await asyncio.sleep(latency / 2)
+        message = FakeMessage(content)
+        self.messages.append(message)
+        await asyncio.sleep(latency / 2)
+        return message
+
+
+class TestCountdown(unittest.IsolatedAsyncioTestCase):
+    def test_snowflake_time(self):
+        # the example snowflake from discord's api reference, posted at 2016-04-30 11:18:25.796 UTC
+        self.assertEqual(snowflake_time_ns(175928847299117063), 1462015105796 * 1_000_000)
+
+    async def test_counts_down_to_go(self):
+        channel = FakeChannel(0.005)
+        go = await Countdown(channel, count_from=3, interval=0.05).run()
+        self.assertEqual([message.content for message in channel.messages], ["3", "2", "1", "go!"])
+        self.assertIs(go, channel.messages[-1])
+
+    async def test_send_latency_does_not_accumulate(self):
+        channel = FakeChannel(0.03, spread=0.01)
+        countdown = Countdown(channel, count_from=5, interval=0.1)
+        await countdown.run()
+        elapsed = (snowflake_time_ns(channel.messages[-1].id) - snowflake_time_ns(channel.messages[0].id)) / 1e9
+        # sleeping a full interval after every send would take 5 * (0.1 + 0.03)
+        self.assertAlmostEqual(elapsed, 0.5, delta=0.03)
+        self.assertEqual(len(countdown.jitter), 6)
+        self.assertEqual(countdown.jitter[0], 0)
+        self.assertLess(max(map(abs, countdown.jitter)), 0.03)
+
+
+if __name__ == '__main__':
+    unittest.main()
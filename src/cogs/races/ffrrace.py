@@ -1,10 +1,50 @@
 import time
+from bisect import bisect_left, insort
 from datetime import timedelta
 from sys import maxsize
 
+from cogs.races.pagination import paginate, wrap_items
+
+
+class Runner:
+    """
+    An entrant of a race. stime and etime are wall clock ns, etime is None while running
+    and maxsize once forfeited.
+    """
+
+    __slots__ = ("name", "stime", "etime", "ready")
+
+    def __init__(self, name, stime=None, etime=None, ready=False):
+        self.name = name
+        self.stime = stime
+        self.etime = etime
+        self.ready = ready
+
+    def to_dict(self):
+        return {"name": self.name, "stime": self.stime, "etime": self.etime, "ready": self.ready}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["name"], data["stime"], data["etime"], data["ready"])
+
+    @property
+    def finished(self):
+        return self.etime is not None and self.etime != maxsize
+
+    @property
+    def forfeited(self):
+        return self.etime == maxsize
+
+
 class Race:
     """
     A class to model a FFR race
+
+    The finishers are kept sorted by finish time as they finish, and finishers and forfeits
+    are counted, so a runner's placement is a bisect and whether the race is over is a
+    comparison, however many runners there are.
+
+    The entrant listing is rendered once and cached until a runner or their state changes.
     """
 
     def __init__(self, id, name=None, lockable=False, flags=None):
@@ -21,91 +61,182 @@ class Race:
         self.restream = None
         self.lockable = lockable
         self.islocked = False
+        # (etime, runner id) of the runners that finished, fastest first
+        self.finish_order = []
+        self.forfeit_count = 0
+        self._update_pages = None
+
+    def to_dict(self):
+        """
+        Plain data representation of the race, used for journal snapshots.
+        The channel and message are stored as ids.
+        """
+        return {
+            "id": self.id,
+            "name": self.name,
+            "flags": self.flags,
+            "runners": {str(k): v.to_dict() for k, v in self.runners.items()},
+            "started": self.started,
+            "channel_id": self.channel.id if self.channel else None,
+            "owner": self.owner,
+            "readycount": self.readycount,
+            "message_id": self.message.id if self.message else None,
+            "restream": self.restream,
+            "lockable": self.lockable,
+            "islocked": self.islocked,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Creates a race from to_dict's output. The caller is responsible for
+        resolving channel and message from the stored ids.
+        """
+        race = cls(data["id"], data["name"], data["lockable"], data["flags"])
+        race.runners = {int(k): Runner.from_dict(v) for k, v in data["runners"].items()}
+        race.finish_order = sorted((runner.etime, runner_id) for runner_id, runner in race.runners.items()
+                                   if runner.finished)
+        race.forfeit_count = sum(1 for runner in race.runners.values() if runner.forfeited)
+        race.started = data["started"]
+        race.owner = data["owner"]
+        race.readycount = data["readycount"]
+        race.restream = data["restream"]
+        race.islocked = data["islocked"]
+        return race
 
     def addRunner(self, runnerid, runner):
         if not self.islocked:
-            self.runners[runnerid] = dict(
-                [("name", runner), ("stime", None), ("etime", None),
-                 ("ready", False)])
+            self.runners[runnerid] = Runner(runner)
+            self._changed()
         else:
             raise RaceLocked
 
     def removeRunner(self, runnerid):
+        self._clearResult(runnerid)
         del self.runners[runnerid]
+        self._changed()
 
     def ready(self, runnerid):
-        if (self.runners[runnerid]["ready"]):
+        if (self.runners[runnerid].ready):
             return
-        self.runners[runnerid]["ready"] = True
+        self.runners[runnerid].ready = True
         self.readycount += 1
+        self._changed()
 
     def unready(self, runnerid):
-        if (self.runners[runnerid]["ready"] is False):
+        if (self.runners[runnerid].ready is False):
             return
-        self.runners[runnerid]["ready"] = False
+        self.runners[runnerid].ready = False
         self.readycount -= 1
+        self._changed()
 
-    def start(self):
+    def start(self, stime=None):
+        # times are wall clock ns so a race restored after a restart keeps running
         self.started = True
-        stime = time.perf_counter_ns()
-        for runnerid in self.runners.values():
-            runnerid["stime"] = stime
+        self._changed()
+        if stime is None:
+            stime = time.time_ns()
+        for runner in self.runners.values():
+            runner.stime = stime
 
-    def done(self, runnerid):
-        etime = time.perf_counter_ns()
+    def done(self, runnerid, etime=None):
+        """
+        Records the runner's finish. Returns their placement and time, or the results
+        once everyone is done.
+        """
+        if etime is None:
+            etime = time.time_ns()
+        self._clearResult(runnerid)
         runner = self.runners[runnerid]
-        runner["etime"] = etime
+        runner.etime = etime
+        insort(self.finish_order, (etime, runnerid))
+        self._changed()
 
         if (self.isFinished()):
             return self.getFinishedRaceMessage(True)
 
-        rval = self._getTimeDeltaStr(etime, runner["stime"])
-        return self.runners[runnerid]["name"] + ": " + rval
+        rval = self._getTimeDeltaStr(etime, runner.stime)
+        return str(self.placement(runnerid)) + ") " + runner.name + ": " + rval
 
     def undone(self, runnerid):
-        self.runners[runnerid]["etime"] = None
-        return self.runners[runnerid]["name"] + " is back in the race!"
+        self._clearResult(runnerid)
+        self.runners[runnerid].etime = None
+        self._changed()
+        return self.runners[runnerid].name + " is back in the race!"
 
     def forfeit(self, runnerid):
-        self.runners[runnerid]["etime"] = maxsize
+        self._clearResult(runnerid)
+        self.runners[runnerid].etime = maxsize
+        self.forfeit_count += 1
+        self._changed()
         if (self.isFinished()):
             return self.getFinishedRaceMessage(True)
 
-        return self.runners[runnerid]["name"] + " forfeited"
+        return self.runners[runnerid].name + " forfeited"
+
+    def placement(self, runnerid):
+        """
+        The runner's place among the finishers so far (runners with the same time share it),
+        None if they haven't finished
+        """
+        runner = self.runners[runnerid]
+        if not runner.finished:
+            return None
+        return bisect_left(self.finish_order, (runner.etime,)) + 1
 
     def getUpdate(self):
-        rval = "Current Entrants:\n"
-        for runner in self.runners.values():
-            rval += runner["name"] + " "
-            if (self.started):
-                if (runner["etime"] is maxsize):
-                    rval += "forfeited"
-                elif (runner["etime"] is not None):
-                    runner_time = self._getTimeDeltaStr(runner["etime"], runner["stime"])
-                    rval += "done: " + runner_time
-                else:
-                    rval += "still going"
-            else:
-                rval += ("ready" if runner["ready"] else "not ready")
-            rval += "\n"
-        return rval
+        """
+        The entrants grouped by state (ready / not ready before the start, done / still going /
+        forfeited after), as pages that each fit in a message
+        """
+        if self._update_pages is None:
+            self._update_pages = self._renderUpdate()
+        return self._update_pages
+
+    def _renderUpdate(self):
+        lines = []
+        if (self.started):
+            running = [runner.name for runner in self.runners.values() if runner.etime is None]
+            forfeited = [runner.name for runner in self.runners.values() if runner.forfeited]
+            summary = (str(len(self.finish_order)) + " done, " + str(len(running)) + " still going, "
+                       + str(len(forfeited)) + " forfeited")
+            if self.finish_order:
+                lines.append("\nDone (" + str(len(self.finish_order)) + "):\n")
+                for place, (etime, runnerid) in enumerate(self.finish_order, 1):
+                    runner = self.runners[runnerid]
+                    lines.append(str(place) + ") " + runner.name + ": "
+                                 + self._getTimeDeltaStr(etime, runner.stime) + "\n")
+            groups = [("Still going", running), ("Forfeited", forfeited)]
+        else:
+            ready = [runner.name for runner in self.runners.values() if runner.ready]
+            not_ready = [runner.name for runner in self.runners.values() if not runner.ready]
+            summary = str(len(ready)) + " ready, " + str(len(not_ready)) + " not ready"
+            groups = [("Ready", ready), ("Not ready", not_ready)]
+        for title, names in groups:
+            if names:
+                lines.append("\n" + title + " (" + str(len(names)) + "):\n")
+                lines.extend(wrap_items(names))
+        header = "Current Entrants (" + str(len(self.runners)) + "): " + summary + "\n"
+        pages, _ = paginate(lines, header)
+        return pages
 
     def getTime(self):
         first = next(iter(self.runners.values()))
-        return self._getTimeDeltaStr(time.perf_counter_ns(),  first["stime"])
+        return self._getTimeDeltaStr(time.time_ns(),  first.stime)
 
     def getFinishedRaceMessage(self, spoiler=False):
         rstring = "Race " + self.name + " results:\n\n"
         place = 0
         rstring += "||" if spoiler else ""
-        for runner in sorted(list(self.runners.values()),
-                             key=lambda k: k["etime"]):
+        for etime, runnerid in self.finish_order:
             place += 1
-            rstring += str(place) + ") " + runner["name"] + ": "
-            if (runner["etime"] is maxsize):
-                rstring += "Forfeited\n"
-            else:
-                rstring += self._getTimeDeltaStr(runner["etime"], runner["stime"]) + "\n"
+            runner = self.runners[runnerid]
+            rstring += str(place) + ") " + runner.name + ": "
+            rstring += self._getTimeDeltaStr(etime, runner.stime) + "\n"
+        for runner in self.runners.values():
+            if runner.forfeited:
+                place += 1
+                rstring += str(place) + ") " + runner.name + ": Forfeited\n"
         rstring += "||" if spoiler else ""
         return rstring
 
@@ -120,7 +251,20 @@ class Race:
             self.islocked = False
 
     def isFinished(self):
-        return all(r["etime"] is not None for r in self.runners.values())
+        return len(self.finish_order) + self.forfeit_count == len(self.runners)
+
+    def _changed(self):
+        self._update_pages = None
+
+    def _clearResult(self, runnerid):
+        """
+        Takes the runner's finish or forfeit out of the standings, before it changes
+        """
+        runner = self.runners[runnerid]
+        if runner.forfeited:
+            self.forfeit_count -= 1
+        elif runner.finished:
+            del self.finish_order[bisect_left(self.finish_order, (runner.etime, runnerid))]
 
     def _getTimeDeltaStr(self, end_time, start_time):
         return str(timedelta(microseconds=round(end_time - start_time, -3) // 1000))
@@ -0,0 +1,95 @@
+import unittest
+from sys import maxsize
+
+from cogs.races.ffrrace import Race
+
+SECOND = 1_000_000_000
+
+
+class TestRace(unittest.TestCase):
+    def setUp(self):
+        self.race = Race(1, "test race")
+        for runner_id in range(1, 5):
+            self.race.addRunner(runner_id, f"runner {runner_id}")
+        self.race.start(0)
+
+    def test_done_returns_placement(self):
+        self.assertEqual(self.race.done(3, 90 * SECOND), "1) runner 3: 0:01:30")
+        self.assertEqual(self.race.done(1, 60 * SECOND), "1) runner 1: 0:01:00")
+        self.assertEqual(self.race.placement(3), 2)
+        self.assertEqual(self.race.done(2, 60 * SECOND), "1) runner 2: 0:01:00")
+        self.assertEqual(self.race.placement(3), 3)
+        self.assertIsNone(self.race.placement(4))
+
+    def test_finished_after_everyone_finishes_or_forfeits(self):
+        self.race.done(1, 60 * SECOND)
+        self.race.forfeit(2)
+        self.race.done(3, 30 * SECOND)
+        self.assertFalse(self.race.isFinished())
+        results = self.race.forfeit(4)
+        self.assertTrue(self.race.isFinished())
+        self.assertEqual(results, "Race test race results:\n\n||"
+                                  "1) runner 3: 0:00:30\n"
+                                  "2) runner 1: 0:01:00\n"
+                                  "3) runner 2: Forfeited\n"
+                                  "4) runner 4: Forfeited\n||")
+
+    def test_undone_and_changing_result(self):
+        self.race.done(1, 60 * SECOND)
+        self.race.done(2, 70 * SECOND)
+        self.race.undone(1)
+        self.assertEqual(self.race.placement(2), 1)
+        self.race.forfeit(2)
+        self.assertEqual(self.race.finish_order, [])
+        self.assertEqual(self.race.forfeit_count, 1)
+        self.race.done(2, 80 * SECOND)
+        self.assertEqual(self.race.forfeit_count, 0)
+        self.assertEqual(self.race.finish_order, [(80 * SECOND, 2)])
+        self.race.removeRunner(2)
+        self.assertEqual(self.race.finish_order, [])
+
+    def test_entrants_grouped_by_state(self):
+        race = Race(2, "fresh race")
+        for runner_id in range(1, 4):
+            race.addRunner(runner_id, f"runner {runner_id}")
+        race.ready(2)
+        self.assertEqual(race.getUpdate(), ["Current Entrants (3): 1 ready, 2 not ready\n"
+                                            "\nReady (1):\nrunner 2\n"
+                                            "\nNot ready (2):\nrunner 1, runner 3\n"])
+        self.race.done(2, 60 * SECOND)
+        self.race.forfeit(4)
+        self.assertEqual(self.race.getUpdate(), ["Current Entrants (4): 1 done, 2 still going, 1 forfeited\n"
+                                                 "\nDone (1):\n1) runner 2: 0:01:00\n"
+                                                 "\nStill going (2):\nrunner 1, runner 3\n"
+                                                 "\nForfeited (1):\nrunner 4\n"])
+
+    def test_entrants_cached_until_a_change(self):
+        pages = self.race.getUpdate()
+        self.assertIs(self.race.getUpdate(), pages)
+        self.race.done(1, 60 * SECOND)
+        self.assertIsNot(self.race.getUpdate(), pages)
+        self.assertIn("1) runner 1: 0:01:00", self.race.getUpdate()[0])
+
+    def test_entrants_of_a_big_race_are_paginated(self):
+        race = Race(3, "multiworld")
+        for runner_id in range(300):
+            race.addRunner(runner_id, f"a long runner name {runner_id}")
+        pages = race.getUpdate()
+        self.assertGreater(len(pages), 1)
+        self.assertTrue(all(len(page) <= 2000 for page in pages))
+        self.assertEqual("".join(pages).count("a long runner name"), 300)
+
+    def test_round_trip_rebuilds_standings(self):
+        self.race.done(2, 50 * SECOND)
+        self.race.done(1, 40 * SECOND)
+        self.race.forfeit(3)
+        restored = Race.from_dict(self.race.to_dict())
+        self.assertEqual(restored.runners[3].etime, maxsize)
+        self.assertEqual(restored.finish_order, [(40 * SECOND, 1), (50 * SECOND, 2)])
+        self.assertEqual(restored.forfeit_count, 1)
+        self.assertEqual(restored.placement(2), 2)
+        self.assertFalse(restored.isFinished())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import logging
+
+# discord's limit on the length of a message
+MESSAGE_LIMIT = 2000
+# length wrap_items aims for, short enough that a long list still splits evenly across pages
+LINE_WIDTH = 200
+
+
+def paginate(lines, header="", limit=MESSAGE_LIMIT):
+    """
+    Packs lines into as few messages as possible, each at most `limit` characters.
+    The header goes at the top of the first page, and a line is never split across
+    pages (a single line longer than a page is truncated).
+
+    Returns (pages, line_pages) where line_pages[i] is the page that lines[i] is on.
+    """
+    pages = []
+    line_pages = []
+    current = [header] if header else []
+    length = len(header)
+    for line in lines:
+        if len(line) > limit:
+            logging.warning("truncating a line of %d characters to fit in a message", len(line))
+            line = line[:limit - 1] + "\n"
+        if length + len(line) > limit and length > 0:
+            pages.append("".join(current))
+            current = []
+            length = 0
+        current.append(line)
+        length += len(line)
+        line_pages.append(len(pages))
+    if current or not pages:
+        pages.append("".join(current))
+    return pages, line_pages
+
+
+def wrap_items(items, separator=", ", width=LINE_WIDTH):
+    """
+    Joins items into lines (each ending in a newline) of at most `width` characters,
+    for paginating a long list of names without one line per name
+    """
+    lines = []
+    current = ""
+    for item in items:
+        if current and len(current) + len(separator) + len(item) > width:
+            lines.append(current + "\n")
+            current = ""
+        current = current + separator + item if current else item
+    if current:
+        lines.append(current + "\n")
+    return lines
+
+
+def changed_pages(old_pages, new_pages):
+    """
+    Indexes of the pages in new_pages whose content differs from old_pages
+    """
+    return [i for i, page in enumerate(new_pages) if i >= len(old_pages) or old_pages[i] != page]
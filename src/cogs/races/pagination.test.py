@@ -0,0 +1,38 @@
+import unittest
+
+from cogs.races.pagination import changed_pages, paginate, wrap_items
+
+
+class TestPagination(unittest.TestCase):
+    def test_single_page(self):
+        pages, line_pages = paginate(["a\n", "b\n"], header="Header:\n")
+        self.assertEqual(pages, ["Header:\na\nb\n"])
+        self.assertEqual(line_pages, [0, 0])
+
+    def test_pages_stay_under_limit(self):
+        lines = [f"{i}. runner {i} - 1:00:00 - <https://www.twitch.tv/videos/{i:010d}>\n" for i in range(300)]
+        pages, line_pages = paginate(lines, header="Current Leaderboard:\n")
+        self.assertGreater(len(pages), 1)
+        self.assertTrue(all(len(page) <= 2000 for page in pages))
+        self.assertEqual("".join(pages), "Current Leaderboard:\n" + "".join(lines))
+        for line, page in zip(lines, line_pages):
+            self.assertIn(line, pages[page])
+
+    def test_long_line_is_truncated(self):
+        pages, _ = paginate(["x" * 2500], limit=2000)
+        self.assertEqual(len(pages), 1)
+        self.assertEqual(len(pages[0]), 2000)
+
+    def test_wrap_items(self):
+        self.assertEqual(wrap_items([]), [])
+        self.assertEqual(wrap_items(["ab", "cd", "ef"], width=6), ["ab, cd\n", "ef\n"])
+        self.assertEqual(wrap_items(["abcdefgh", "ij"], width=6), ["abcdefgh\n", "ij\n"])
+
+    def test_changed_pages(self):
+        self.assertEqual(changed_pages(["a", "b"], ["a", "c", "d"]), [1, 2])
+        self.assertEqual(changed_pages(["a", "b"], ["a", "b"]), [])
+        self.assertEqual(changed_pages([], ["a"]), [0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import json
+import logging
+
+# number of journaled events after which the race is snapshotted and its journal truncated
+SNAPSHOT_EVERY = 25
+SNAPSHOT_KEY = "race_snapshots"
+
+
+class RaceJournal:
+    """
+    Append-only journal of mutations to live (synchronous) races, persisted to redis.
+
+    Each live race has a snapshot in the race_snapshots hash and a list of the events
+    applied since that snapshot in race_journal:<race id>. Restoring a race is loading
+    its snapshot and replaying its journal.
+    """
+
+    def __init__(self, redis_db, snapshot_every=SNAPSHOT_EVERY):
+        self.redis_db = redis_db
+        self.snapshot_every = snapshot_every
+
+    async def append(self, race_id, event):
+        """
+        Appends an event to the race's journal.
+        Returns True once enough events have built up that the race should be snapshotted.
+        """
+        length = await self.redis_db.rpush(self._journal_key(race_id), _encode(event))
+        return length >= self.snapshot_every
+
+    async def snapshot(self, race_id, state):
+        """
+        Stores the full state of the race and truncates its journal, atomically
+        """
+        async with self.redis_db.pipeline(transaction=True) as pipe:
+            pipe.hset(SNAPSHOT_KEY, race_id, _encode(state))
+            pipe.delete(self._journal_key(race_id))
+            await pipe.execute()
+
+    async def remove(self, race_id):
+        async with self.redis_db.pipeline(transaction=True) as pipe:
+            pipe.hdel(SNAPSHOT_KEY, race_id)
+            pipe.delete(self._journal_key(race_id))
+            await pipe.execute()
+
+    async def load(self):
+        """
+        Returns a list of (snapshot, events) for every live race
+        """
+        snapshots = await self.redis_db.hgetall(SNAPSHOT_KEY)
+        if not snapshots:
+            return []
+        race_ids = [race_id.decode("utf-8") for race_id in snapshots.keys()]
+        async with self.redis_db.pipeline(transaction=False) as pipe:
+            for race_id in race_ids:
+                pipe.lrange(self._journal_key(race_id), 0, -1)
+            journals = await pipe.execute()
+
+        races = []
+        for blob, events in zip(snapshots.values(), journals):
+            races.append((json.loads(blob), [json.loads(event) for event in events]))
+        logging.info("loaded %d live race journals", len(races))
+        return races
+
+    def _journal_key(self, race_id):
+        return f"race_journal:{race_id}"
+
+
+def _encode(data):
+    return json.dumps(data, separators=(",", ":"))
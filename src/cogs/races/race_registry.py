@@ -0,0 +1,198 @@
+from cogs.races.pagination import paginate
+
+OPEN = "open"
+LOCKED = "locked"
+STARTED = "started"
+STATES = (OPEN, LOCKED, STARTED)
+
+
+class RaceRegistry:
+    """
+    Owns every live (synchronous) race along with its aliases (member id -> id of the team's
+    runner) and teams (runner id -> name and members), keyed by the race's thread id.
+
+    Indexes by runner, owner, team member and state are kept in step with every change, so
+    "which races is this user in" and the command checks are dict lookups instead of scans.
+    Races, runners and team members are only added and removed through the registry, which
+    also caches each race's rendered team listing until its teams change.
+    """
+
+    def __init__(self):
+        self.races = dict()
+        self.aliases = dict()
+        self.teams = dict()
+        # user id -> ids of the races they entered as a runner (the team's leader)
+        self._by_runner = dict()
+        # user id -> ids of the races they are on a team in, runners included
+        self._by_member = dict()
+        # user id -> ids of the races they own
+        self._by_owner = dict()
+        self._by_state = {state: dict() for state in STATES}
+        self._states = dict()
+        # race id -> pages of the team listing
+        self._team_listings = dict()
+
+    def __contains__(self, race_id):
+        return race_id in self.races
+
+    def __getitem__(self, race_id):
+        return self.races[race_id]
+
+    def __len__(self):
+        return len(self.races)
+
+    def get(self, race_id):
+        return self.races.get(race_id)
+
+    def register(self, race, aliases=None, teams=None):
+        """
+        Adds a race, with the aliases and teams it already has when it is restored
+        """
+        if race.id in self.races:
+            raise ValueError(f"race {race.id} is already registered")
+        self.races[race.id] = race
+        self.aliases[race.id] = dict() if aliases is None else aliases
+        self.teams[race.id] = dict() if teams is None else teams
+        self._team_listings.pop(race.id, None)
+        _index(self._by_owner, race.owner, race.id)
+        for runner_id in race.runners:
+            _index(self._by_runner, runner_id, race.id)
+        for member_id in self.aliases[race.id]:
+            _index(self._by_member, member_id, race.id)
+        self.refresh_state(race)
+
+    def remove(self, race_id):
+        """
+        Removes the race and every index entry pointing at it, returns the race
+        """
+        race = self.races.pop(race_id)
+        for runner_id in race.runners:
+            _unindex(self._by_runner, runner_id, race_id)
+        for member_id in self.aliases.pop(race_id):
+            _unindex(self._by_member, member_id, race_id)
+        del self.teams[race_id]
+        self._team_listings.pop(race_id, None)
+        _unindex(self._by_owner, race.owner, race_id)
+        del self._by_state[self._states.pop(race_id)][race_id]
+        return race
+
+    def clear(self):
+        for race_id in list(self.races):
+            self.remove(race_id)
+
+    def add_runner(self, race, runner_id, name, members):
+        """
+        Enters a runner, members is the [display name, id] of everyone on their team, runner included
+        """
+        race.addRunner(runner_id, name)
+        _index(self._by_runner, runner_id, race.id)
+        self.teams[race.id][runner_id] = dict([("name", name), ("members", [])])
+        self.add_team_members(race, runner_id, members)
+
+    def remove_runner(self, race, runner_id):
+        """
+        Removes a runner along with their team, and takes them off any team they were a member of
+        """
+        race.removeRunner(runner_id)
+        _unindex(self._by_runner, runner_id, race.id)
+        self._remove_alias(race.id, runner_id)
+        self._team_listings.pop(race.id, None)
+        teams = self.teams[race.id]
+        team = teams.pop(runner_id, None)
+        if team is not None:
+            for _, member_id in team["members"]:
+                if self.aliases[race.id].get(member_id) == runner_id:
+                    self._remove_alias(race.id, member_id)
+        for team in teams.values():
+            if any(member[1] == runner_id for member in team["members"]):
+                team["members"] = [m for m in team["members"] if m[1] != runner_id]
+                break
+
+    def add_team_members(self, race, runner_id, members):
+        self._team_listings.pop(race.id, None)
+        for display_name, member_id in members:
+            self.aliases[race.id][member_id] = runner_id
+            _index(self._by_member, member_id, race.id)
+            self.teams[race.id][runner_id]["members"].append([display_name, member_id])
+
+    def remove_team_members(self, race, runner_id, members):
+        self._team_listings.pop(race.id, None)
+        team = self.teams[race.id][runner_id]
+        for _, member_id in members:
+            self._remove_alias(race.id, member_id)
+            team["members"] = [m for m in team["members"] if m[1] != member_id]
+
+    def team_listing(self, race_id):
+        """
+        Every team of the race with its members, as pages that each fit in a message
+        """
+        pages = self._team_listings.get(race_id)
+        if pages is None:
+            teams = self.teams[race_id]
+            lines = [team["name"] + ": " + ", ".join(member[0] for member in team["members"]) + "\n"
+                     for team in teams.values()]
+            pages, _ = paginate(lines, "Teams (" + str(len(teams)) + "):\n")
+            self._team_listings[race_id] = pages
+        return pages
+
+    def refresh_state(self, race):
+        """
+        Moves the race to the index of its current state, called after it starts or is (un)locked
+        """
+        state = STARTED if race.started else LOCKED if race.islocked else OPEN
+        previous = self._states.get(race.id)
+        if previous == state:
+            return
+        if previous is not None:
+            del self._by_state[previous][race.id]
+        self._by_state[state][race.id] = race
+        self._states[race.id] = state
+
+    def state_of(self, race_id):
+        return self._states[race_id]
+
+    def runner_for(self, race_id, user_id):
+        """
+        The id of the runner whose team the user is on in the race, or None
+        """
+        return self.aliases.get(race_id, dict()).get(user_id)
+
+    def is_member(self, race_id, user_id):
+        return user_id in self.aliases.get(race_id, ())
+
+    def is_team_leader(self, race_id, user_id):
+        return user_id in self.teams.get(race_id, ())
+
+    def is_owner(self, race_id, user_id):
+        return race_id in self._by_owner.get(user_id, ())
+
+    def races_of(self, user_id):
+        """
+        The races the user is on a team in
+        """
+        return [self.races[race_id] for race_id in self._by_member.get(user_id, ())]
+
+    def races_entered_by(self, user_id):
+        return [self.races[race_id] for race_id in self._by_runner.get(user_id, ())]
+
+    def races_owned_by(self, user_id):
+        return [self.races[race_id] for race_id in self._by_owner.get(user_id, ())]
+
+    def races_in_state(self, state):
+        return list(self._by_state[state].values())
+
+    def _remove_alias(self, race_id, member_id):
+        if self.aliases[race_id].pop(member_id, None) is not None:
+            _unindex(self._by_member, member_id, race_id)
+
+
+def _index(index, key, race_id):
+    index.setdefault(key, set()).add(race_id)
+
+
+def _unindex(index, key, race_id):
+    race_ids = index.get(key)
+    if race_ids is not None:
+        race_ids.discard(race_id)
+        if not race_ids:
+            del index[key]
@@ -0,0 +1,107 @@
+import unittest
+
+from cogs.races.ffrrace import Race
+from cogs.races.race_registry import LOCKED, OPEN, STARTED, RaceRegistry
+
+
+def make_race(id, owner, lockable=False):
+    race = Race(id, f"race {id}", lockable)
+    race.owner = owner
+    return race
+
+
+class TestRaceRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = RaceRegistry()
+        self.race = make_race(1, owner=100)
+        self.registry.register(self.race)
+        self.registry.add_runner(self.race, 10, "team 10", [["runner 10", 10], ["partner", 11]])
+        self.registry.add_runner(self.race, 20, "runner 20", [["runner 20", 20]])
+
+    def test_lookups(self):
+        self.assertIn(1, self.registry)
+        self.assertIs(self.registry[1], self.race)
+        self.assertTrue(self.registry.is_member(1, 11))
+        self.assertFalse(self.registry.is_member(2, 11))
+        self.assertTrue(self.registry.is_team_leader(1, 10))
+        self.assertFalse(self.registry.is_team_leader(1, 11))
+        self.assertTrue(self.registry.is_owner(1, 100))
+        self.assertEqual(self.registry.runner_for(1, 11), 10)
+        self.assertEqual(self.registry.races_owned_by(100), [self.race])
+
+    def test_races_of_a_user_across_races(self):
+        other = make_race(2, owner=101)
+        self.registry.register(other)
+        self.registry.add_runner(other, 11, "runner 11", [["runner 11", 11]])
+        self.assertCountEqual(self.registry.races_of(11), [self.race, other])
+        self.assertEqual(self.registry.races_entered_by(11), [other])
+        self.assertEqual(self.registry.races_of(99), [])
+
+    def test_team_members(self):
+        self.registry.add_team_members(self.race, 20, [["friend", 21]])
+        self.assertEqual(self.registry.runner_for(1, 21), 20)
+        self.registry.remove_team_members(self.race, 20, [["friend", 21]])
+        self.assertFalse(self.registry.is_member(1, 21))
+        self.assertEqual(self.registry.races_of(21), [])
+        self.assertEqual(self.registry.teams[1][20]["members"], [["runner 20", 20]])
+
+    def test_remove_runner(self):
+        other = make_race(2, owner=101)
+        self.registry.register(other)
+        self.registry.add_runner(other, 20, "runner 20", [["runner 20", 20]])
+        self.registry.add_team_members(self.race, 10, [["runner 20", 20]])
+        self.registry.remove_runner(self.race, 20)
+        self.assertEqual(self.race.runners.keys(), {10})
+        self.assertNotIn(20, self.registry.teams[1])
+        self.assertEqual(self.registry.teams[1][10]["members"], [["runner 10", 10], ["partner", 11]])
+        # still in the other race
+        self.assertEqual(self.registry.races_of(20), [other])
+        self.assertEqual(self.registry.races_entered_by(20), [other])
+
+    def test_remove_runner_removes_their_team(self):
+        self.registry.remove_runner(self.race, 10)
+        self.assertFalse(self.registry.is_member(1, 11))
+        self.assertIsNone(self.registry.runner_for(1, 11))
+        self.assertEqual(self.registry.races_of(11), [])
+        self.assertEqual(self.registry.races_of(20), [self.race])
+
+    def test_team_listing_cached_until_teams_change(self):
+        pages = self.registry.team_listing(1)
+        self.assertEqual(pages, ["Teams (2):\nteam 10: runner 10, partner\nrunner 20: runner 20\n"])
+        self.assertIs(self.registry.team_listing(1), pages)
+        self.registry.add_team_members(self.race, 20, [["friend", 21]])
+        self.assertEqual(self.registry.team_listing(1),
+                         ["Teams (2):\nteam 10: runner 10, partner\nrunner 20: runner 20, friend\n"])
+
+    def test_states(self):
+        lockable = make_race(2, owner=100, lockable=True)
+        self.registry.register(lockable)
+        self.assertEqual(self.registry.races_in_state(OPEN), [self.race, lockable])
+        lockable.lockRace()
+        self.registry.refresh_state(lockable)
+        self.race.start(0)
+        self.registry.refresh_state(self.race)
+        self.assertEqual(self.registry.races_in_state(OPEN), [])
+        self.assertEqual(self.registry.races_in_state(LOCKED), [lockable])
+        self.assertEqual(self.registry.races_in_state(STARTED), [self.race])
+        self.assertEqual(self.registry.state_of(1), STARTED)
+
+    def test_remove_clears_every_index(self):
+        self.registry.remove(1)
+        self.assertNotIn(1, self.registry)
+        self.assertEqual(len(self.registry), 0)
+        self.assertFalse(self.registry.is_member(1, 11))
+        self.assertEqual(self.registry.races_of(11), [])
+        self.assertEqual(self.registry.races_entered_by(10), [])
+        self.assertEqual(self.registry.races_owned_by(100), [])
+        self.assertEqual(self.registry.races_in_state(OPEN), [])
+        # the id can be used again
+        self.registry.register(make_race(1, owner=100))
+
+    def test_register_twice(self):
+        with self.assertRaises(ValueError):
+            self.registry.register(make_race(1, owner=100))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,34 +1,39 @@
 import asyncio
 import logging
+import time
 
 import urllib.request
 import json
+from collections import deque
 from io import StringIO
 
-from discord import DiscordException
+from discord import DiscordException, NotFound
 from discord.ext import commands
 from discord.utils import get
 
+from cogs.races.countdown import Countdown, snowflake_time_ns
 from cogs.races.ffrrace import Race, RaceNotLockable
+from cogs.races.race_journal import RaceJournal
+from cogs.races.race_registry import RaceRegistry, STATES
 from cogs.global_checks import is_admin, is_call_for_races, is_call_for_multiworld
 import constants
+from startup_profiler import profiler
 
 
-active_races = dict()
-aliases = dict()
-teamslist = dict()
+registry = RaceRegistry()
 allow_races_bool = True
+# number of recent ?done commands kept for the processing delay telemetry
+FINISH_DELAY_SAMPLES = 200
 
 
 def is_race_room(ctx):
-    return ctx.channel.id in active_races.keys()
+    return ctx.channel.id in registry
 
 
 def is_race_started(toggle=True):
     async def predicate(ctx):
-        try:
-            race = active_races[ctx.channel.id]
-        except KeyError:
+        race = registry.get(ctx.channel.id)
+        if race is None:
             return False
         return race.started if toggle else not race.started
 
@@ -43,19 +48,18 @@ def is_runner(toggle=True):
     """
 
     async def predicate(ctx):
-        rval = ctx.author.id in aliases[ctx.channel.id].keys()
+        rval = registry.is_member(ctx.channel.id, ctx.author.id)
         return rval if toggle else not rval
 
     return commands.check(predicate)
 
 
 def is_team_leader(ctx):
-    return ctx.author.id in teamslist[ctx.channel.id].keys()
+    return registry.is_team_leader(ctx.channel.id, ctx.author.id)
 
 
 def is_race_owner(ctx):
-    race = active_races[ctx.channel.id]
-    return ctx.author.id == race.owner
+    return registry.is_owner(ctx.channel.id, ctx.author.id)
 
 
 def allow_races(ctx):
@@ -68,15 +72,138 @@ class Races(commands.Cog):
         self.bot = bot
         self.twitchids = dict()
         self.redis_db = redis_db
-        self.loaddata()
-
-    def loaddata(self):
-        temp_twitchids = dict(self.redis_db.hgetall("twitchids"))
+        self.journal = RaceJournal(redis_db)
+        # ns between a runner's ?done and the bot handling it, of recent finishes
+        self.finish_delays = deque(maxlen=FINISH_DELAY_SAMPLES)
+        # race id -> lock ordering the apply, journal append and snapshot of each event
+        self._journal_locks = dict()
+
+    async def cog_load(self):
+        await self.loaddata()
+
+    async def loaddata(self):
+        with profiler.phase("redis: twitch ids"):
+            temp_twitchids = dict(await self.redis_db.hgetall("twitchids"))
         for k, v in temp_twitchids.items():
             self.twitchids[k.decode("utf-8")] = v.decode("utf-8")
         logging.info("Loading saved Twitch ids")
         logging.debug("twitch ids: %s", str(self.twitchids))
 
+    async def load_live_races(self):
+        """
+        Restores the races that were live when the bot stopped, from their
+        journal snapshot plus the events recorded since
+        """
+        with profiler.phase("redis: live race journals"):
+            journals = await self.journal.load()
+        for state, events in journals:
+            race_id = state.get("race", dict()).get("id")
+            if race_id in registry:
+                continue
+            try:
+                race = Race.from_dict(state["race"])
+                registry.register(race,
+                                  {int(k): v for k, v in state["aliases"].items()},
+                                  {int(k): v for k, v in state["teams"].items()})
+                for event in events:
+                    self._apply(race, event)
+            except Exception as e:
+                # a journal that doesn't replay cleanly only costs its own race
+                logging.error("could not restore live race %s from its journal, skipping it", race_id)
+                logging.exception(e)
+                if race_id in registry:
+                    registry.remove(race_id)
+                continue
+
+            channel = self.bot.get_channel(state["race"]["channel_id"])
+            if channel is None:
+                try:
+                    channel = await self.bot.fetch_channel(state["race"]["channel_id"])
+                except NotFound:
+                    logging.warning("thread for live race %s is gone, dropping it", race.id)
+                    registry.remove(race.id)
+                    await self.journal.remove(race.id)
+                    continue
+            race.channel = channel
+            if state["race"]["message_id"] is not None:
+                race.message = channel.get_partial_message(state["race"]["message_id"])
+            logging.info("restored race %s with %d runners from %d journaled events",
+                         race.name, len(race.runners), len(events))
+
+    def _apply(self, race, event):
+        """
+        Applies a mutation to a race and its aliases/teams (through the registry). This is the only
+        place live race state is changed, so replaying the journal gives the same result as the
+        original commands.
+        """
+        kind = event["event"]
+        if kind == "join":
+            registry.add_runner(race, event["runner_id"], event["name"], event["members"])
+        elif kind == "unjoin":
+            runner_id = event["runner_id"]
+            if race.runners[runner_id].ready is True:
+                race.readycount -= 1
+            registry.remove_runner(race, runner_id)
+        elif kind == "teamadd":
+            registry.add_team_members(race, event["leader_id"], event["members"])
+        elif kind == "teamremove":
+            registry.remove_team_members(race, event["leader_id"], event["members"])
+        elif kind == "ready":
+            race.ready(event["runner_id"])
+        elif kind == "unready":
+            race.unready(event["runner_id"])
+        elif kind == "start":
+            race.start(event["stime"])
+            registry.refresh_state(race)
+        elif kind == "done":
+            return race.done(event["runner_id"], event["etime"])
+        elif kind == "undone":
+            return race.undone(event["runner_id"])
+        elif kind == "forfeit":
+            return race.forfeit(event["runner_id"])
+        elif kind == "lock":
+            race.lockRace()
+            registry.refresh_state(race)
+        elif kind == "unlock":
+            race.unlockRace()
+            registry.refresh_state(race)
+        elif kind == "restream":
+            race.restream = event["restream"]
+        else:
+            logging.warning("unknown race event %s", kind)
+
+    async def _record(self, race, event):
+        """
+        Applies the event and appends it to the race's journal, snapshotting
+        the race once its journal has grown long enough
+        """
+        # held until the event is journaled, so no other event on the race is applied between
+        # a snapshot being taken and the journal it replaces being deleted
+        async with self._journal_lock(race.id):
+            result = self._apply(race, event)
+            try:
+                if await self.journal.append(race.id, event):
+                    await self.journal.snapshot(race.id, self._snapshot_state(race))
+            except Exception as e:
+                # the race carries on in memory even if it can't be journaled
+                logging.error("could not journal %s for race %s", event["event"], race.id)
+                logging.exception(e)
+        return result
+
+    async def _snapshot(self, race):
+        async with self._journal_lock(race.id):
+            try:
+                await self.journal.snapshot(race.id, self._snapshot_state(race))
+            except Exception as e:
+                logging.error("could not snapshot race %s", race.id)
+                logging.exception(e)
+
+    def _journal_lock(self, race_id):
+        return self._journal_locks.setdefault(race_id, asyncio.Lock())
+
+    def _snapshot_state(self, race):
+        return {"race": race.to_dict(), "aliases": registry.aliases[race.id], "teams": registry.teams[race.id]}
+
     @commands.command(aliases=["sr"])
     @commands.check(is_call_for_races)
     @commands.check(allow_races)
@@ -93,12 +220,11 @@ class Races(commands.Cog):
             name=name, message=ctx.message, reason="bot generated thread for a race"
         )
         race = Race(racethread.id, name)
-        active_races[racethread.id] = race
         race.channel = racethread
-        race.message = await racethread.send(message_str)
-        aliases[racethread.id] = dict()  # for team races
-        teamslist[racethread.id] = dict()
         race.owner = ctx.author.id
+        registry.register(race)
+        race.message = await racethread.send(message_str)
+        await self._snapshot(race)
         # just trying to hack around the permission bug we've been dealing
         # with throughout 2023. cause unknown but maybe this helps?
         await race.message.pin()
@@ -119,16 +245,15 @@ class Races(commands.Cog):
         )
 
         race = Race(racethread.id, name, lockable=True)
-        active_races[racethread.id] = race
         race.channel = racethread
+        race.owner = ctx.author.id
+        registry.register(race)
 
         race.message = await racethread.send(
             "join this multiworld with the ?join command, @ any"
             + " people that will be on your team if playing coop. "
         )
-        aliases[racethread.id] = dict()  # for team races
-        teamslist[racethread.id] = dict()
-        race.owner = ctx.author.id
+        await self._snapshot(race)
 
     @commands.command(aliases=["cr"])
     @is_race_started(toggle=False)
@@ -144,8 +269,8 @@ class Races(commands.Cog):
     @commands.check(is_race_room)
     async def lockrace(self, ctx):
         try:
-            race = active_races[ctx.channel.id]
-            race.lockRace()
+            race = registry[ctx.channel.id]
+            await self._record(race, {"event": "lock"})
             edited_message = "Race: " + race.name + " is now locked! "
             await race.message.edit(content=edited_message)
             await ctx.channel.send("Race is now locked. New players cannot be added.")
@@ -157,9 +282,9 @@ class Races(commands.Cog):
     @commands.check(is_race_owner)
     @commands.check(is_race_room)
     async def unlockrace(self, ctx):
-        race = active_races[ctx.channel.id]
+        race = registry[ctx.channel.id]
         if race.islocked:
-            race.unlockRace()
+            await self._record(race, {"event": "unlock"})
             edited_message = (
                 "join this multiworld/race with the ?join command, @ any"
                 + " people that will be on your team if playing coop. "
@@ -179,7 +304,7 @@ class Races(commands.Cog):
             # Fails on newer discord tokens
             pass
 
-        if ctx.channel.id not in active_races.keys():
+        if ctx.channel.id not in registry:
             await ctx.author.send(
                 "Join command must be used in an active race channel or thread"
             )
@@ -187,10 +312,10 @@ class Races(commands.Cog):
 
         id = int(ctx.channel.id)
         try:
-            if active_races[id].started is True:
+            if registry[id].started is True:
                 await ctx.channel.send("This race has already started")
                 return
-            if active_races[id].islocked is True:
+            if registry[id].islocked is True:
                 await ctx.channel.send("This race is locked. No new racers can join.")
                 return
         except KeyError:
@@ -200,17 +325,14 @@ class Races(commands.Cog):
         if name is None:
             name = ctx.author.display_name
 
-        race = active_races[id]
-        race.addRunner(ctx.author.id, name)
-        aliases[id][ctx.author.id] = ctx.author.id
-        teamslist[id][ctx.author.id] = dict(
-            [("name", name), ("members", [[ctx.author.display_name, ctx.author.id]])]
-        )
+        race = registry[id]
+        members = [[ctx.author.display_name, ctx.author.id]]
         tagpeople = "Welcome! " + ctx.author.mention
         for r in ctx.message.mentions:
-            aliases[id][r.id] = ctx.author.id
-            teamslist[id][ctx.author.id]["members"].append([r.display_name, r.id])
+            members.append([r.display_name, r.id])
             tagpeople += r.mention + " "
+        await self._record(race, {"event": "join", "runner_id": ctx.author.id,
+                                  "name": name, "members": members})
         await race.channel.send(tagpeople)
 
     @commands.command(aliases=["quit"])
@@ -218,14 +340,11 @@ class Races(commands.Cog):
     @commands.check(is_race_room)
     async def unjoin(self, ctx):
         try:
-            race = active_races[ctx.channel.id]
+            race = registry[ctx.channel.id]
         except KeyError:
             await ctx.author.send("KeyError in unjoin command")
             return
 
-        if race.runners[ctx.author.id]["ready"] is True:
-            race.readycount -= 1
-
         if race.started:
             # quiting a started race is akin to forfeit
             await self.forfeit(ctx)
@@ -236,25 +355,13 @@ class Races(commands.Cog):
             )
             return
 
-        race.removeRunner(ctx.author.id)
+        await self._record(race, {"event": "unjoin", "runner_id": ctx.author.id,
+                                  "display_name": ctx.author.display_name})
         await ctx.channel.send(
             ctx.author.display_name
             + " has left the race and is now cheering "
             + "from the sidelines."
         )
-        del aliases[ctx.channel.id][ctx.author.id]
-
-        try:
-            del teamslist[ctx.channel.id][ctx.author.id]
-        except KeyError:
-            pass
-        try:
-            for team in teamslist[ctx.channel.id].values():
-                if [ctx.author.display_name, ctx.author.id] in team["members"]:
-                    team["members"].remove([ctx.author.display_name, ctx.author.id])
-                    break
-        except KeyError:
-            pass
         await self.startcountdown(ctx)
 
     @commands.check(is_call_for_races)
@@ -263,7 +370,7 @@ class Races(commands.Cog):
             await ctx.defer(ephemeral=True)
 
         try:
-            race = active_races[ctx.channel.id]
+            race = registry[ctx.channel.id]
             await race.channel.send(
                 f"{ctx.author.mention} is now cheering you on from the sidelines"
             )
@@ -281,8 +388,8 @@ class Races(commands.Cog):
     @commands.check(is_race_room)
     async def ready(self, ctx):
         try:
-            race = active_races[ctx.channel.id]
-            race.ready(ctx.author.id)
+            race = registry[ctx.channel.id]
+            await self._record(race, {"event": "ready", "runner_id": ctx.author.id})
             await ctx.channel.send(
                 ctx.author.display_name
                 + " is READY! "
@@ -300,8 +407,8 @@ class Races(commands.Cog):
     @commands.check(is_race_room)
     async def unready(self, ctx):
         try:
-            race = active_races[ctx.channel.id]
-            race.unready(ctx.author.id)
+            race = registry[ctx.channel.id]
+            await self._record(race, {"event": "unready", "runner_id": ctx.author.id})
             await ctx.channel.send(
                 ctx.author.display_name
                 + " is no longer READY. "
@@ -316,12 +423,12 @@ class Races(commands.Cog):
     @commands.check(is_race_room)
     async def entrants(self, ctx):
         try:
-            race = active_races[ctx.channel.id]
+            race = registry[ctx.channel.id]
         except KeyError:
             await ctx.channel.send("Key Error in 'entrants' command")
             return
-        msg = race.getUpdate()
-        await ctx.channel.send(msg)
+        for page in race.getUpdate():
+            await ctx.channel.send(page)
 
     @commands.command()
     @is_race_started()
@@ -329,8 +436,15 @@ class Races(commands.Cog):
     @commands.check(is_race_room)
     async def done(self, ctx):
         try:
-            race = active_races[ctx.channel.id]
-            msg = race.done(aliases[race.id][ctx.author.id])
+            race = registry[ctx.channel.id]
+            # the finish is when discord got the command, so a busy bot doesn't add to the time
+            etime = snowflake_time_ns(ctx.message.id)
+            delay = time.time_ns() - etime
+            self.finish_delays.append(delay)
+            logging.info("?done in race %s handled %.0fms after it was sent", race.id, delay / 1e6)
+            msg = await self._record(race, {"event": "done",
+                                            "runner_id": registry.aliases[race.id][ctx.author.id],
+                                            "etime": etime})
             thread_msg = await ctx.channel.send(msg)
             if race.isFinished():
                 await thread_msg.pin()  # pin the race results message
@@ -344,8 +458,9 @@ class Races(commands.Cog):
     @commands.check(is_race_room)
     async def undone(self, ctx):
         try:
-            race = active_races[ctx.channel.id]
-            msg = race.undone(aliases[race.id][ctx.author.id])
+            race = registry[ctx.channel.id]
+            msg = await self._record(race, {"event": "undone",
+                                            "runner_id": registry.aliases[race.id][ctx.author.id]})
             await ctx.channel.send(msg)
         except KeyError:
             await ctx.channel.send("Key Error in 'undone' command")
@@ -358,8 +473,9 @@ class Races(commands.Cog):
             await ctx.defer(ephemeral=True)
 
         try:
-            race = active_races[ctx.channel.id]
-            msg = race.forfeit(aliases[race.id][ctx.author.id])
+            race = registry[ctx.channel.id]
+            msg = await self._record(race, {"event": "forfeit",
+                                            "runner_id": registry.aliases[race.id][ctx.author.id]})
             thread_msg = await ctx.channel.send(msg)
             if race.isFinished():
                 await thread_msg.pin()  # pin the race results message
@@ -376,7 +492,7 @@ class Races(commands.Cog):
     @is_race_started(toggle=True)
     async def time(self, ctx):
         try:
-            time = active_races[ctx.channel.id].getTime()
+            time = registry[ctx.channel.id].getTime()
             await ctx.channel.send(time)
         except KeyError:
             await ctx.channel.send("Key Error in the 'time' command")
@@ -386,17 +502,12 @@ class Races(commands.Cog):
     @commands.check(is_race_room)
     async def teamlist(self, ctx):
         try:
-            rstring = "Teams:\n"
-            race = active_races[ctx.channel.id]
-            for team in teamslist[race.id].values():
-                rstring += team["name"] + ":"
-                for member in team["members"]:
-                    rstring += " " + member[0] + ","
-                rstring = rstring[:-1]
-                rstring += "\n"
-            await ctx.channel.send(rstring)
+            pages = registry.team_listing(ctx.channel.id)
         except KeyError:
             await ctx.channel.send("Key Error in 'teams' command")
+            return
+        for page in pages:
+            await ctx.channel.send(page)
 
     @commands.command(aliases=["ta"])
     @is_race_started(toggle=False)
@@ -404,12 +515,10 @@ class Races(commands.Cog):
     @commands.check(is_race_room)
     async def teamadd(self, ctx):
         try:
-            race = active_races[ctx.channel.id]
-            for player in ctx.message.mentions:
-                aliases[race.id][player.id] = ctx.author.id
-                teamslist[race.id][ctx.author.id]["members"].append(
-                    [player.display_name, player.id]
-                )
+            race = registry[ctx.channel.id]
+            members = [[player.display_name, player.id] for player in ctx.message.mentions]
+            await self._record(race, {"event": "teamadd", "leader_id": ctx.author.id,
+                                      "members": members})
         except KeyError:
             await ctx.channel.send("Key Error in 'teamadd' command")
 
@@ -419,20 +528,30 @@ class Races(commands.Cog):
     @commands.check(is_race_room)
     async def teamremove(self, ctx):
         try:
-            race = active_races[ctx.channel.id]
-            for player in ctx.message.mentions:
-                del aliases[race.id][player.id]
-                teamslist[race.id][ctx.author.id]["members"].remove(
-                    [player.display_name, player.id]
-                )
+            race = registry[ctx.channel.id]
+            members = [[player.display_name, player.id] for player in ctx.message.mentions]
+            await self._record(race, {"event": "teamremove", "leader_id": ctx.author.id,
+                                      "members": members})
         except KeyError:
             await ctx.channel.send("Key Error in 'teamremove' command")
 
+    def metrics(self):
+        if not self.finish_delays:
+            return {"finish_delay_samples": 0}
+        delays = sorted(self.finish_delays)
+        return {
+            "finish_delay_samples": len(delays),
+            "finish_delay_median_ms": round(delays[len(delays) // 2] / 1e6),
+            "finish_delay_max_ms": round(delays[-1] / 1e6),
+        }
+
+    @commands.command()
     @commands.check(is_call_for_races)
     async def races(self, ctx):
         rval = "Current races:\n"
-        for race in active_races.values():
-            rval += "name: " + race.name + " - id: " + str(race.id) + "\n"
+        for state in STATES:
+            for race in registry.races_in_state(state):
+                rval += "name: " + race.name + " - id: " + str(race.id) + " - " + state + "\n"
         await ctx.channel.send(rval)
 
     async def endrace(self, ctx, msg):
@@ -441,7 +560,7 @@ class Races(commands.Cog):
         await self.removerace(ctx)
 
     async def startcountdown(self, ctx):
-        race = active_races[ctx.channel.id]
+        race = registry[ctx.channel.id]
         multi = await self.multistream(race, all=True, discord=True, ctx=ctx)
         if race.readycount != len(race.runners):
             return
@@ -453,21 +572,19 @@ class Races(commands.Cog):
             + (race.restream if race.restream is not None else multi)
         )
         await race.message.edit(content=edited_message)
-        for i in range(10):
-            await ctx.channel.send(str(10 - i))
-            await asyncio.sleep(1)
-        await ctx.channel.send("go!")
-        race.start()
+        go = await Countdown(ctx.channel).run()
+        # the race starts when discord posted "go!", not when the bot got done sending it
+        await self._record(race, {"event": "start", "stime": snowflake_time_ns(go.id)})
 
     @commands.command()
     @commands.check(is_race_room)
     async def restream(self, ctx, streamid=None):
         try:
-            race = active_races[ctx.channel.id]
+            race = registry[ctx.channel.id]
         except KeyError:
             ctx.channel.send("this isnt a race channel, cant set restream here")
             return
-        race.restream = streamid
+        await self._record(race, {"event": "restream", "restream": streamid})
         await ctx.channel.send("restream set to: " + race.restream)
         edited_message = (
             "join this race with the ?join command,"
@@ -481,11 +598,13 @@ class Races(commands.Cog):
 
     async def removerace(self, ctx, time=0):
         await asyncio.sleep(time)
-        race = active_races[ctx.channel.id]
-        channel = race.channel
-        del active_races[ctx.channel.id]
-        del aliases[channel.id]
-        del teamslist[channel.id]
+        race = registry.remove(ctx.channel.id)
+        self._journal_locks.pop(race.id, None)
+        try:
+            await self.journal.remove(race.id)
+        except Exception as e:
+            logging.error("could not remove the journal for race %s", race.id)
+            logging.exception(e)
 
     async def lockracethread(self, ctx):
         await ctx.channel.edit(locked=True, archived=True)
@@ -514,9 +633,9 @@ class Races(commands.Cog):
         user = ctx.message.author
         try:
             if raceid is None:
-                race = active_races[ctx.channel.id]
+                race = registry[ctx.channel.id]
             else:
-                race = active_races[int(raceid)]
+                race = registry[int(raceid)]
             link = await self.multistream(race, all=True, discord=True, ctx=ctx)
             await ctx.channel.send(link)
 
@@ -540,7 +659,7 @@ class Races(commands.Cog):
         if discord:
             runners = []
             no_twitch_id = []
-            for team in teamslist[race.id].values():
+            for team in registry.teams[race.id].values():
                 for runner in team["members"]:
                     try:
                         if self.twitchids[str(runner[1])] != "":
@@ -579,7 +698,7 @@ class Races(commands.Cog):
     @commands.command()
     async def twitchid(self, ctx, id=""):
         self.twitchids[str(ctx.author.id)] = id
-        self.redis_db.hset(
+        await self.redis_db.hset(
             "twitchids", str(ctx.author.id).encode("utf-8"), id.encode("utf-8")
         )
         await ctx.channel.send(
@@ -622,10 +741,10 @@ class Races(commands.Cog):
     @is_race_started()
     @commands.check(is_race_room)
     async def forceend(self, ctx):
-        race = active_races[ctx.channel.id]
-        for runner in race.runners.keys():
-            if race.runners[runner]["etime"] is None:
-                race.forfeit(runner)
+        race = registry[ctx.channel.id]
+        for runner in list(race.runners.keys()):
+            if race.runners[runner].etime is None:
+                await self._record(race, {"event": "forfeit", "runner_id": runner})
         results = race.getFinishedRaceMessage()
         await self.endrace(ctx, results)
 
@@ -634,26 +753,14 @@ class Races(commands.Cog):
     @commands.check(is_race_room)
     async def forceremove(self, ctx):
         try:
-            race = active_races[ctx.channel.id]
+            race = registry[ctx.channel.id]
         except KeyError:
             return
         players = ctx.message.mentions
         for player in players:
             await player.remove_roles(race.role)
-            race.removeRunner(player.id)
-            del aliases[ctx.channel.id][player.id]
-
-            try:
-                del teamslist[ctx.channel.id][player.id]
-            except KeyError:
-                pass
-            try:
-                for team in teamslist[ctx.channel.id].values():
-                    if any(player.id in x for x in team["members"]):
-                        team["members"].remove([player.display_name, player.id])
-                        break
-            except KeyError:
-                pass
+            await self._record(race, {"event": "unjoin", "runner_id": player.id,
+                                      "display_name": player.display_name})
 
     @commands.command()
     @commands.check(is_admin)
@@ -9,12 +9,13 @@ import constants
 
 
 class OpenReportThread(discord.ui.View):
-    def __init__(self):
+    def __init__(self, member_adder):
         super().__init__(timeout=60)
+        self.member_adder = member_adder
 
     @discord.ui.button(label="Yes", style=discord.ButtonStyle.red, row=2)
     async def yes(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await interaction.response.send_modal(OpenReportModal())
+        await interaction.response.send_modal(OpenReportModal(self.member_adder))
 
 
 class OpenReportModal(discord.ui.Modal, title="Open Report"):
@@ -27,8 +28,9 @@ class OpenReportModal(discord.ui.Modal, title="Open Report"):
         row=1,
     )
 
-    def __init__(self):
+    def __init__(self, member_adder):
         super().__init__()
+        self.member_adder = member_adder
 
     async def on_submit(self, interaction: Interaction) -> None:
         duration = 24 * 60
@@ -60,8 +62,7 @@ class OpenReportModal(discord.ui.Modal, title="Open Report"):
         if interaction.guild.chunked is False:
             await interaction.guild.chunk(cache=True)
 
-        for member in pinged_members:
-            await thread.add_user(member)
+        await self.member_adder.add_members(thread, pinged_members)
 
         await thread.send(
             f"{interaction.user.mention} has opened an report.\n\n**Description:** {self.description.value}\n**Channel:** {interaction.channel.mention}",
@@ -93,8 +94,9 @@ class OpenReportModal(discord.ui.Modal, title="Open Report"):
         return None
 
 class Report(commands.Cog):
-    def __init__(self, bot: commands.Bot) -> None:
+    def __init__(self, bot: commands.Bot, member_adder) -> None:
         self.bot = bot
+        self.member_adder = member_adder
         self.persistent_views_added = False
 
     @app_commands.command(
@@ -121,6 +123,6 @@ class Report(commands.Cog):
                 'Click "Yes" to start the report. If you did not intend to do this, simply click "Dismiss message" at the bottom of this response. Thanks!'
             ),
             ephemeral=True,
-            view=OpenReportThread(),
+            view=OpenReportThread(self.member_adder),
             allowed_mentions=discord.AllowedMentions(roles=False),
         )
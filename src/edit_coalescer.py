@@ -0,0 +1,123 @@
+import asyncio
+import logging
+
+import discord
+
+# seconds without a newer edit before the pending edit is sent
+QUIET_WINDOW = 1.5
+# longest an edit is held back while newer edits keep arriving
+MAX_DELAY = 5.0
+
+
+class PendingEdit:
+    def __init__(self, message, content, now):
+        self.message = message
+        self.content = content
+        self.first_queued = now
+        self.last_queued = now
+
+
+class EditCoalescer:
+    """
+    Debounces message edits. Each message has at most one pending edit, and queueing a new
+    edit replaces its content. The latest content is sent once the message has been quiet
+    for QUIET_WINDOW seconds, or MAX_DELAY seconds after the first queued edit at the latest,
+    so a burst of submissions costs one edit per message instead of one per submission.
+    Edits whose content matches what was last sent are skipped.
+    """
+
+    def __init__(self, quiet_window=QUIET_WINDOW, max_delay=MAX_DELAY):
+        self.quiet_window = quiet_window
+        self.max_delay = max_delay
+        self._pending = dict()
+        self._tasks = dict()
+        # content last sent, by message id
+        self._sent = dict()
+        self.sent_count = 0
+        self.skipped_count = 0
+        self.coalesced_count = 0
+        self.failed_count = 0
+
+    def edit(self, message, content):
+        """
+        Queues an edit of the message (a Message or PartialMessage) to content
+        """
+        now = asyncio.get_running_loop().time()
+        pending = self._pending.get(message.id)
+        if pending is not None:
+            self.coalesced_count += 1
+            pending.content = content
+            pending.last_queued = now
+            return
+        if self._sent.get(message.id) == content:
+            self.skipped_count += 1
+            return
+        self._pending[message.id] = PendingEdit(message, content, now)
+        self._tasks[message.id] = asyncio.create_task(self._wait_and_send(message.id))
+
+    def sent(self, message_id, content):
+        """
+        Records content that was posted without going through the coalescer, e.g. a new message
+        """
+        self._sent[message_id] = content
+
+    async def flush(self, message_ids=None):
+        """
+        Sends the pending edits for message_ids (all of them by default) right away
+        """
+        if message_ids is None:
+            message_ids = list(self._pending.keys())
+        for message_id in message_ids:
+            task = self._tasks.pop(message_id, None)
+            if task is not None:
+                task.cancel()
+            pending = self._pending.pop(message_id, None)
+            if pending is not None:
+                await self._send(message_id, pending)
+
+    def forget(self, message_ids):
+        """
+        Drops the pending edits and history of messages that are no longer updated
+        """
+        for message_id in message_ids:
+            task = self._tasks.pop(message_id, None)
+            if task is not None:
+                task.cancel()
+            self._pending.pop(message_id, None)
+            self._sent.pop(message_id, None)
+
+    def metrics(self):
+        return {
+            "pending_edits": len(self._pending),
+            "edits_sent": self.sent_count,
+            "edits_skipped": self.skipped_count,
+            "edits_coalesced": self.coalesced_count,
+            "edits_failed": self.failed_count,
+        }
+
+    async def _wait_and_send(self, message_id):
+        loop = asyncio.get_running_loop()
+        pending = self._pending[message_id]
+        while True:
+            due = min(pending.last_queued + self.quiet_window, pending.first_queued + self.max_delay)
+            delay = due - loop.time()
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+        del self._pending[message_id]
+        del self._tasks[message_id]
+        await self._send(message_id, pending)
+
+    async def _send(self, message_id, pending):
+        if self._sent.get(message_id) == pending.content:
+            self.skipped_count += 1
+            return
+        try:
+            await pending.message.edit(content=pending.content)
+        except discord.HTTPException as e:
+            self.failed_count += 1
+            logging.error("could not edit message %s", message_id)
+            logging.exception(e)
+            return
+        self._sent[message_id] = pending.content
+        self.sent_count += 1
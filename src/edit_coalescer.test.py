@@ -0,0 +1,56 @@
+import asyncio
+import unittest
+
+from edit_coalescer import EditCoalescer
+
+
+class FakeMessage:
+    def __init__(self, id):
+        self.id = id
+        self.edits = []
+
+    async def edit(self, content):
+        self.edits.append(content)
+
+
+class TestEditCoalescer(unittest.IsolatedAsyncioTestCase):
+    async def test_burst_is_coalesced(self):
+        editor = EditCoalescer(quiet_window=0.05, max_delay=1)
+        message = FakeMessage(1)
+        for i in range(10):
+            editor.edit(message, f"count {i}")
+        await asyncio.sleep(0.1)
+        self.assertEqual(message.edits, ["count 9"])
+        self.assertEqual(editor.coalesced_count, 9)
+
+    async def test_max_delay(self):
+        editor = EditCoalescer(quiet_window=0.1, max_delay=0.25)
+        message = FakeMessage(1)
+        for i in range(7):
+            editor.edit(message, f"count {i}")
+            await asyncio.sleep(0.05)
+        # edits kept arriving inside the quiet window, max_delay forced one out
+        self.assertEqual(len(message.edits), 1)
+        await asyncio.sleep(0.2)
+        self.assertEqual(message.edits, [message.edits[0], "count 6"])
+
+    async def test_identical_content_is_skipped(self):
+        editor = EditCoalescer(quiet_window=0.01, max_delay=1)
+        message = FakeMessage(1)
+        editor.sent(1, "count 1")
+        editor.edit(message, "count 1")
+        await asyncio.sleep(0.03)
+        self.assertEqual(message.edits, [])
+        self.assertEqual(editor.skipped_count, 1)
+
+    async def test_flush(self):
+        editor = EditCoalescer(quiet_window=10, max_delay=10)
+        message = FakeMessage(1)
+        editor.edit(message, "count 1")
+        await editor.flush()
+        self.assertEqual(message.edits, ["count 1"])
+        self.assertEqual(editor.metrics()["pending_edits"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
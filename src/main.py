@@ -1,10 +1,9 @@
+from startup_profiler import profiler
+
 import asyncio
 import logging
 import traceback
 
-import os
-import redis
-
 from discord.ext import commands
 from discord.utils import get
 
@@ -17,9 +16,14 @@ from cogs.races.races_common import RacesCommon
 from cogs.roles import Roles
 from voting.polls import Polls
 from cogs.report import Report
+from storage import redis_client
+from storage.write_behind import WriteBehindQueue
+from thread_members import ThreadMemberAdder
 
 import constants
 
+profiler.mark("imports")
+
 
 # format logging
 logging.basicConfig(
@@ -38,23 +42,43 @@ bot = commands.Bot(
     command_prefix="?", description=description, case_insensitive=True, intents=intents
 )
 
-redis_pool = redis.ConnectionPool(
-    host=os.environ.get("REDIS_HOST", "localhost"),
-    port=int(os.environ.get("REDIS_PORT", "6379")),
-    decode_responses=False,
-)
+redis_pool = redis_client.create_pool()
 
-redis_races = redis.StrictRedis(connection_pool=redis_pool)
-redis_polls = redis.StrictRedis(connection_pool=redis_pool)
+redis_races = redis_client.create_client(redis_pool)
+redis_polls = redis_client.create_client(redis_pool)
+persistence = WriteBehindQueue(redis_client.create_client(redis_pool))
+member_adder = ThreadMemberAdder(redis_client.create_client(redis_pool))
+
+
+@bot.event
+async def on_connect():
+    if not profiler.reported:
+        profiler.mark("login and gateway connect")
 
 
 @bot.event
 async def on_ready():
+    # the profiler only records until its report is logged below, on the first on_ready
+    if not profiler.reported:
+        # discord.py chunks every guild's members before dispatching on_ready
+        profiler.mark("guild chunking")
+
     async_races = bot.get_cog("AsyncRaces")
     if (async_races is not None):
-        await async_races.load_data(bot)
+        with profiler.phase("rehydrate async races"):
+            await async_races.load_data(bot)
     else:
         logging.warning("AsyncRaces cog not found on_ready")
+
+    races = bot.get_cog("Races")
+    if (races is not None):
+        with profiler.phase("restore live races"):
+            await races.load_live_races()
+
+    profiler.log_report()
+
+    # finish adding members to threads where a restart interrupted it
+    await member_adder.resume(bot)
     
     poor_soul = bot.get_user(constants.poor_soul_id)
     await poor_soul.send("FFRBot has restarted!")
@@ -100,29 +124,26 @@ def handle_exit(client, loop):
         except asyncio.CancelledError:
             pass
 
-async def periodic(interval_sec, coro_name, *args, **kwargs): 
-    while True:
-        # wait for the given interval
-        await asyncio.sleep(interval_sec)
-        # await the target
-        await coro_name(*args, *kwargs)
-
 async def main(client, token):
-    await bot.add_cog(MiscCommandCog(bot))
+    persistence.start()
+    await bot.add_cog(MiscCommandCog(bot, persistence))
     races = Races(bot, redis_races)        
-    async_races = AsyncRaces(bot, redis_races)
-    # schedule the async update to run periodically
-    asyncio.create_task(periodic(30, async_races.periodic_race_update))
+    async_races = AsyncRaces(bot, redis_races, persistence, member_adder)
 
     await bot.add_cog(RacesCommon(bot, races, async_races))
     await bot.add_cog(races)
     await bot.add_cog(async_races)
     await bot.add_cog(Roles(bot))
-    await bot.add_cog(Polls(bot, redis_polls))
-    await bot.add_cog(Report(bot))
-
-    async with client:
-        await client.start(token)
+    await bot.add_cog(Polls(bot, redis_polls, persistence))
+    await bot.add_cog(Report(bot, member_adder))
+    profiler.mark("cog construction")
+
+    try:
+        async with client:
+            await client.start(token)
+    finally:
+        await persistence.close()
+        await redis_client.close_pool(redis_pool)
 
 
 with open("token.txt", "r") as f:
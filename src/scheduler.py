@@ -0,0 +1,134 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+import task_pool
+
+# longest the scheduler sleeps without checking the clock again, in case the wall clock jumps
+MAX_SLEEP = 3600
+# jobs that are due at the same time run concurrently, at most this many at once
+JOB_CONCURRENCY = 5
+
+
+class Job:
+    def __init__(self, key, due, callback, seq):
+        self.key = key
+        self.due = due
+        self.callback = callback
+        self.seq = seq
+
+
+class DeadlineScheduler:
+    """
+    Runs jobs at their due time (a unix timestamp).
+
+    Jobs are kept in a heap ordered by due time, and the scheduler sleeps until the earliest
+    one instead of polling. Scheduling a job that is due before the one being waited for
+    wakes it up early. A job is identified by its key: scheduling the same key again replaces
+    the job, and it can be cancelled by key. Replaced and cancelled jobs are left in the heap
+    and skipped when they reach the top.
+
+    Jobs that are due together (e.g. tournament races sharing a start time) run concurrently
+    in a bounded pool, each on its own: one failing doesn't hold up or abort the others.
+    Each batch runs in the background, so a slow job doesn't delay the jobs due after it
+    beyond the pool's limit, which is shared by every batch.
+    """
+
+    def __init__(self, concurrency=JOB_CONCURRENCY):
+        self.concurrency = concurrency
+        self._semaphore = asyncio.Semaphore(concurrency)
+        # batches of due jobs still running
+        self._batches = set()
+        self._heap = []
+        self._jobs = dict()
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def schedule(self, key, due, callback):
+        """
+        Schedules callback (a coroutine function taking no arguments) to run at due
+        """
+        job = Job(key, due, callback, next(self._seq))
+        self._jobs[key] = job
+        heapq.heappush(self._heap, (due, job.seq, job))
+        self._wakeup.set()
+
+    def cancel(self, key):
+        if self._jobs.pop(key, None) is not None:
+            self._wakeup.set()
+
+    def __contains__(self, key):
+        return key in self._jobs
+
+    def upcoming(self, limit=None):
+        """
+        Returns the pending jobs as (due, key), soonest first
+        """
+        jobs = sorted(self._jobs.values(), key=lambda job: (job.due, job.seq))
+        return [(job.due, job.key) for job in jobs[:limit]]
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for batch in list(self._batches):
+            batch.cancel()
+        await asyncio.gather(*self._batches, return_exceptions=True)
+
+    def _next_job(self):
+        # drop jobs that were replaced or cancelled
+        while self._heap and self._jobs.get(self._heap[0][2].key) is not self._heap[0][2]:
+            heapq.heappop(self._heap)
+        return self._heap[0][2] if self._heap else None
+
+    def _pop_due(self, now):
+        due = []
+        while (job := self._next_job()) is not None and job.due <= now:
+            heapq.heappop(self._heap)
+            del self._jobs[job.key]
+            due.append(job)
+        return due
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            due = self._pop_due(time.time())
+            if due:
+                batch = asyncio.create_task(self._run_due(due))
+                self._batches.add(batch)
+                batch.add_done_callback(self._batches.discard)
+
+            job = self._next_job()
+            timeout = MAX_SLEEP if job is None else min(job.due - time.time(), MAX_SLEEP)
+            if timeout <= 0:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run_due(self, jobs):
+        # retrying is up to the job, a failure here is only reported
+        results = await task_pool.run_bounded(jobs, self._run_job, retries=0, key=lambda job: job.key,
+                                              semaphore=self._semaphore)
+        failures = [result for result in results if not result.ok]
+        if failures:
+            logging.error(task_pool.summarize("scheduled jobs", results))
+        elif len(results) > 1:
+            logging.info(task_pool.summarize("scheduled jobs", results))
+
+    async def _run_job(self, job):
+        lateness = time.time() - job.due
+        logging.info("running scheduled job %s (%.3fs after its due time)", job.key, lateness)
+        await job.callback()
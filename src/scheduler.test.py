@@ -0,0 +1,110 @@
+import asyncio
+import time
+import unittest
+
+from scheduler import DeadlineScheduler
+
+
+class TestDeadlineScheduler(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.scheduler = DeadlineScheduler()
+        self.scheduler.start()
+        self.ran = []
+
+    async def asyncTearDown(self):
+        await self.scheduler.close()
+
+    def job(self, name):
+        async def callback():
+            self.ran.append((name, time.time()))
+        return callback
+
+    async def test_runs_in_due_order(self):
+        now = time.time()
+        self.scheduler.schedule("b", now + 0.1, self.job("b"))
+        self.scheduler.schedule("a", now + 0.05, self.job("a"))
+        self.scheduler.schedule("late", now - 10, self.job("late"))
+        await asyncio.sleep(0.2)
+        self.assertEqual([name for name, _ in self.ran], ["late", "a", "b"])
+        # woken at the deadline rather than on a polling interval
+        self.assertLess(self.ran[1][1] - (now + 0.05), 0.03)
+
+    async def test_earlier_job_wakes_the_scheduler(self):
+        now = time.time()
+        self.scheduler.schedule("later", now + 60, self.job("later"))
+        await asyncio.sleep(0.01)
+        self.scheduler.schedule("sooner", now + 0.05, self.job("sooner"))
+        await asyncio.sleep(0.1)
+        self.assertEqual([name for name, _ in self.ran], ["sooner"])
+
+    async def test_replace_and_cancel(self):
+        now = time.time()
+        self.scheduler.schedule("a", now + 0.05, self.job("first"))
+        self.scheduler.schedule("a", now + 0.06, self.job("replaced"))
+        self.scheduler.schedule("b", now + 0.05, self.job("cancelled"))
+        self.scheduler.cancel("b")
+        self.assertEqual([key for _, key in self.scheduler.upcoming()], ["a"])
+        await asyncio.sleep(0.15)
+        self.assertEqual([name for name, _ in self.ran], ["replaced"])
+        self.assertEqual(self.scheduler.upcoming(), [])
+
+    async def test_failing_job_does_not_stop_the_scheduler(self):
+        async def fail():
+            raise ValueError("boom")
+        now = time.time()
+        self.scheduler.schedule("fail", now, fail)
+        self.scheduler.schedule("ok", now + 0.02, self.job("ok"))
+        with self.assertLogs(level="ERROR"):
+            await asyncio.sleep(0.1)
+        self.assertEqual([name for name, _ in self.ran], ["ok"])
+
+    async def test_jobs_due_together_run_concurrently(self):
+        async def slow(name):
+            await asyncio.sleep(0.05)
+            self.ran.append((name, time.time()))
+
+        async def fail():
+            raise ValueError("boom")
+        now = time.time()
+        for i in range(5):
+            self.scheduler.schedule(f"race {i}", now, lambda i=i: slow(f"race {i}"))
+        self.scheduler.schedule("fail", now, fail)
+        with self.assertLogs(level="ERROR") as logs:
+            await asyncio.sleep(0.1)
+        self.assertEqual(len(self.ran), 5)
+        # all five slept at the same time rather than one after another
+        self.assertLess(max(t for _, t in self.ran) - min(t for _, t in self.ran), 0.03)
+        self.assertIn("5/6 succeeded", logs.output[0])
+
+    async def test_slow_job_does_not_delay_later_jobs(self):
+        async def slow():
+            await asyncio.sleep(0.3)
+            self.ran.append(("slow", time.time()))
+        now = time.time()
+        self.scheduler.schedule("slow", now, slow)
+        self.scheduler.schedule("next", now + 0.05, self.job("next"))
+        await asyncio.sleep(0.1)
+        self.assertEqual([name for name, _ in self.ran], ["next"])
+        self.assertLess(self.ran[0][1] - (now + 0.05), 0.03)
+
+    async def test_concurrency_is_shared_between_batches(self):
+        scheduler = DeadlineScheduler(concurrency=1)
+        scheduler.start()
+        release = asyncio.Event()
+
+        async def blocked():
+            await release.wait()
+            self.ran.append(("blocked", time.time()))
+        now = time.time()
+        scheduler.schedule("blocked", now, blocked)
+        scheduler.schedule("next", now + 0.02, self.job("next"))
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.ran, [])
+        release.set()
+        await asyncio.sleep(0.02)
+        self.assertEqual([name for name, _ in self.ran], ["blocked", "next"])
+        await scheduler.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import logging
+import time
+from contextlib import contextmanager
+
+
+class StartupProfiler:
+    """
+    Records how long each phase of the bot's startup takes, and logs a report once it's up.
+    Phases can be timed with the phase() context manager, or with mark() which records the
+    time since the previous mark.
+
+    Each phase is reported with only the time not already counted by a phase nested in it
+    (phases nest when one is opened inside another, or inside the window of a mark), so the
+    lines of the report add up to the total.
+
+    Once the report is logged the profiler stops recording, so work that runs again after a
+    reconnect (on_ready fires on every one) isn't added to a report nobody will see.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """
+        Forgets every phase and starts timing again from now
+        """
+        self.started_at = time.perf_counter()
+        self._last_mark = self.started_at
+        # [name, seconds, depth] in the order the phases started
+        self.phases = []
+        # time taken by the phases nested in each open phase
+        self._open = []
+        # time taken by top level phases since the last mark, and where they start in phases
+        self._since_mark = 0.0
+        self._mark_index = 0
+        self.reported = False
+
+    @contextmanager
+    def phase(self, name):
+        if self.reported:
+            yield
+            return
+        start = time.perf_counter()
+        entry = [name, 0.0, len(self._open)]
+        self.phases.append(entry)
+        self._open.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            entry[1] = elapsed - self._open.pop()
+            self._nested(elapsed)
+            logging.debug("startup phase %s took %.1fms", name, elapsed * 1000)
+
+    def mark(self, name):
+        if self.reported:
+            return
+        now = time.perf_counter()
+        elapsed = now - self._last_mark
+        seconds = elapsed - self._since_mark
+        # the phases since the last mark are reported under it
+        for entry in self.phases[self._mark_index:]:
+            entry[2] += 1
+        self.phases.insert(self._mark_index, [name, seconds, 0])
+        self._mark_index = len(self.phases)
+        self._last_mark = now
+        self._since_mark = 0.0
+        logging.debug("startup phase %s took %.1fms", name, elapsed * 1000)
+
+    def record(self, name, seconds):
+        if self.reported:
+            return
+        self.phases.append([name, seconds, len(self._open)])
+        self._nested(seconds)
+        logging.debug("startup phase %s took %.1fms", name, seconds * 1000)
+
+    def _nested(self, seconds):
+        if self._open:
+            self._open[-1] += seconds
+        else:
+            self._since_mark += seconds
+
+    def total(self):
+        return time.perf_counter() - self.started_at
+
+    def report(self):
+        lines = ["Startup report:"]
+        total = self.total()
+        rows = [("  " * depth + name, seconds) for name, seconds, depth in self.phases]
+        rows.append(("other", total - sum(seconds for _, seconds, _ in self.phases)))
+        width = max(len(name) for name, _ in rows + [("total", 0)])
+        for name, seconds in rows:
+            lines.append(f"  {name:<{width}}  {seconds * 1000:>9.1f}ms")
+        lines.append(f"  {'total':<{width}}  {total * 1000:>9.1f}ms")
+        return "\n".join(lines)
+
+    def log_report(self):
+        """
+        Logs the report, only the first time it's called (on_ready fires again on reconnects)
+        """
+        if self.reported:
+            return
+        self.reported = True
+        logging.info(self.report())
+
+
+# created when first imported, which main.py does before anything else
+profiler = StartupProfiler()
@@ -0,0 +1,64 @@
+import time
+import unittest
+
+from startup_profiler import StartupProfiler
+
+
+class TestStartupProfiler(unittest.TestCase):
+    def test_nested_phases_are_not_counted_twice(self):
+        profiler = StartupProfiler()
+        time.sleep(0.01)
+        profiler.mark("imports")
+        with profiler.phase("redis: polls"):
+            time.sleep(0.02)
+        profiler.mark("cog construction")
+        with profiler.phase("rehydrate async races"):
+            with profiler.phase("redis: async races"):
+                time.sleep(0.02)
+
+        phases = {name: (seconds, depth) for name, seconds, depth in profiler.phases}
+        self.assertEqual([name for name, _, _ in profiler.phases],
+                         ["imports", "cog construction", "redis: polls",
+                          "rehydrate async races", "redis: async races"])
+        # the redis loads are reported under what they ran in, and not again in its time
+        self.assertEqual(phases["redis: polls"][1], 1)
+        self.assertEqual(phases["redis: async races"][1], 1)
+        self.assertLess(phases["cog construction"][0], 0.01)
+        self.assertLess(phases["rehydrate async races"][0], 0.01)
+        self.assertLessEqual(sum(seconds for seconds, _ in phases.values()), profiler.total())
+
+    def test_report_adds_up_to_the_total(self):
+        profiler = StartupProfiler()
+        with profiler.phase("outer"):
+            with profiler.phase("inner"):
+                time.sleep(0.01)
+        profiler.mark("after")
+        lines = profiler.report().splitlines()[1:]
+        values = [float(line.split()[-1][:-2]) for line in lines]
+        self.assertEqual(lines[-1].split()[0], "total")
+        self.assertAlmostEqual(sum(values[:-1]), values[-1], delta=0.5)
+
+    def test_stops_recording_once_reported(self):
+        profiler = StartupProfiler()
+        profiler.mark("startup")
+        with self.assertLogs(level="INFO"):
+            profiler.log_report()
+        with profiler.phase("reconnect"):
+            profiler.record("redis: async races", 0.1)
+        profiler.mark("later")
+        self.assertEqual([name for name, _, _ in profiler.phases], ["startup"])
+
+    def test_reset(self):
+        profiler = StartupProfiler()
+        with profiler.phase("first run"):
+            pass
+        profiler.log_report()
+        profiler.reset()
+        self.assertFalse(profiler.reported)
+        with profiler.phase("second run"):
+            pass
+        self.assertEqual([name for name, _, _ in profiler.phases], ["second run"])
+
+
+if __name__ == '__main__':
+    unittest.main()
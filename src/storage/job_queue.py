@@ -0,0 +1,159 @@
+"""
+Durable scheduled jobs, stored in a redis sorted set scored by due time.
+
+The sorted set is the record of what is due and when, so a transition that came due while
+the bot was down is still there on the next start and runs then (in due order). The
+in-memory DeadlineScheduler is only the timer that wakes the queue at the right moment.
+"""
+import asyncio
+import logging
+import time
+
+JOBS_KEY = "scheduled_jobs"
+ATTEMPTS_KEY = "scheduled_jobs:attempts"
+# seconds a claimed job is hidden from other workers while it runs
+LEASE_SECONDS = 300
+# seconds a job may run before it is reported as slow, well inside the lease
+SLOW_JOB_SECONDS = 120
+MAX_ATTEMPTS = 5
+# seconds before the first retry of a failed job, doubled for each further retry
+RETRY_BACKOFF = 10
+
+# claims the job if it is due, by pushing its score to the end of the lease
+CLAIM_SCRIPT = """
+local score = redis.call('ZSCORE', KEYS[1], ARGV[1])
+if not score or tonumber(score) > tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], ARGV[3], ARGV[1])
+return 1
+"""
+
+# removes the job unless it was rescheduled while it ran
+COMPLETE_SCRIPT = """
+local score = redis.call('ZSCORE', KEYS[1], ARGV[1])
+if score and tonumber(score) == tonumber(ARGV[2]) then
+    redis.call('ZREM', KEYS[1], ARGV[1])
+    redis.call('HDEL', KEYS[2], ARGV[1])
+    return 1
+end
+return 0
+"""
+
+
+class JobQueue:
+    """
+    Jobs have a key of the form "<kind>:<argument>", e.g. "start:1234", and run the handler
+    registered for their kind with the argument. Scheduling a key again moves it.
+
+    A due job is claimed atomically before it runs, so it runs once even with several
+    workers, and a failed job is retried with exponential backoff up to MAX_ATTEMPTS times.
+    A job that fails also raises, for the scheduler's summary. Scheduling and cancelling go
+    through the write-behind queue.
+
+    A job that runs for too long is reported but never cancelled, since a transition stopped
+    halfway (e.g. after posting the results, before marking the race finished) would repeat
+    its side effects when retried. If the bot dies while the job is running, its lease runs
+    out and it is retried on the next start.
+    """
+
+    def __init__(self, redis_db, persistence, scheduler, max_attempts=MAX_ATTEMPTS, backoff=RETRY_BACKOFF,
+                 slow_after=SLOW_JOB_SECONDS):
+        self.redis_db = redis_db
+        self.persistence = persistence
+        self.scheduler = scheduler
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.slow_after = slow_after
+        self._handlers = dict()
+        self._on_failure = None
+        self._claim = redis_db.register_script(CLAIM_SCRIPT)
+        self._complete = redis_db.register_script(COMPLETE_SCRIPT)
+
+    def register(self, kind, handler):
+        """
+        handler is a coroutine function called with the argument part of the job's key
+        """
+        self._handlers[kind] = handler
+
+    def on_failure(self, callback):
+        """
+        callback(key, exception) is awaited when a job fails for the last time
+        """
+        self._on_failure = callback
+
+    def schedule(self, key, due):
+        def writer(pipe):
+            pipe.zadd(JOBS_KEY, {key: due})
+        self.persistence.mark_dirty(f"{JOBS_KEY}:{key}", writer)
+        self._arm(key, due)
+
+    def cancel(self, key):
+        def writer(pipe):
+            pipe.zrem(JOBS_KEY, key)
+            pipe.hdel(ATTEMPTS_KEY, key)
+        self.persistence.mark_dirty(f"{JOBS_KEY}:{key}", writer)
+        self.scheduler.cancel(key)
+
+    def upcoming(self, limit=None):
+        return self.scheduler.upcoming(limit)
+
+    async def load(self):
+        """
+        Arms every stored job. Jobs that came due while the bot was down run right away,
+        in the order they were due.
+        """
+        jobs = await self.redis_db.zrange(JOBS_KEY, 0, -1, withscores=True)
+        for key, due in jobs:
+            self._arm(key.decode("utf-8"), due)
+        overdue = sum(1 for _, due in jobs if due <= time.time())
+        logging.info("loaded %d scheduled jobs, %d overdue", len(jobs), overdue)
+
+    def _arm(self, key, due):
+        self.scheduler.schedule(key, due, lambda: self._run(key))
+
+    async def _run(self, key):
+        now = time.time()
+        lease = int(now) + LEASE_SECONDS
+        try:
+            # the job may have been scheduled moments ago and still be in the write-behind queue
+            await self.persistence.flush_now()
+            claimed = await self._claim(keys=[JOBS_KEY], args=[key, now, lease])
+        except Exception:
+            logging.warning("could not claim scheduled job %s, trying again later", key)
+            self._arm(key, now + self.backoff)
+            raise
+        if not claimed:
+            # cancelled, moved, or claimed by another worker
+            return
+
+        kind, _, argument = key.partition(":")
+        handler = asyncio.create_task(self._handlers[kind](argument))
+        try:
+            done, _ = await asyncio.wait([handler], timeout=self.slow_after)
+            if not done:
+                logging.error("scheduled job %s is still running after %ds, waiting for it to finish",
+                              key, self.slow_after)
+            await handler
+        except Exception as e:
+            await self._failed(key, e)
+            raise
+        await self._complete(keys=[JOBS_KEY, ATTEMPTS_KEY], args=[key, lease])
+
+    async def _failed(self, key, error):
+        attempts = await self.redis_db.hincrby(ATTEMPTS_KEY, key, 1)
+        if attempts < self.max_attempts:
+            due = time.time() + self.backoff * 2 ** (attempts - 1)
+            logging.warning("scheduled job %s failed (attempt %d), retrying at %d: %s", key, attempts, due, error)
+            await self.redis_db.zadd(JOBS_KEY, {key: due})
+            self._arm(key, due)
+            return
+
+        logging.error("scheduled job %s failed %d times, giving up", key, attempts)
+        logging.exception(error)
+        async with self.redis_db.pipeline(transaction=True) as pipe:
+            pipe.zrem(JOBS_KEY, key)
+            pipe.hdel(ATTEMPTS_KEY, key)
+            await pipe.execute()
+        if self._on_failure is not None:
+            await self._on_failure(key, error)
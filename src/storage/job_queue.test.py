@@ -0,0 +1,185 @@
+import asyncio
+import time
+import unittest
+
+from scheduler import DeadlineScheduler
+from storage import job_queue
+from storage.job_queue import ATTEMPTS_KEY, JOBS_KEY, JobQueue
+
+
+class FakePipeline:
+    def __init__(self, redis_db):
+        self.redis_db = redis_db
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def zadd(self, key, mapping):
+        self.commands.append(lambda: self.redis_db.zsets.setdefault(key, dict()).update(mapping))
+
+    def zrem(self, key, member):
+        self.commands.append(lambda: self.redis_db.zsets.get(key, dict()).pop(member, None))
+
+    def hdel(self, key, field):
+        self.commands.append(lambda: self.redis_db.hashes.get(key, dict()).pop(field, None))
+
+    async def execute(self):
+        for command in self.commands:
+            command()
+        self.commands = []
+
+
+class FakeRedis:
+    """
+    The sorted set and hash commands the queue uses, with the two scripts done in python
+    """
+
+    def __init__(self):
+        self.zsets = dict()
+        self.hashes = dict()
+
+    def register_script(self, script):
+        if script == job_queue.CLAIM_SCRIPT:
+            return self._claim
+        return self._complete
+
+    async def _claim(self, keys, args):
+        key, now, lease = args
+        jobs = self.zsets.get(keys[0], dict())
+        if key not in jobs or jobs[key] > now:
+            return 0
+        jobs[key] = lease
+        return 1
+
+    async def _complete(self, keys, args):
+        key, lease = args
+        if self.zsets.get(keys[0], dict()).get(key) == lease:
+            del self.zsets[keys[0]][key]
+            self.hashes.get(keys[1], dict()).pop(key, None)
+            return 1
+        return 0
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def zadd(self, key, mapping):
+        self.zsets.setdefault(key, dict()).update(mapping)
+
+    async def zrange(self, key, start, end, withscores=False):
+        jobs = sorted(self.zsets.get(key, dict()).items(), key=lambda job: job[1])
+        return [(key.encode(), due) for key, due in jobs]
+
+    async def hincrby(self, key, field, amount):
+        fields = self.hashes.setdefault(key, dict())
+        fields[field] = fields.get(field, 0) + amount
+        return fields[field]
+
+
+class FakePersistence:
+    def __init__(self, redis_db):
+        self.redis_db = redis_db
+        self.pending = dict()
+
+    def mark_dirty(self, key, writer):
+        self.pending[key] = writer
+
+    async def flush_now(self):
+        pipe = self.redis_db.pipeline()
+        for writer in self.pending.values():
+            writer(pipe)
+        self.pending = dict()
+        await pipe.execute()
+
+
+class TestJobQueue(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.redis_db = FakeRedis()
+        self.scheduler = DeadlineScheduler()
+        self.queue = JobQueue(self.redis_db, FakePersistence(self.redis_db), self.scheduler, max_attempts=2, backoff=0.05)
+        self.ran = []
+        self.failures = []
+        self.queue.register("start", self.handler("start"))
+        self.queue.register("end", self.handler("end"))
+
+        async def on_failure(key, error):
+            self.failures.append(key)
+        self.queue.on_failure(on_failure)
+        self.scheduler.start()
+
+    async def asyncTearDown(self):
+        await self.scheduler.close()
+
+    def handler(self, kind):
+        async def run(argument):
+            if argument == "broken":
+                raise RuntimeError("broken")
+            self.ran.append(f"{kind}:{argument}")
+        return run
+
+    async def test_overdue_jobs_run_in_due_order_on_load(self):
+        now = time.time()
+        self.redis_db.zsets[JOBS_KEY] = {"end:1": now - 5, "start:2": now - 60, "start:3": now + 60}
+        await self.queue.load()
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.ran, ["start:2", "end:1"])
+        self.assertEqual(self.redis_db.zsets[JOBS_KEY], {"start:3": now + 60})
+
+    async def test_scheduled_job_runs_and_is_removed(self):
+        self.queue.schedule("start:1", time.time() + 0.05)
+        self.assertEqual([key for _, key in self.queue.upcoming()], ["start:1"])
+        await asyncio.sleep(0.1)
+        self.assertEqual(self.ran, ["start:1"])
+        self.assertEqual(self.redis_db.zsets[JOBS_KEY], dict())
+
+    async def test_cancel(self):
+        self.queue.schedule("start:1", time.time() + 0.05)
+        self.queue.cancel("start:1")
+        await asyncio.sleep(0.1)
+        await self.queue.persistence.flush_now()
+        self.assertEqual(self.ran, [])
+        self.assertEqual(self.redis_db.zsets.get(JOBS_KEY, dict()), dict())
+
+    async def test_job_claimed_elsewhere_does_not_run(self):
+        now = time.time()
+        # another worker holds the lease
+        self.redis_db.zsets[JOBS_KEY] = {"start:1": now + job_queue.LEASE_SECONDS}
+        self.scheduler.schedule("start:1", now, lambda: self.queue._run("start:1"))
+        await asyncio.sleep(0.05)
+        self.assertEqual(self.ran, [])
+
+    async def test_slow_job_is_reported_but_not_cancelled(self):
+        self.queue.slow_after = 0.02
+        finished = []
+
+        async def slow(argument):
+            await asyncio.sleep(0.05)
+            finished.append(argument)
+        self.queue.register("slow", slow)
+        self.queue.schedule("slow:1", time.time())
+        with self.assertLogs(level="ERROR") as logs:
+            await asyncio.sleep(0.04)
+        self.assertIn("still running", logs.output[0])
+        self.assertIn("slow:1", self.redis_db.zsets[JOBS_KEY])
+        await asyncio.sleep(0.04)
+        self.assertEqual(finished, ["1"])
+        self.assertNotIn("slow:1", self.redis_db.zsets[JOBS_KEY])
+        self.assertNotIn("slow:1", self.redis_db.hashes.get(ATTEMPTS_KEY, dict()))
+
+    async def test_failed_job_is_retried_then_given_up(self):
+        self.queue.schedule("start:broken", time.time())
+        await asyncio.sleep(0.02)
+        # first failure, retried after the backoff
+        self.assertIn("start:broken", self.redis_db.zsets[JOBS_KEY])
+        self.assertEqual(self.redis_db.hashes[ATTEMPTS_KEY]["start:broken"], 1)
+        await asyncio.sleep(0.1)
+        self.assertEqual(self.failures, ["start:broken"])
+        self.assertEqual(self.redis_db.zsets[JOBS_KEY], dict())
+        self.assertEqual(self.redis_db.hashes[ATTEMPTS_KEY], dict())
+
+
+if __name__ == "__main__":
+    unittest.main()
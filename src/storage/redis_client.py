@@ -0,0 +1,53 @@
+import logging
+import os
+
+from redis.asyncio import ConnectionPool, Redis
+from redis.asyncio.retry import Retry
+from redis.backoff import ExponentialBackoff
+from redis.exceptions import ConnectionError, TimeoutError
+
+# seconds to wait on a single redis round trip before giving up
+SOCKET_TIMEOUT = 5
+CONNECT_TIMEOUT = 5
+# number of times a failed command is retried (with exponential backoff)
+RETRY_ATTEMPTS = 3
+MAX_CONNECTIONS = 20
+
+
+def create_pool(host=None, port=None, db=0):
+    """
+    Creates the shared asyncio connection pool used by every cog.
+    Host and port default to the REDIS_HOST / REDIS_PORT environment variables.
+    """
+    host = host if host is not None else os.environ.get("REDIS_HOST", "localhost")
+    port = port if port is not None else int(os.environ.get("REDIS_PORT", "6379"))
+    logging.info("creating redis pool for %s:%s", host, port)
+    return ConnectionPool(
+        host=host,
+        port=port,
+        db=db,
+        decode_responses=False,
+        max_connections=MAX_CONNECTIONS,
+        socket_timeout=SOCKET_TIMEOUT,
+        socket_connect_timeout=CONNECT_TIMEOUT,
+        health_check_interval=30,
+        retry_on_timeout=True,
+        retry_on_error=[ConnectionError, TimeoutError],
+        retry=Retry(ExponentialBackoff(cap=2, base=0.1), RETRY_ATTEMPTS),
+    )
+
+
+def create_client(pool):
+    """
+    Returns an asyncio redis client backed by the given shared pool.
+    All commands on it must be awaited so they never block the event loop.
+    """
+    return Redis(connection_pool=pool)
+
+
+async def close_pool(pool):
+    """
+    Disconnects every connection in the pool, used at shutdown
+    """
+    logging.info("closing redis pool")
+    await pool.disconnect()
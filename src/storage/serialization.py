@@ -0,0 +1,184 @@
+"""
+Versioned storage format for async races and polls.
+
+Every blob is compact JSON wrapped in an envelope of {"v": version, "kind": kind, "data": ...}
+so the format can change without breaking old data. Blobs written by older versions of the
+bot with pickle are still readable, and are rewritten in this format the first time they
+are loaded (see migrate_hash).
+"""
+import json
+import logging
+import pickle
+from datetime import datetime
+
+from cogs.races.async_race import AsyncLeaderboardEntry, parse_time
+from voting.poll import Poll
+from voting.stv_election import StvElection
+
+FORMAT_VERSION = 2
+ASYNC_RACE = "async_race"
+ASYNC_ENTRY = "async_entry"
+POLL = "poll"
+
+# leaderboard entries are stored as rows of [runner id, runner name, seconds, vod], with
+# [teammate id, teammate name, teammate vod] appended for co-op entries. seconds is null for
+# a forfeit, and a twitch vod is stored as its video id
+V1_ENTRY_FIELDS = (
+    "runner_id", "runner_name", "runner_time", "vod", "is_forfeit",
+    "is_spectator", "teammate_id", "teammate_name", "teammate_vod",
+)
+TWITCH_VOD_PREFIX = "https://www.twitch.tv/videos/"
+RACE_TIME_FIELDS = ("start_time", "end_time")
+POLL_TYPES = {"poll": Poll, "election": StvElection}
+
+
+class UnsupportedFormat(Exception):
+    """
+    raised when a blob was written with an unknown kind or a newer format version
+    """
+    pass
+
+
+def is_legacy(blob):
+    """
+    True if the blob was written with pickle by an older version of the bot
+    """
+    return blob[:1] == b"\x80"
+
+
+def dump_async_race(race_data):
+    """
+    Encodes the dict returned by AsyncRace.to_dict
+    """
+    data = dict(race_data)
+    for field in RACE_TIME_FIELDS:
+        if data[field] is not None:
+            data[field] = data[field].isoformat()
+    data["leaderboard"] = [dump_entry(entry) for entry in data["leaderboard"]]
+    return _dump(ASYNC_RACE, data)
+
+
+def load_async_race(blob):
+    """
+    Decodes a stored race back into the dict accepted by AsyncRace.from_dict
+    """
+    if is_legacy(blob):
+        data = pickle.loads(blob)
+        data["leaderboard"] = [entry.to_dict() for entry in data["leaderboard"]]
+        return data
+
+    version, data = _load(ASYNC_RACE, blob)
+    for field in RACE_TIME_FIELDS:
+        if data[field] is not None:
+            data[field] = datetime.fromisoformat(data[field])
+    data["leaderboard"] = [load_entry(entry, version) for entry in data["leaderboard"]]
+    return data
+
+
+def dump_leaderboard_entry(entry_data):
+    """
+    Encodes a single leaderboard entry (AsyncLeaderboardEntry.to_dict) as its own record
+    """
+    return _dump(ASYNC_ENTRY, dump_entry(entry_data))
+
+
+def load_leaderboard_entry(blob):
+    version, row = _load(ASYNC_ENTRY, blob)
+    return load_entry(row, version)
+
+
+def dump_entry(entry_data):
+    seconds = None if entry_data["is_forfeit"] else parse_time(entry_data["runner_time"])
+    row = [entry_data["runner_id"], entry_data["runner_name"], seconds, _pack_vod(entry_data["vod"])]
+    if entry_data["teammate_id"] is not None:
+        row += [entry_data["teammate_id"], entry_data["teammate_name"], _pack_vod(entry_data["teammate_vod"])]
+    return row
+
+
+def load_entry(row, version=FORMAT_VERSION):
+    if version < 2:
+        return dict(zip(V1_ENTRY_FIELDS, row))
+
+    runner_id, runner_name, seconds, vod = row[:4]
+    teammate_id, teammate_name, teammate_vod = row[4:] if len(row) > 4 else (None, None, None)
+    return {
+        "runner_id": runner_id,
+        "runner_name": runner_name,
+        "runner_time": AsyncLeaderboardEntry.format_seconds(seconds or 0),
+        "vod": _unpack_vod(vod),
+        "is_forfeit": seconds is None,
+        # spectators are stored on the race, not in the leaderboard
+        "is_spectator": False,
+        "teammate_id": teammate_id,
+        "teammate_name": teammate_name,
+        "teammate_vod": _unpack_vod(teammate_vod),
+    }
+
+
+def _pack_vod(vod):
+    if isinstance(vod, str) and vod.startswith(TWITCH_VOD_PREFIX):
+        video_id = vod[len(TWITCH_VOD_PREFIX):]
+        # only ids that survive the round trip through an int
+        if video_id.isdigit() and video_id == str(int(video_id)):
+            return int(video_id)
+    return vod
+
+
+def _unpack_vod(vod):
+    return TWITCH_VOD_PREFIX + str(vod) if isinstance(vod, int) else vod
+
+
+def dump_poll(poll):
+    return _dump(POLL, poll.to_dict())
+
+
+def load_poll(blob):
+    """
+    Decodes a stored poll into a Poll or StvElection
+    """
+    if is_legacy(blob):
+        return pickle.loads(blob)
+
+    _, data = _load(POLL, blob)
+    try:
+        poll_class = POLL_TYPES[data["type"]]
+    except KeyError:
+        raise UnsupportedFormat(f"unknown poll type {data['type']}")
+    return poll_class.from_dict(data)
+
+
+async def migrate_hash(redis_db, key, blobs, load, dump):
+    """
+    Rewrites every legacy pickle blob in the hash `key` in the current format.
+    blobs is the result of hgetall on that hash, load/dump are the matching pair
+    of functions from this module.
+    """
+    migrated = dict()
+    for field, blob in blobs.items():
+        if is_legacy(blob):
+            try:
+                migrated[field] = dump(load(blob))
+            except Exception as e:
+                logging.error("could not migrate %s %s", key, field)
+                logging.exception(e)
+    if migrated:
+        await redis_db.hset(key, mapping=migrated)
+        logging.info("migrated %d entries of %s from pickle", len(migrated), key)
+    return migrated
+
+
+def _dump(kind, data):
+    envelope = {"v": FORMAT_VERSION, "kind": kind, "data": data}
+    return json.dumps(envelope, separators=(",", ":")).encode("utf-8")
+
+
+def _load(kind, blob):
+    """
+    Returns the format version the blob was written with and its data
+    """
+    envelope = json.loads(blob)
+    if envelope.get("kind") != kind:
+        raise UnsupportedFormat(f"expected {kind} but found {envelope.get('kind')}")
+    if envelope.get("v", 0) > FORMAT_VERSION:
+        raise UnsupportedFormat(f"{kind} was stored with format version {envelope['v']}")
+    return envelope.get("v", 0), envelope["data"]
@@ -0,0 +1,118 @@
+import pickle
+import unittest
+from datetime import datetime
+
+from cogs.races.async_race import AsyncLeaderboardEntry
+from storage import serialization
+from voting.poll import Poll
+from voting.stv_election import StvElection
+
+
+def race_data(entries=3):
+    leaderboard = [{"runner_id": i,
+                    "runner_name": "runner " + str(i),
+                    "runner_time": "01:0" + str(i % 10) + ":00",
+                    "vod": "https://twitch.tv/videos/" + str(i),
+                    "is_forfeit": False,
+                    "is_spectator": False,
+                    "teammate_id": None,
+                    "teammate_name": None,
+                    "teammate_vod": None} for i in range(entries)]
+    return {"race_channel_id": 1,
+            "race_id": 2,
+            "race_thread_id": 2,
+            "spoiler_thread_id": 3,
+            "name": "test race",
+            "owner_id": 4,
+            "flags": "https://finalfantasyrandomizer.com/?f=abc",
+            "start_time": datetime(2026, 7, 15, 10, 30),
+            "end_time": None,
+            "race_role": None,
+            "seed": "https://finalfantasyrandomizer.com/?f=abc&s=1234abcd",
+            "is_started": True,
+            "is_finished": False,
+            "announcement_message_id": 5,
+            "leaderboard_message_id": 6,
+            "spoiler_leaderboard_message_ids": [],
+            "leaderboard": leaderboard,
+            "is_coop": False}
+
+
+class TestSerialization(unittest.TestCase):
+
+    def test_async_race_round_trip(self):
+        data = race_data()
+        blob = serialization.dump_async_race(data)
+        self.assertFalse(serialization.is_legacy(blob))
+        self.assertEqual(serialization.load_async_race(blob), data)
+
+    def test_legacy_async_race(self):
+        data = race_data()
+        legacy = dict(data)
+        legacy["leaderboard"] = [AsyncLeaderboardEntry.from_dict(e)
+                                 for e in data["leaderboard"]]
+        blob = pickle.dumps(legacy, protocol=pickle.HIGHEST_PROTOCOL)
+        self.assertTrue(serialization.is_legacy(blob))
+        self.assertEqual(serialization.load_async_race(blob), data)
+
+    def test_poll_round_trip(self):
+        poll = Poll("test", "fake id")
+        poll.add_option(None, ["option #1", "This is the first option"])
+        poll.add_option(None, ["option #2", "This is the second option"])
+        poll.start_poll()
+        for i in range(10):
+            poll.submit_vote(str(i), str(i) + " name", [str(i % 2 + 1)])
+        loaded = serialization.load_poll(serialization.dump_poll(poll))
+        self.assertEqual(str(loaded), str(poll))
+        self.assertEqual(loaded.get_results(), poll.get_results())
+        self.assertIs(loaded.options["option #1"]["voters"][0],
+                      loaded.voters["0"])
+
+    def test_election_round_trip(self):
+        election = StvElection("test", "fake id", 2)
+        for i in range(4):
+            x = str(i)
+            election.options[x] = {"id": x,
+                                   "mention": x + "asdf",
+                                   "display_name": x + "display_name",
+                                   "index": len(election.options)}
+        election.start_poll()
+        for i in range(40):
+            election.submit_vote(str(i), "voter", ["1,," + str(i % 4),
+                                                   "2,," + str((i + 1) % 4)])
+        loaded = serialization.load_poll(serialization.dump_poll(election))
+        self.assertIsInstance(loaded, StvElection)
+        self.assertEqual(loaded.seat_count, 2)
+        self.assertEqual(loaded.get_winners(), election.get_winners())
+
+    def test_entry_rows_are_compact(self):
+        solo = race_data(1)["leaderboard"][0]
+        solo["vod"] = "https://www.twitch.tv/videos/2000000001"
+        self.assertEqual(serialization.dump_entry(solo),
+                         [0, "runner 0", 3600, 2000000001])
+        forfeit = dict(solo, runner_time="00:00:00", vod="", is_forfeit=True)
+        coop = dict(solo, vod="https://youtu.be/abc", teammate_id=7, teammate_name="teammate",
+                    teammate_vod="https://www.twitch.tv/videos/0123")
+        for entry in (solo, forfeit, coop):
+            row = serialization.dump_entry(entry)
+            self.assertEqual(serialization.load_entry(row), entry)
+        self.assertEqual(serialization.dump_entry(forfeit), [0, "runner 0", None, ""])
+        self.assertEqual(len(serialization.dump_entry(coop)), 7)
+
+    def test_version_1_race(self):
+        data = race_data()
+        blob = serialization._dump(serialization.ASYNC_RACE, dict(
+            data, start_time=data["start_time"].isoformat(),
+            leaderboard=[[entry[field] for field in serialization.V1_ENTRY_FIELDS]
+                         for entry in data["leaderboard"]]))
+        blob = blob.replace(b'"v":2', b'"v":1')
+        self.assertEqual(serialization.load_async_race(blob), data)
+
+    def test_newer_version_rejected(self):
+        blob = b'{"v":99,"kind":"poll","data":{}}'
+        with self.assertRaises(serialization.UnsupportedFormat):
+            serialization.load_poll(blob)
+
+
+if __name__ == "__main__":
+    unittest.main()
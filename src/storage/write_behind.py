@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import time
+
+# seconds between background flushes
+FLUSH_INTERVAL = 0.5
+
+
+class WriteBehindQueue:
+    """
+    Collects writes to redis and flushes them in pipelines on a short interval.
+
+    Objects are marked dirty under a key together with a writer. Marking the same key
+    again before the next flush replaces the pending writer, so a burst of mutations to
+    one race or poll costs a single write. A writer is called at flush time with the
+    pipeline, queues its commands on it, and may return a callable that is run once the
+    pipeline has executed successfully.
+    """
+
+    def __init__(self, redis_db, interval=FLUSH_INTERVAL):
+        self.redis_db = redis_db
+        self.interval = interval
+        self._pending = dict()
+        self._task = None
+        self._flush_lock = asyncio.Lock()
+        self.flush_count = 0
+        self.write_count = 0
+        self.coalesced_count = 0
+        self.failed_flushes = 0
+        self.last_flush_latency = 0.0
+        self.max_flush_latency = 0.0
+
+    def mark_dirty(self, key, writer):
+        if key in self._pending:
+            self.coalesced_count += 1
+        self._pending[key] = writer
+
+    @property
+    def depth(self):
+        return len(self._pending)
+
+    def start(self):
+        """
+        Starts the background flush loop, must be called from a running event loop
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """
+        Stops the background loop and flushes anything still pending, used at shutdown
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush_now()
+
+    async def flush_now(self):
+        """
+        Writes every pending change immediately, for critical transitions like ending a race.
+        Raises if the pipeline fails; the writes stay queued for the next flush.
+        """
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch = self._pending
+            self._pending = dict()
+            start = time.perf_counter()
+            try:
+                async with self.redis_db.pipeline(transaction=False) as pipe:
+                    commits = [writer(pipe) for writer in batch.values()]
+                    await pipe.execute()
+            except Exception:
+                self.failed_flushes += 1
+                # requeue, unless the key was marked dirty again while flushing
+                for key, writer in batch.items():
+                    self._pending.setdefault(key, writer)
+                raise
+
+            for commit in commits:
+                if commit is not None:
+                    commit()
+            latency = time.perf_counter() - start
+            self.flush_count += 1
+            self.write_count += len(batch)
+            self.last_flush_latency = latency
+            self.max_flush_latency = max(self.max_flush_latency, latency)
+            logging.debug("flushed %d writes in %.1fms", len(batch), latency * 1000)
+
+    def metrics(self):
+        return {
+            "queue_depth": self.depth,
+            "flushes": self.flush_count,
+            "writes": self.write_count,
+            "coalesced": self.coalesced_count,
+            "failed_flushes": self.failed_flushes,
+            "last_flush_ms": round(self.last_flush_latency * 1000, 1),
+            "max_flush_ms": round(self.max_flush_latency * 1000, 1),
+        }
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush_now()
+            except Exception as e:
+                logging.error("write-behind flush failed, %d writes still queued", self.depth)
+                logging.exception(e)
@@ -0,0 +1,70 @@
+import asyncio
+import logging
+import time
+
+
+class TaskResult:
+    """
+    Outcome of running one item through run_bounded
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.ok = False
+        self.value = None
+        self.error = None
+        self.attempts = 0
+        self.elapsed = 0.0
+
+    def __str__(self):
+        status = "ok" if self.ok else f"failed ({type(self.error).__name__}: {self.error})"
+        return f"{self.key}: {status} in {self.elapsed * 1000:.0f}ms after {self.attempts} attempt(s)"
+
+
+async def run_bounded(items, func, limit=5, retries=2, backoff=0.5, give_up_on=(), key=str, semaphore=None):
+    """
+    Runs func(item) for every item concurrently, with at most `limit` running at once.
+    A semaphore shared between calls bounds them together instead, and limit is ignored.
+    Each item succeeds or fails on its own: exceptions are captured on its TaskResult
+    and retried up to `retries` times with exponential backoff, unless the exception
+    is an instance of one of the `give_up_on` types.
+    Returns the list of TaskResults in the same order as items.
+    """
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(limit)
+
+    async def run_one(item):
+        result = TaskResult(key(item))
+        async with semaphore:
+            start = time.perf_counter()
+            for attempt in range(retries + 1):
+                result.attempts = attempt + 1
+                try:
+                    result.value = await func(item)
+                    result.ok = True
+                    result.error = None
+                    break
+                except Exception as e:
+                    result.error = e
+                    if isinstance(e, give_up_on) or attempt == retries:
+                        break
+                    logging.warning("retrying %s after error: %s", result.key, e)
+                    await asyncio.sleep(backoff * (2 ** attempt))
+            result.elapsed = time.perf_counter() - start
+        return result
+
+    return await asyncio.gather(*(run_one(item) for item in items))
+
+
+def summarize(title, results):
+    """
+    Returns a one message summary of a batch of TaskResults
+    """
+    failures = [r for r in results if not r.ok]
+    summary = f"{title}: {len(results) - len(failures)}/{len(results)} succeeded"
+    if results:
+        slowest = max(results, key=lambda r: r.elapsed)
+        summary += f", slowest {slowest.key} took {slowest.elapsed * 1000:.0f}ms"
+    for failure in failures:
+        summary += f"\n{failure}"
+    return summary
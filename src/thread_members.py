@@ -0,0 +1,112 @@
+import asyncio
+import json
+import logging
+import uuid
+
+import discord
+
+import task_pool
+
+JOBS_KEY = "thread_member_adds"
+# members added to a thread at the same time. discord.py waits out the rate limit
+# bucket of the add thread member route itself, this keeps us from queueing a burst on it
+ADD_CONCURRENCY = 5
+# members added between two saves of the job's cursor
+BATCH_SIZE = 25
+
+
+class ThreadMemberAdder:
+    """
+    Adds many members to a thread, a few at a time in parallel.
+
+    Each job is saved in redis under its own id (with the thread id, the member ids and a
+    cursor of how many have been added) and the cursor is advanced after every batch, so a job
+    interrupted by a restart is picked up where it left off by resume(). A thread can have
+    several jobs at once, e.g. a race's role and a team added separately, each with its own cursor.
+    """
+
+    def __init__(self, redis_db, concurrency=ADD_CONCURRENCY, batch_size=BATCH_SIZE):
+        self.redis_db = redis_db
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        # (added, total) of the running jobs, by job id
+        self.progress = dict()
+        self._tasks = set()
+
+    async def add_members(self, thread, members):
+        """
+        Adds the members to the thread, returns the TaskResults of the members that failed
+        """
+        job = {"id": uuid.uuid4().hex, "thread_id": thread.id,
+               "member_ids": sorted({member.id for member in members}), "cursor": 0}
+        await self._save(job)
+        return await self._run(thread, job)
+
+    def add_members_in_background(self, thread, members):
+        """
+        Same as add_members, without waiting for the members to be added
+        """
+        return self._start(self.add_members(thread, members))
+
+    async def resume(self, bot):
+        """
+        Restarts the jobs that were still running when the bot stopped
+        """
+        jobs = await self.redis_db.hgetall(JOBS_KEY)
+        for job_id, blob in jobs.items():
+            job = json.loads(blob)
+            # jobs saved before they had ids are stored under their thread id
+            job["id"] = job_id.decode("utf-8")
+            if job["id"] in self.progress:
+                continue
+            try:
+                thread = bot.get_channel(job["thread_id"]) or await bot.fetch_channel(job["thread_id"])
+            except (discord.NotFound, discord.Forbidden):
+                logging.warning("dropping member adds for missing thread %s", job["thread_id"])
+                await self.redis_db.hdel(JOBS_KEY, job_id)
+                continue
+            logging.info("resuming member adds for thread %s at %d/%d",
+                         thread.id, job["cursor"], len(job["member_ids"]))
+            self._start(self._run(thread, job))
+
+    async def _run(self, thread, job):
+        member_ids = job["member_ids"]
+        failures = []
+        self.progress[job["id"]] = (job["cursor"], len(member_ids))
+        try:
+            for start in range(job["cursor"], len(member_ids), self.batch_size):
+                batch = member_ids[start:start + self.batch_size]
+                results = await task_pool.run_bounded(
+                    batch, lambda member_id: thread.add_user(discord.Object(id=member_id)),
+                    limit=self.concurrency,
+                    give_up_on=(discord.NotFound, discord.Forbidden),
+                )
+                failures.extend(result for result in results if not result.ok)
+                job["cursor"] = start + len(batch)
+                self.progress[job["id"]] = (job["cursor"], len(member_ids))
+                logging.info("added %d/%d members to thread %s", job["cursor"], len(member_ids), thread.id)
+                if job["cursor"] < len(member_ids):
+                    await self._save(job)
+        finally:
+            self.progress.pop(job["id"], None)
+
+        await self.redis_db.hdel(JOBS_KEY, job["id"])
+        if failures:
+            logging.warning(task_pool.summarize(f"adding members to thread {thread.id}", failures))
+        return failures
+
+    async def _save(self, job):
+        await self.redis_db.hset(JOBS_KEY, job["id"], json.dumps(job, separators=(",", ":")))
+
+    def _start(self, coro):
+        task = asyncio.create_task(coro)
+        # keep a reference so the task isn't garbage collected while running
+        self._tasks.add(task)
+        task.add_done_callback(self._finished)
+        return task
+
+    def _finished(self, task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logging.error("adding thread members failed, the job will be resumed on the next restart",
+                          exc_info=task.exception())
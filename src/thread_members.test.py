@@ -0,0 +1,121 @@
+import asyncio
+import json
+import unittest
+
+import thread_members
+from thread_members import ThreadMemberAdder
+
+
+class FakeRedis:
+    """
+    The few hash commands the adder uses, in memory
+    """
+
+    def __init__(self):
+        self.hashes = dict()
+
+    async def hset(self, key, field, value):
+        self.hashes.setdefault(key, dict())[str(field).encode()] = value.encode()
+
+    async def hdel(self, key, field):
+        self.hashes.get(key, dict()).pop(str(field).encode(), None)
+
+    async def hgetall(self, key):
+        return dict(self.hashes.get(key, dict()))
+
+
+class FakeThread:
+    def __init__(self, id, fail_after=None):
+        self.id = id
+        self.members = []
+        self.fail_after = fail_after
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def add_user(self, user):
+        if self.fail_after is not None and len(self.members) >= self.fail_after:
+            raise asyncio.CancelledError
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.001)
+        self.in_flight -= 1
+        self.members.append(user.id)
+
+
+class FakeMember:
+    def __init__(self, id):
+        self.id = id
+
+
+class FakeBot:
+    def __init__(self, thread):
+        self.thread = thread
+
+    def get_channel(self, id):
+        return self.thread if id == self.thread.id else None
+
+
+class TestThreadMemberAdder(unittest.IsolatedAsyncioTestCase):
+    async def test_adds_everyone_in_parallel(self):
+        redis_db = FakeRedis()
+        adder = ThreadMemberAdder(redis_db, concurrency=4, batch_size=10)
+        thread = FakeThread(1)
+        failures = await adder.add_members(thread, [FakeMember(i) for i in range(35)])
+        self.assertEqual(failures, [])
+        self.assertEqual(sorted(thread.members), list(range(35)))
+        self.assertEqual(thread.max_in_flight, 4)
+        # the job is removed once it's done
+        self.assertEqual(await redis_db.hgetall(thread_members.JOBS_KEY), {})
+
+    async def test_resume_after_interruption(self):
+        redis_db = FakeRedis()
+        adder = ThreadMemberAdder(redis_db, concurrency=2, batch_size=10)
+        thread = FakeThread(1, fail_after=20)
+        with self.assertRaises(asyncio.CancelledError):
+            await adder.add_members(thread, [FakeMember(i) for i in range(35)])
+        [job] = [json.loads(blob) for blob in (await redis_db.hgetall(thread_members.JOBS_KEY)).values()]
+        self.assertEqual(job["thread_id"], 1)
+        self.assertEqual(job["cursor"], 20)
+
+        # after a restart only the remaining members are added
+        thread.fail_after = None
+        thread.members = []
+        await ThreadMemberAdder(redis_db, batch_size=10).resume(FakeBot(thread))
+        await asyncio.sleep(0.1)
+        self.assertEqual(sorted(thread.members), list(range(20, 35)))
+        self.assertEqual(await redis_db.hgetall(thread_members.JOBS_KEY), {})
+
+    async def test_jobs_on_the_same_thread_keep_their_own_cursor(self):
+        redis_db = FakeRedis()
+        adder = ThreadMemberAdder(redis_db, concurrency=1, batch_size=5)
+        thread = FakeThread(1, fail_after=15)
+        # a race's role and a team added to the same thread at once
+        results = await asyncio.gather(adder.add_members(thread, [FakeMember(i) for i in range(20)]),
+                                       adder.add_members(thread, [FakeMember(i) for i in range(100, 110)]),
+                                       return_exceptions=True)
+        self.assertTrue(all(isinstance(result, asyncio.CancelledError) for result in results))
+        jobs = [json.loads(blob) for blob in (await redis_db.hgetall(thread_members.JOBS_KEY)).values()]
+        self.assertCountEqual([job["member_ids"] for job in jobs], [list(range(20)), list(range(100, 110))])
+        self.assertTrue(all(job["cursor"] > 0 for job in jobs))
+
+        # each job resumes from its own cursor
+        thread.fail_after = None
+        thread.members = []
+        await ThreadMemberAdder(redis_db, batch_size=5).resume(FakeBot(thread))
+        await asyncio.sleep(0.1)
+        self.assertCountEqual(thread.members, [member_id for job in jobs for member_id in job["member_ids"][job["cursor"]:]])
+        self.assertEqual(await redis_db.hgetall(thread_members.JOBS_KEY), {})
+
+    async def test_resume_job_saved_by_thread_id(self):
+        redis_db = FakeRedis()
+        await redis_db.hset(thread_members.JOBS_KEY, 1,
+                            json.dumps({"thread_id": 1, "member_ids": [1, 2, 3], "cursor": 1}))
+        thread = FakeThread(1)
+        await ThreadMemberAdder(redis_db).resume(FakeBot(thread))
+        await asyncio.sleep(0.05)
+        self.assertEqual(sorted(thread.members), [2, 3])
+        self.assertEqual(await redis_db.hgetall(thread_members.JOBS_KEY), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -28,6 +28,53 @@ class Poll:
                 and self.ended == other.ended
                 and self.channel_id == other.channel_id)
 
+    def to_dict(self):
+        """
+        Returns the state of this poll as plain data for storage
+        """
+        options = dict()
+        for id, option in self.options.items():
+            options[id] = dict(option)
+            if "voters" in option:
+                options[id]["voters"] = [[voter.id, voter.name, voter.vote]
+                                         for voter in option["voters"]]
+        return {"type": self.type,
+                "poll_id": self.poll_id,
+                "channel_id": self.channel_id,
+                "started": self.started,
+                "ended": self.ended,
+                "options": options,
+                "voters": {id: [voter.name, voter.vote]
+                           for id, voter in self.voters.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Creates a poll from the plain data returned by to_dict
+        """
+        poll = cls(data["poll_id"], data["channel_id"])
+        poll.restore_state(data)
+        return poll
+
+    def restore_state(self, data):
+        self.started = data["started"]
+        self.ended = data["ended"]
+        for id, (name, vote) in data["voters"].items():
+            self.voters[id] = self._make_voter(id, name, vote)
+        for id, option in data["options"].items():
+            self.options[id] = dict(option)
+            if "voters" in option:
+                # share the voter objects with self.voters, like submit_vote does
+                self.options[id]["voters"] = [
+                    self.voters[voter_id] if voter_id in self.voters
+                    else self._make_voter(voter_id, name, vote)
+                    for voter_id, name, vote in option["voters"]]
+
+    def _make_voter(self, id, name, vote):
+        voter = FFRVoter(id, name)
+        voter.set_vote(vote)
+        return voter
+
     def get_channel(self):
         return self.channel_id
 
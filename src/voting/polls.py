@@ -1,16 +1,24 @@
 from discord.ext import commands
 from discord.utils import get
 from discord import File
-import pickle
 import logging
+from collections import OrderedDict
 from datetime import datetime, timezone
 from concurrent.futures import TimeoutError
 
 import constants
 import text
+from startup_profiler import profiler
+from storage import serialization
 from voting.poll import Poll
 from voting.stv_election import StvElection
 
+# open polls live in the voting hash and stay in memory, ended polls are moved
+# to the archive hash and only loaded when someone asks for them
+ARCHIVE_KEY = "voting:archive"
+# number of archived polls kept in memory after being looked up
+ARCHIVE_CACHE_SIZE = 8
+
 
 def is_admin(ctx):
     user = ctx.author
@@ -24,47 +32,105 @@ def is_steven(ctx):
 
 
 class Polls(commands.Cog):
-    def __init__(self, bot, redis_db):
+    def __init__(self, bot, redis_db, persistence):
         self.bot = bot
         self.redis_db = redis_db
+        self.persistence = persistence
         self.polls = dict()
+        self.archive_cache = OrderedDict()
+
+    async def cog_load(self):
         try:
-            self.load_all()
+            await self.load_all()
         except Exception as e:
             logging.error("Error loading saved voting, maybe use command"
                           + " clear_db to wipe stored data")
             logging.exception(e)
 
-    def load_all(self):
+    async def load_all(self):
         logging.info("loading saved voting")
-        temp = dict(self.redis_db.hgetall('voting'))
+        with profiler.phase("redis: polls"):
+            temp = dict(await self.redis_db.hgetall('voting'))
+        await serialization.migrate_hash(self.redis_db, "voting", temp,
+                                         serialization.load_poll,
+                                         serialization.dump_poll)
+        ended = dict()
         for k, v in temp.items():
-            self.polls[k.decode("utf-8")] = pickle.loads(v)
+            poll = serialization.load_poll(v)
+            if poll.ended:
+                ended[k] = v
+            else:
+                self.polls[k.decode("utf-8")] = poll
         for poll in self.polls.values():
             logging.debug(poll)
-
-    def save_one(self, id):
+        if ended:
+            # ended polls saved before the archive existed
+            async with self.redis_db.pipeline(transaction=True) as pipe:
+                pipe.hset(ARCHIVE_KEY, mapping=ended)
+                pipe.hdel('voting', *ended.keys())
+                await pipe.execute()
+            logging.info("moved %d ended polls to the archive", len(ended))
+
+    async def get_poll(self, id):
+        """
+        Returns the poll for the channel id, loading it from the archive if it
+        has ended. Raises KeyError if there is no such poll.
+        """
+        if id in self.polls:
+            return self.polls[id]
+        if id in self.archive_cache:
+            self.archive_cache.move_to_end(id)
+            return self.archive_cache[id]
+
+        blob = await self.redis_db.hget(ARCHIVE_KEY, id)
+        if blob is None:
+            raise KeyError(id)
+        poll = serialization.load_poll(blob)
+        self._cache_archived(id, poll)
+        return poll
+
+    def _cache_archived(self, id, poll):
+        self.archive_cache[id] = poll
+        self.archive_cache.move_to_end(id)
+        while len(self.archive_cache) > ARCHIVE_CACHE_SIZE:
+            self.archive_cache.popitem(last=False)
+
+    def save_one(self, id, poll=None):
+        """
+        Queues a save of the poll, repeated saves before the next flush are
+        coalesced by the write-behind queue.
+        Polls are moved between memory and the archive as they end or reopen.
+        """
         logging.info("saving poll " + id)
-        poll = self.polls[id]
-        self.redis_db.hset("voting",
-                           id, pickle.dumps(poll,
-                                            protocol=pickle.HIGHEST_PROTOCOL))
-        logging.info("saved")
-        self.verify_save(id)
-
-    def verify_save(self, id):
-        original = self.polls[id]
-        saved = pickle.loads(self.redis_db.hget("voting", id))
-        logging.debug("original: " + str(original))
-        logging.debug("saved: " + str(saved))
-        logging.debug(saved == original)
+        if poll is None:
+            poll = self.polls.get(id) or self.archive_cache[id]
+        if poll.ended:
+            self.polls.pop(id, None)
+            self._cache_archived(id, poll)
+        else:
+            self.archive_cache.pop(id, None)
+            self.polls[id] = poll
+        self.persistence.mark_dirty("voting:" + id,
+                                    lambda pipe: self._write_poll(pipe, id,
+                                                                  poll))
+
+    def _write_poll(self, pipe, id, poll):
+        if poll.ended:
+            pipe.hset(ARCHIVE_KEY, id, serialization.dump_poll(poll))
+            pipe.hdel("voting", id)
+        else:
+            pipe.hset("voting", id, serialization.dump_poll(poll))
+            pipe.hdel(ARCHIVE_KEY, id)
 
     @commands.command()
     @commands.check(is_steven)
     async def clear_db(self, ctx):
-        self.redis_db.flushall()
+        # write anything still queued first so it can't land after the flush
+        await self.persistence.flush_now()
+        await self.redis_db.flushall()
         logging.info("cleared redis db")
         self.polls = dict()
+        self.archive_cache = OrderedDict()
 
     @commands.command(aliases=["cp"])
     @commands.check(is_admin)
@@ -95,7 +161,7 @@ class Polls(commands.Cog):
     @commands.check(is_admin)
     async def startpoll(self, ctx):
         try:
-            poll = self.polls[str(ctx.channel.id)]
+            poll = await self.get_poll(str(ctx.channel.id))
         except KeyError:
             await ctx.author.send(text.no_poll_in_channel)
             await ctx.message.delete()
@@ -128,7 +194,7 @@ class Polls(commands.Cog):
     @commands.check(is_admin)
     async def addoption(self, ctx, *args):
         try:
-            poll = self.polls[str(ctx.channel.id)]
+            poll = await self.get_poll(str(ctx.channel.id))
         except KeyError:
             await ctx.author.send(text.no_poll_in_channel)
             await ctx.message.delete()
@@ -157,7 +223,7 @@ class Polls(commands.Cog):
     async def vote(self, ctx):
         # TODO combine vote and submitvote using self.bot.wait_for
         try:
-            poll = self.polls[str(ctx.channel.id)]
+            poll = await self.get_poll(str(ctx.channel.id))
         except KeyError:
             await ctx.author.send(text.no_poll_in_channel)
             await ctx.message.delete()
@@ -198,7 +264,7 @@ class Polls(commands.Cog):
     @commands.dm_only()
     async def submitballot(self, ctx, channel_id, *args):
         try:
-            poll = self.polls[channel_id]
+            poll = await self.get_poll(channel_id)
         except KeyError:
             await ctx.author.send(text.cant_find_poll)
             return
@@ -245,7 +311,8 @@ class Polls(commands.Cog):
             if reply.content.lower() == "yes":
                 print("\n\n" + str(args) + "\n\n")
                 poll.submit_vote(str(ctx.author.id), ctx.author.name, args)
-                self.save_one(channel_id)
+                self.save_one(channel_id, poll)
+                await self.persistence.flush_now()
                 await ctx.author.send(text.vote_processed)
             else:
                 await ctx.author.send(text.vote_not_processed)
@@ -255,7 +322,7 @@ class Polls(commands.Cog):
     @commands.check(is_admin)
     async def endpoll(self, ctx, channel_id=None):
         try:
-            poll = self.polls[str(ctx.channel.id)]
+            poll = await self.get_poll(str(ctx.channel.id))
         except KeyError:
             await ctx.author.send(text.no_poll_in_channel)
             await ctx.message.delete()
@@ -298,7 +365,8 @@ class Polls(commands.Cog):
             else:
                 await ctx.channel.send(output)
             poll.end_poll()
-            self.save_one(str(ctx.channel.id))
+            self.save_one(str(ctx.channel.id), poll)
+            await self.persistence.flush_now()
         else:
             await ctx.channel.send(text.poll_still_open)
             return
@@ -307,13 +375,14 @@ class Polls(commands.Cog):
     @commands.check(is_admin)
     async def undoendpoll(self, ctx):
         try:
-            poll = self.polls[str(ctx.channel.id)]
+            poll = await self.get_poll(str(ctx.channel.id))
         except KeyError:
             await ctx.author.send(text.no_poll_in_channel)
             await ctx.message.delete()
             return
         if poll.ended:
             poll.undo_end_poll()
+            self.save_one(str(ctx.channel.id), poll)
             await ctx.message.delete()
         else:
             return
@@ -322,7 +391,7 @@ class Polls(commands.Cog):
     @commands.check(is_admin)
     async def forceclosepoll(self, ctx):
         try:
-            poll = self.polls[str(ctx.channel.id)]
+            poll = await self.get_poll(str(ctx.channel.id))
         except KeyError:
             await ctx.author.send(text.no_poll_in_channel)
             await ctx.message.delete()
@@ -356,14 +425,15 @@ class Polls(commands.Cog):
                                                reason=reason)
             await role.delete(reason=reason)
             poll.end_poll()
-            self.save_one(poll.get_channel())
+            self.save_one(poll.get_channel(), poll)
+            await self.persistence.flush_now()
             await ctx.message.add_reaction('✔')
 
     @commands.command()
     @commands.check(is_admin)
     async def getcsv(self, ctx):
         try:
-            poll = self.polls[str(ctx.channel.id)]
+            poll = await self.get_poll(str(ctx.channel.id))
         except KeyError:
             await ctx.author.send(text.no_poll_in_channel)
             await ctx.message.delete()
@@ -376,7 +446,7 @@ class Polls(commands.Cog):
     @commands.command()
     async def getcount(self, ctx):
         try:
-            poll = self.polls[str(ctx.channel.id)]
+            poll = await self.get_poll(str(ctx.channel.id))
         except KeyError:
             await ctx.author.send(text.no_poll_in_channel)
             await ctx.message.delete()
@@ -389,7 +459,7 @@ class Polls(commands.Cog):
     @commands.check(is_steven)
     async def removevote(self, ctx, *args):
         try:
-            poll = self.polls[str(ctx.channel.id)]
+            poll = await self.get_poll(str(ctx.channel.id))
         except KeyError:
             await ctx.author.send(text.no_poll_in_channel)
             await ctx.message.delete()
@@ -412,9 +482,9 @@ class Polls(commands.Cog):
     async def check(self, ctx, pollid=None):
         try:
             if (pollid):
-                poll = self.polls[str(pollid)]
+                poll = await self.get_poll(str(pollid))
             else:
-                poll = self.polls[str(ctx.channel.id)]
+                poll = await self.get_poll(str(ctx.channel.id))
         except KeyError:
             await ctx.author.send(text.no_poll_in_channel)
             await ctx.message.delete()
@@ -434,9 +504,9 @@ class Polls(commands.Cog):
     async def check2(self, ctx, pollid=None):
         try:
             if (pollid):
-                poll = self.polls[str(pollid)]
+                poll = await self.get_poll(str(pollid))
             else:
-                poll = self.polls[str(ctx.channel.id)]
+                poll = await self.get_poll(str(ctx.channel.id))
         except KeyError:
             await ctx.author.send(text.no_poll_in_channel)
             await ctx.message.delete()
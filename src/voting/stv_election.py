@@ -21,6 +21,17 @@ class StvElection(Poll):
         self.type = "election"
         self.add_option_arg_len = 1
 
+    def to_dict(self):
+        data = super().to_dict()
+        data["seat_count"] = self.seat_count
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        election = cls(data["poll_id"], data["channel_id"], data["seat_count"])
+        election.restore_state(data)
+        return election
+
     def update_description(self, id: str, description: str):
         try:
             self.options[id]["description"] = description